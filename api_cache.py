@@ -0,0 +1,124 @@
+"""
+Persistent response cache for the OA metadata APIs.
+
+Answers from Unpaywall, Semantic Scholar, OpenAlex and CORE rarely change
+within weeks, but re-runs (e.g. after --reset-oa-attempts) used to query
+them again for the whole backlog. The api_cache table keeps the decoded
+JSON answer per (service, key) as zlib-compressed JSON, so repeated
+lookups within the TTL cost no API call.
+
+Entries expire after a per-service TTL (in days; 0 disables caching for a
+service). The table is kept below a size limit by evicting the oldest
+entries first.
+
+Used by scrape_pdfs.py (the query_* functions read through it).
+"""
+
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_MB = 200
+
+# When the size limit is exceeded, evict down to this fraction of it
+EVICT_TO = 0.9
+
+
+class ApiCache:
+    """On-disk cache of API answers, keyed by service and key (usually a DOI).
+
+    ttl_days maps service names to TTLs in days (services not listed use
+    DEFAULT_TTL_DAYS). The connection is only used under the cache's lock,
+    so a cache built on a connection opened with check_same_thread=False
+    can be shared by the lookup threads.
+    """
+
+    def __init__(self, conn, ttl_days=None, max_mb=DEFAULT_MAX_MB):
+        self.conn = conn
+        self.ttl_days = ttl_days or {}
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._ensure_table()
+        row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM api_cache").fetchone()
+        self._total_bytes = row[0]
+
+    def _ensure_table(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_cache (
+                service     TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                body        BLOB NOT NULL,
+                size        INTEGER NOT NULL,
+                fetched_at  TEXT NOT NULL,
+                PRIMARY KEY (service, key)
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_api_cache_fetched
+            ON api_cache(fetched_at)
+        """)
+        self.conn.commit()
+
+    def _ttl(self, service):
+        return timedelta(days=self.ttl_days.get(service, DEFAULT_TTL_DAYS))
+
+    def get(self, service, key):
+        """Cached value for (service, key), or None if missing or expired."""
+        ttl = self._ttl(service)
+        if not ttl:
+            return None
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT body, fetched_at FROM api_cache WHERE service = ? AND key = ?
+            """, (service, key)).fetchone()
+            if row is None or datetime.now() - datetime.fromisoformat(row[1]) > ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, service, key, value):
+        """Store a JSON-serialisable value for (service, key)."""
+        if not self._ttl(service):
+            return
+        body = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            old = self.conn.execute("""
+                SELECT size FROM api_cache WHERE service = ? AND key = ?
+            """, (service, key)).fetchone()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO api_cache (service, key, body, size, fetched_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (service, key, body, len(body), datetime.now().isoformat()))
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Delete the oldest entries until below EVICT_TO of the limit.
+
+        Caller holds the lock.
+        """
+        target = self.max_bytes * EVICT_TO
+        freed = 0
+        deleted = 0
+        rows = self.conn.execute("""
+            SELECT service, key, size FROM api_cache ORDER BY fetched_at
+        """).fetchall()
+        for service, key, size in rows:
+            if self._total_bytes - freed <= target:
+                break
+            self.conn.execute("DELETE FROM api_cache WHERE service = ? AND key = ?",
+                              (service, key))
+            freed += size
+            deleted += 1
+        self._total_bytes -= freed
+        log.info("API cache: evicted %d entries (%.1f MB)", deleted, freed / 1024 / 1024)
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the scrape_pdfs.py download cascade.
+
+Starts local stand-ins for Unpaywall, Semantic Scholar, OpenAlex, CORE and
+LingBuzz, and one local web server per publisher behaviour:
+
+    direct      serves the PDF
+    html        serves an HTML page (without PDF links) instead of the PDF
+    cloudflare  answers 403 with a bot challenge page
+    links       serves an HTML page with one PDF link (even articles) or
+                two candidate links (odd articles, left for manual review)
+    slow        streams the PDF at --slow-kbps
+    throttle    answers every third request with 429 and Retry-After: 1
+
+Fallback sources (Semantic Scholar, OpenAlex, CORE) point to a separate
+repository server that always serves the PDF. A synthetic database of
+--articles articles, spread over the behaviours, is then processed with
+scrape_pdfs.process_one (or run_workers with --workers N), exactly as
+scrape_pdfs.py --continuous does, but with the API endpoints pointing to
+the stand-ins and without politeness intervals (unless given).
+
+Reports articles per second, HTTP requests per downloaded article (per
+source and per publisher behaviour, from metrics.py), the outcomes per
+behaviour and the time spent in each stage of the hot path. Everything
+runs in a temporary directory; nothing leaves the machine.
+
+Usage:
+    python bench_scrape_pdfs.py
+    python bench_scrape_pdfs.py --articles 1000 --workers 4
+    python bench_scrape_pdfs.py --service-interval 0.05 --api-latency 20
+    python bench_scrape_pdfs.py --json > bench.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import metrics
+import scrape_pdfs
+import work_queue
+
+log = logging.getLogger(__name__)
+
+BEHAVIOURS = ["direct", "html", "cloudflare", "links", "slow", "throttle"]
+
+# Share of articles that are OA, and of OA articles with a PDF URL in
+# Unpaywall; share of articles each fallback source has a PDF for
+OA_SHARE = 0.85
+UNPAYWALL_PDF_SHARE = 0.8
+FALLBACK_SHARES = {"semantic_scholar": 0.4, "openalex": 0.4, "core": 0.3, "lingbuzz": 0.2}
+
+# Body of the bot challenge page (matches scrape_pdfs._is_cloudflare_challenge)
+CHALLENGE_HTML = (b"<html><head><title>Just a moment...</title></head><body>"
+                  b"<script>window._cf_chl_opt={}</script>Checking your browser</body></html>")
+
+TITLE_WORDS = ["agreement", "ellipsis", "clitic", "evidentiality", "tone", "binding",
+               "case", "prosody", "focus", "aspect", "control", "islands", "reduplication",
+               "negation", "vowel", "harmony", "relative", "clauses", "scrambling", "gender"]
+TITLE_LANGUAGES = ["Basque", "Yoruba", "Icelandic", "Tagalog", "Quechua", "Georgian",
+                   "Hungarian", "Mandarin", "Finnish", "Zulu"]
+
+# Stages of the hot path timed by the benchmark: stage -> scrape_pdfs function
+STAGES = {
+    "select": "get_eligible_candidate",
+    "unpaywall": "query_unpaywall",
+    "fallback lookups": "_live_lookup",
+    "downloads": "_try_download",
+    "bookkeeping": "update_article",
+}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic articles
+# ---------------------------------------------------------------------------
+
+def make_articles(n, seed):
+    """Synthetic articles with the answers every stand-in gives for them."""
+    rnd = random.Random(seed)
+    articles = []
+    for i in range(n):
+        behaviour = BEHAVIOURS[i % len(BEHAVIOURS)]
+        words = rnd.sample(TITLE_WORDS, 3)
+        # The number keeps titles (and LingBuzz searches) apart
+        title = (f"{words[0].capitalize()} and {words[1]} {words[2]} in "
+                 f"{rnd.choice(TITLE_LANGUAGES)}, study {i:05d}")
+        oa = rnd.random() < OA_SHARE
+        articles.append({
+            "id": i,
+            "doi": f"10.9999/bench.{i:06d}",
+            "title": title,
+            "behaviour": behaviour,
+            "publisher": f"Bench {behaviour}",
+            "journal": f"Bench Journal ({behaviour})",
+            "oa": oa,
+            "unpaywall_pdf": oa and rnd.random() < UNPAYWALL_PDF_SHARE,
+            "fallbacks": {source: oa and rnd.random() < share
+                          for source, share in FALLBACK_SHARES.items()},
+        })
+    return articles
+
+
+def create_database(db_path, articles):
+    """Create an articles table like scrape_dois.py's and fill it."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE articles (
+            doi          TEXT PRIMARY KEY,
+            title        TEXT,
+            authors      TEXT,
+            journal      TEXT,
+            year         INTEGER,
+            volume       TEXT,
+            issue        TEXT,
+            pages        TEXT,
+            publisher    TEXT,
+            type         TEXT,
+            availability TEXT,
+            source       TEXT,
+            attempts     INTEGER DEFAULT 0,
+            response     INTEGER DEFAULT 0,
+            timestamp    TEXT,
+            file         TEXT
+        )
+    """)
+    conn.executemany("""
+        INSERT INTO articles (doi, title, authors, journal, year, publisher, type)
+        VALUES (?, ?, 'Bench, Author', ?, 2020, ?, 'article')
+    """, [(a["doi"], a["title"], a["journal"], a["publisher"]) for a in articles])
+    conn.commit()
+    scrape_pdfs.ensure_schema(conn)
+    return conn
+
+
+def pdf_body(name, size):
+    """A valid PDF of about size bytes, unique per name (so that the
+    content-addressed store does not take it for a duplicate)."""
+    head = f"%PDF-1.4\n% {name}\n".encode()
+    return head + b"0" * max(size - len(head) - 7, 0) + b"\n%%EOF\n"
+
+
+# ---------------------------------------------------------------------------
+# Stand-in servers
+# ---------------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        parsed = urlparse(self.path)
+        if self.server.role == "api":
+            if self.server.api_latency:
+                time.sleep(self.server.api_latency)
+            self.api(unquote(parsed.path), parse_qs(parsed.query))
+        else:
+            self.publisher(parsed.path)
+
+    def send(self, code, body, content_type="text/html", headers=None, chunk_delay=0):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not chunk_delay:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), 16 * 1024):
+            self.wfile.write(body[start:start + 16 * 1024])
+            self.wfile.flush()
+            time.sleep(chunk_delay)
+
+    def send_json(self, data):
+        if data is None:
+            self.send(404, b'{"error": "not found"}', "application/json")
+        else:
+            self.send(200, json.dumps(data).encode(), "application/json")
+
+    def send_pdf(self, chunk_delay=0):
+        self.send(200, pdf_body(self.path, self.server.pdf_size), "application/pdf",
+                  chunk_delay=chunk_delay)
+
+    # -- OA services and LingBuzz
+
+    def api(self, path, query):
+        bench = self.server.bench
+        m = re.match(r"/(unpaywall/v2/|s2/paper/DOI:|openalex/works/doi:)(.+)$", path)
+        if m:
+            article = bench.by_doi.get(m.group(2))
+            service = {"unpaywall/v2/": "unpaywall", "s2/paper/DOI:": "semantic_scholar",
+                       "openalex/works/doi:": "openalex"}[m.group(1)]
+            return self.send_json(article and bench.record(service, article))
+        if path == "/core/search/works":
+            doi = re.search(r'doi:"([^"]+)"', query.get("q", [""])[0])
+            article = doi and bench.by_doi.get(doi.group(1))
+            return self.send_json(bench.record("core", article) if article
+                                  else {"results": []})
+        if path == "/lingbuzz" and "_s" in query:
+            return self.send(200, bench.lingbuzz_results(query["_s"][0]).encode())
+        if re.match(r"/lingbuzz/\d{6}/current\.pdf$", path):
+            return self.send_pdf()
+        self.send(404, b"not found")
+
+    # -- Publisher and repository web sites
+
+    def publisher(self, path):
+        role = self.server.role
+        m = re.match(r"/(landing|pdf|files)/(\d+)", path)
+        if not m:
+            return self.send(404, b"not found")
+        kind, article_id = m.group(1), int(m.group(2))
+        if kind == "landing":
+            return self.send(200, f"<html><body>Article {article_id}</body></html>".encode())
+        if kind == "files" or role in ("direct", "repository"):
+            return self.send_pdf()
+        if role == "html":
+            return self.send(200, b"<html><body>Please log in to read this article."
+                                  b"</body></html>")
+        if role == "cloudflare":
+            return self.send(403, CHALLENGE_HTML)
+        if role == "links":
+            links = f'<a href="/files/{article_id}.pdf">Download PDF</a>'
+            if article_id % 2:
+                links += f'<a href="/files/{article_id}-suppl.pdf">Supplementary PDF</a>'
+            return self.send(200, f"<html><body>{links}</body></html>".encode())
+        if role == "slow":
+            # 16 KB chunks at slow_kbps
+            return self.send_pdf(chunk_delay=16 / self.server.slow_kbps)
+        if role == "throttle":
+            with self.server.lock:
+                self.server.pdf_requests += 1
+                throttled = self.server.pdf_requests % 3 == 0
+            if throttled:
+                return self.send(429, b"Too many requests", headers={"Retry-After": "1"})
+            return self.send_pdf()
+        self.send(404, b"not found")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class Bench:
+    """The stand-in servers and the answers they give for the synthetic articles."""
+
+    def __init__(self, articles, pdf_size, slow_kbps, api_latency):
+        self.articles = articles
+        self.by_doi = {a["doi"]: a for a in articles}
+        self.servers = {}
+        for role in ["api", "repository"] + BEHAVIOURS:
+            server = _Server(("127.0.0.1", 0), _Handler)
+            server.role = role
+            server.bench = self
+            server.pdf_size = pdf_size
+            server.slow_kbps = slow_kbps
+            server.api_latency = api_latency
+            server.requests = 0
+            server.pdf_requests = 0
+            server.lock = threading.Lock()
+            self.servers[role] = server
+        self.lingbuzz_titles = {a["id"]: a["title"] for a in articles
+                                if a["fallbacks"]["lingbuzz"]}
+
+    def url(self, role, path=""):
+        host, port = self.servers[role].server_address
+        return f"http://{host}:{port}{path}"
+
+    def role_of_host(self, host):
+        for role, server in self.servers.items():
+            if host == "{}:{}".format(*server.server_address):
+                return role
+        return host
+
+    def start(self):
+        for server in self.servers.values():
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def close(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def record(self, service, article):
+        """The stand-in API answer for an article (None for 404)."""
+        i = article["id"]
+        if service == "unpaywall":
+            location = None
+            if article["oa"]:
+                location = {
+                    "url_for_pdf": (self.url(article["behaviour"], f"/pdf/{i}")
+                                    if article["unpaywall_pdf"] else None),
+                    "url_for_landing_page": self.url(article["behaviour"], f"/landing/{i}"),
+                }
+            return {"doi": article["doi"], "is_oa": article["oa"],
+                    "best_oa_location": location, "oa_locations": [location] if location else []}
+        if not article["fallbacks"][service]:
+            return {"results": []} if service == "core" else None
+        pdf_url = self.url("repository", f"/files/{i}-{service}.pdf")
+        if service == "semantic_scholar":
+            return {"openAccessPdf": {"url": pdf_url}, "url": None}
+        if service == "openalex":
+            return {"best_oa_location": {"pdf_url": pdf_url, "landing_page_url": None},
+                    "open_access": {"oa_url": pdf_url}}
+        return {"results": [{"downloadUrl": pdf_url}]}
+
+    def lingbuzz_results(self, query):
+        """A LingBuzz search result page: papers containing all query words."""
+        words = {w.lower() for w in query.split()}
+        rows = "".join(
+            f'<tr><td><a href="/lingbuzz/{i:06d}">{title}</a></td></tr>'
+            for i, title in self.lingbuzz_titles.items()
+            if words <= set(re.sub(r"[^\w\s]", " ", title.lower()).split()))
+        return f"<html><body><table>{rows}</table></body></html>"
+
+
+# ---------------------------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------------------------
+
+class StageTimer:
+    """Total time spent in (and calls of) wrapped functions, per stage."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+                    self.calls[stage] = self.calls.get(stage, 0) + 1
+        return timed
+
+
+def instrument(timer):
+    """Wrap the hot-path functions of scrape_pdfs in the stage timer."""
+    for stage, name in STAGES.items():
+        setattr(scrape_pdfs, name, timer.wrap(stage, getattr(scrape_pdfs, name)))
+
+
+# ---------------------------------------------------------------------------
+# Benchmark run
+# ---------------------------------------------------------------------------
+
+def configure(bench, workdir, args):
+    """Point scrape_pdfs to the stand-ins and build its config."""
+    api = bench.url("api")
+    scrape_pdfs.UNPAYWALL_API = f"{api}/unpaywall/v2"
+    scrape_pdfs.SEMANTIC_SCHOLAR_API = f"{api}/s2"
+    scrape_pdfs.OPENALEX_API = f"{api}/openalex"
+    scrape_pdfs.CORE_API = f"{api}/core"
+    scrape_pdfs.LINGBUZZ_URL = f"{api}/lingbuzz"
+    for service in scrape_pdfs.SERVICE_INTERVALS:
+        scrape_pdfs.SERVICE_INTERVALS[service] = args.service_interval
+    return {
+        "years": [2000, 2030],
+        "journals": sorted({a["journal"] for a in bench.articles}),
+        "pdf_dir": str(workdir / "pdf"),
+        "core_api_key": "bench",
+        "unpaywall": {
+            "mailto": "bench@example.org",
+            "politeness_interval": 0,
+            "publisher_interval": args.publisher_interval,
+            "max_attempts": 3,
+        },
+    }
+
+
+def run(db_path, config, workers):
+    """Process the whole queue; returns the wall time in seconds."""
+    started = time.perf_counter()
+    if workers > 1:
+        scrape_pdfs.run_workers(db_path, config, workers)
+    else:
+        conn = sqlite3.connect(db_path)
+        try:
+            while scrape_pdfs.process_one(conn, config)[0] is not None:
+                pass
+        finally:
+            conn.close()
+    return time.perf_counter() - started
+
+
+def collect(bench, db_path, wall, timer, args):
+    """Benchmark results as a dict."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT publisher, availability, file FROM articles").fetchall()
+    conn.close()
+    outcomes = {}
+    by_behaviour = {}
+    for publisher, availability, file in rows:
+        outcome = "downloaded" if file else availability or "untried"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        behaviour = by_behaviour.setdefault(publisher.replace("Bench ", ""), {})
+        behaviour[outcome] = behaviour.get(outcome, 0) + 1
+
+    downloaded = outcomes.get("downloaded", 0)
+    requests_by_source = metrics.totals("requests_total", "source")
+    requests_by_role = {}
+    for host, n in metrics.totals("host_requests_total", "host").items():
+        role = bench.role_of_host(host)
+        requests_by_role[role] = requests_by_role.get(role, 0) + n
+    total_requests = sum(requests_by_source.values())
+    return {
+        "articles": args.articles,
+        "workers": args.workers,
+        "wall_seconds": round(wall, 3),
+        "articles_per_second": round(args.articles / wall, 2) if wall else None,
+        "outcomes": outcomes,
+        "outcomes_by_behaviour": by_behaviour,
+        "requests": total_requests,
+        "requests_per_download": round(total_requests / downloaded, 2) if downloaded else None,
+        "requests_by_source": requests_by_source,
+        "requests_by_server": requests_by_role,
+        "downloads": metrics.totals("downloads_total", "result"),
+        "downloaded_bytes": sum(metrics.totals("downloaded_bytes_total", "host").values()),
+        "wait_seconds": {reason: round(s, 3) for reason, s
+                         in metrics.totals("wait_seconds_total", "reason").items()},
+        "stages": {stage: {"seconds": round(timer.seconds.get(stage, 0.0), 3),
+                           "calls": timer.calls.get(stage, 0)} for stage in STAGES},
+    }
+
+
+def print_report(result):
+    print(f"Articles:         {result['articles']} ({result['workers']} worker(s))")
+    print(f"Wall time:        {result['wall_seconds']:.2f} s")
+    print(f"Articles/s:       {result['articles_per_second']}")
+    print("Outcomes:         " + ", ".join(f"{k} {v}" for k, v in
+                                           sorted(result["outcomes"].items())))
+    print(f"Requests:         {result['requests']} "
+          f"({result['requests_per_download']} per downloaded article)")
+    for source, n in sorted(result["requests_by_source"].items()):
+        print(f"  {source:<18} {n}")
+    print("Requests per server:")
+    for role, n in sorted(result["requests_by_server"].items()):
+        print(f"  {role:<18} {n}")
+    print("Outcomes per publisher behaviour:")
+    for behaviour, outcomes in sorted(result["outcomes_by_behaviour"].items()):
+        print(f"  {behaviour:<18} " + ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+    print("PDF transfers:    " + ", ".join(f"{k} {v}" for k, v in
+                                           sorted(result["downloads"].items())))
+    if result["wait_seconds"]:
+        print("Waits:            " + ", ".join(f"{k} {v:.1f}s" for k, v in
+                                               sorted(result["wait_seconds"].items())))
+    print("Stage time (summed over threads):")
+    for stage, t in result["stages"].items():
+        per_call = t["seconds"] / t["calls"] * 1000 if t["calls"] else 0
+        print(f"  {stage:<18} {t['seconds']:8.2f} s  {t['calls']:6d} calls  "
+              f"{per_call:8.1f} ms/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scrape_pdfs.py cascade against local stand-in servers.")
+    parser.add_argument("--articles", type=int, default=200,
+                        help="Number of synthetic articles (default: 200)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Download workers, as scrape_pdfs.py --workers (default: 1)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="Seed of the synthetic data (default: 1)")
+    parser.add_argument("--pdf-kb", type=int, default=64,
+                        help="Size of the served PDFs in KB (default: 64)")
+    parser.add_argument("--slow-kbps", type=float, default=256,
+                        help="Transfer rate of the slow publisher in KB/s (default: 256)")
+    parser.add_argument("--api-latency", type=float, default=0, metavar="MS",
+                        help="Latency added to every API answer in ms (default: 0)")
+    parser.add_argument("--service-interval", type=float, default=0,
+                        help="Seconds between requests per API service (default: 0)")
+    parser.add_argument("--publisher-interval", type=float, default=0,
+                        help="Seconds between attempts per publisher (default: 0)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the results as JSON")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the temporary directory (database and PDFs)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Show the scraper's log")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format="%(asctime)s  %(levelname)-8s  %(message)s",
+        datefmt="%H:%M:%S",
+    )
+
+    workdir = Path(tempfile.mkdtemp(prefix="linglitter-bench-"))
+    db_path = str(workdir / "bench.db")
+    articles = make_articles(args.articles, args.seed)
+    bench = Bench(articles, args.pdf_kb * 1024, args.slow_kbps, args.api_latency / 1000)
+    bench.start()
+    try:
+        config = configure(bench, workdir, args)
+        conn = create_database(db_path, articles)
+        work_queue.ensure_synced(conn, scrape_pdfs.QUEUE_STAGE, config["years"],
+                                 config["journals"], config["unpaywall"]["max_attempts"])
+        conn.close()
+        scrape_pdfs.init_api_cache(db_path, config)
+        scrape_pdfs.init_rate_limiter(db_path)
+        scrape_pdfs.init_download_engine(config)
+        scrape_pdfs.init_session_store(db_path)
+        scrape_pdfs.init_negative_cache(db_path)
+
+        timer = StageTimer()
+        instrument(timer)
+        metrics.reset()
+        wall = run(db_path, config, args.workers)
+        result = collect(bench, db_path, wall, timer, args)
+    finally:
+        bench.close()
+        if args.keep:
+            print(f"Kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,10 +25,16 @@ from urllib.parse import urljoin
 
 import requests
 
+import pdf_store
+from pdf_download import HTML, NOT_PDF, DownloadEngine, pooled_session
+
 log = logging.getLogger(__name__)
 
 POLITENESS = 5  # seconds between requests
 
+# Shared download engine (default settings)
+_download_engine = DownloadEngine()
+
 # Browser-like headers to avoid bot detection on LangSci-hosted PDFs
 BROWSER_HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
@@ -54,6 +60,7 @@ BROWSER_HEADERS = {
 def init_db(db_path):
     """Open the linglitter database."""
     conn = sqlite3.connect(db_path)
+    pdf_store.ensure_columns(conn)
     return conn
 
 
@@ -201,57 +208,36 @@ def download_pdf(url, dest_path, session, book_page_url=None):
     to look like a click from the book page. For LangSci-hosted PDFs
     this is needed to avoid bot blocking.
 
+    Books run to hundreds of MB, so the download engine keeps interrupted
+    transfers as .part files and continues them with range requests,
+    also in a later run.
+
     Returns True on success.
     """
-    try:
-        # Set headers to look like a same-origin navigation from the book page
-        if book_page_url:
-            session.headers["Referer"] = book_page_url
-            session.headers["Sec-Fetch-Site"] = "same-origin"
-        session.headers["Accept"] = "application/pdf,*/*;q=0.9"
-
-        resp = session.get(url, timeout=120, stream=True, allow_redirects=True)
-        code = resp.status_code
-
-        if code != 200:
-            log.warning("PDF download failed with HTTP %d: %s", code, url)
-            return False
-
-        # Check for HTML instead of PDF (bot challenge page)
-        content_type = resp.headers.get("Content-Type", "").lower()
-        if "html" in content_type:
-            resp.close()
-            log.warning("Got HTML instead of PDF (bot block?): %s", url)
-            return False
-
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(dest_path, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fh.write(chunk)
-
-        # Verify file
-        if dest_path.stat().st_size < 1000:
-            log.warning("Downloaded file suspiciously small: %s", dest_path)
-            dest_path.unlink()
-            return False
-
-        with open(dest_path, "rb") as fh:
-            magic = fh.read(5)
-        if magic != b"%PDF-":
-            log.warning("Downloaded file is not a PDF: %s", dest_path)
-            dest_path.unlink()
-            return False
+    # Set headers to look like a same-origin navigation from the book page
+    if book_page_url:
+        session.headers["Referer"] = book_page_url
+        session.headers["Sec-Fetch-Site"] = "same-origin"
+    session.headers["Accept"] = "application/pdf,*/*;q=0.9"
 
+    try:
+        result = _download_engine.fetch(url, dest_path, session, resume=True, timeout=120)
+    finally:
         # Restore HTML Accept header for subsequent page fetches
         session.headers["Accept"] = BROWSER_HEADERS["Accept"]
         session.headers["Sec-Fetch-Site"] = "none"
 
+    if result.ok:
         return True
-
-    except requests.exceptions.RequestException as exc:
-        log.warning("PDF download request failed: %s", exc)
-        return False
+    if result.reason in (HTML, NOT_PDF):
+        log.warning("Got HTML instead of PDF (bot block?): %s", url)
+    elif result.reason:
+        log.warning("Downloaded file rejected (%s): %s", result.reason, url)
+    elif result.code:
+        log.warning("PDF download failed with HTTP %d: %s", result.code, url)
+    else:
+        log.warning("PDF download request failed: %s", url)
+    return False
 
 
 # ---------------------------------------------------------------------------
@@ -331,6 +317,8 @@ def process_series(conn, session, publisher_name, series_title, series_url,
             log.info("    Downloaded: %s", filename)
             insert_book(conn, doi, meta["title"], meta["authors"],
                        publisher_name, series_title, filename)
+            sha256, size, _ = pdf_store.take_digest(abs_path)
+            pdf_store.record(conn, doi, sha256, size)
             downloaded += 1
         else:
             log.warning("    Download failed")
@@ -372,8 +360,7 @@ def main():
 
     conn = init_db(args.db)
 
-    session = requests.Session()
-    session.headers.update(BROWSER_HEADERS)
+    session = pooled_session(BROWSER_HEADERS)
 
     total_downloaded = 0
     total_skipped = 0
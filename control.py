@@ -0,0 +1,115 @@
+"""
+Local control interface for long-running scrapers.
+
+A daemon (scrape_pdfs.py --daemon) listens on a Unix socket next to its
+database. Each connection carries one request and one reply, both a single
+line of JSON:
+
+    {"cmd": "pause", "publisher": "Wiley"}   ->   {"ok": true, ...}
+
+The commands are supplied by the daemon as a dict of handlers; each handler
+is called with the request's remaining fields as keyword arguments and
+returns a dict that is sent back with "ok": true. Unknown commands, bad
+arguments and exceptions in handlers are answered with "ok": false and an
+"error" message. The socket is only accessible to the user running the
+daemon.
+
+send_command() is the client side, used by scrape_pdfs.py --control.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+log = logging.getLogger(__name__)
+
+# Seconds a client waits for the daemon's reply
+CLIENT_TIMEOUT = 10
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            cmd = request.pop("cmd")
+            handler = self.server.handlers[cmd]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            reply = {"ok": False, "error": "unknown or malformed command"}
+        else:
+            try:
+                reply = {"ok": True, **handler(**request)}
+            except TypeError as e:
+                reply = {"ok": False, "error": f"bad arguments for {cmd}: {e}"}
+            except ValueError as e:
+                reply = {"ok": False, "error": str(e)}
+            except Exception as e:
+                log.exception("Control command %s failed", cmd)
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _is_live(path):
+    """Whether a daemon answers on the socket at path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class ControlServer:
+    """Serve control commands on a Unix socket in a background thread.
+
+    handlers maps command names to callables (see module docstring).
+    Raises RuntimeError if another daemon already listens on path; a
+    socket file left behind by a crashed daemon is replaced.
+    """
+
+    def __init__(self, path, handlers):
+        self.path = str(path)
+        if os.path.exists(self.path):
+            if _is_live(self.path):
+                raise RuntimeError(f"Another daemon is listening on {self.path}")
+            os.unlink(self.path)
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.handlers = handlers
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="control", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        log.info("Control socket: %s", self.path)
+
+    def close(self):
+        """Stop serving and remove the socket file."""
+        self._server.shutdown()
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def send_command(path, cmd, **args):
+    """Send one command to a daemon and return its reply dict.
+
+    Raises OSError if no daemon listens on path.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CLIENT_TIMEOUT)
+        sock.connect(str(path))
+        sock.sendall(json.dumps({"cmd": cmd, **args}).encode() + b"\n")
+        with sock.makefile("rb") as fh:
+            return json.loads(fh.readline())
@@ -25,6 +25,8 @@ from urllib.parse import quote_plus
 
 import requests
 
+import title_match
+
 log = logging.getLogger(__name__)
 
 DB_PATH = "linglitter.db"
@@ -198,36 +200,14 @@ def _sanitise_title(title):
     return title
 
 
-def _normalise(s):
-    """Lowercase, strip punctuation and extra whitespace."""
-    s = s.lower()
-    s = re.sub(r'[^\w\s]', ' ', s)
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
-
-
 def _title_match(our_title, candidate_title):
-    """Check if candidate is a reasonable match for our title."""
-    a = _normalise(our_title)
-    b = _normalise(candidate_title)
-    if not a or not b:
-        return False
-    # Exact match after normalisation
-    if a == b:
-        return True
-    # One contains the other (handles subtitle variations)
-    if a in b or b in a:
-        return True
-    # Token overlap: at least 70% of words in common
-    words_a = set(a.split())
-    words_b = set(b.split())
-    if not words_a or not words_b:
-        return False
-    overlap = len(words_a & words_b)
-    shorter = min(len(words_a), len(words_b))
-    if shorter > 0 and overlap / shorter >= 0.7:
-        return True
-    return False
+    """Check if candidate is a reasonable match for our title.
+
+    Equal or nested titles (subtitle variations) match, as do titles
+    sharing at least 70% of the shorter title's words (see title_match.py).
+    """
+    return (title_match.score(our_title, candidate_title, title_match.OVERLAP)
+            >= title_match.OVERLAP_THRESHOLD)
 
 
 def _extract_year(date_str):
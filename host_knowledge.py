@@ -0,0 +1,221 @@
+"""
+Learned per-host knowledge for the PDF downloaders.
+
+URL rewrite rules
+-----------------
+On many hosts the PDF URL is a fixed rewrite of the landing page URL, e.g.
+/doi/full/<doi> -> /doi/pdf/<doi> on publisher platforms, or
+/article/view/<id> -> /article/download/<id> on OJS sites. Whenever a PDF
+is downloaded for a landing page, the rewrite is recorded as a rule in the
+url_rules table; later landing pages of the same host and shape are
+rewritten directly, without visiting the landing page or parsing HTML.
+
+A rule is derived from the path segments of both URLs: segments of the
+landing path that reappear in the PDF URL become placeholders ({0}, {1},
+...), all other landing segments, and copied segments without digits
+(structural words like "doi" or "article"), must match literally. For
+https://example.org/doi/full/10.1111/abc -> https://example.org/doi/pdf/10.1111/abc
+the rule matches 4-segment paths with "doi" and "full" in positions 0 and
+1, and the template is https://example.org/doi/pdf/{2}/{3}.
+
+Every application is counted as a hit or miss; rules whose hit rate drops
+below MIN_HIT_RATE after MIN_TRIALS applications are no longer used.
+Landing pages on DOI resolvers are not learned from, as their rewrites
+depend on the DOI prefix rather than the host.
+
+Cookie priming
+--------------
+Some publishers only hand out a PDF to clients that visited the landing
+page first (session cookies); most hosts (arXiv, PMC, Zenodo, OJS,
+repositories) serve it directly. The host_priming table counts, per PDF
+host, how often a direct request worked and how often only a request
+after a landing page visit did. needs_priming() turns these counts into a
+decision; hosts without counts are probed with a direct request first.
+
+Used by scrape_pdfs.py.
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+# Hosts whose URLs are DOIs, not publisher paths
+RESOLVER_HOSTS = {"doi.org", "dx.doi.org", "www.doi.org"}
+
+# A rule is demoted once it has been applied MIN_TRIALS times with a hit
+# rate below MIN_HIT_RATE
+MIN_TRIALS = 4
+MIN_HIT_RATE = 0.5
+
+# HTTP codes after which a direct request is repeated with landing page
+# priming (403 includes HTML pages served instead of the PDF)
+PRIMING_RETRY_CODES = (401, 403)
+
+# Literal parts of a PDF URL that look like article-specific IDs (e.g. the
+# OJS galley number in /article/download/<id>/<galley>) make a rule that
+# would only ever fit one article
+ARTICLE_ID_RE = re.compile(r"\d{3,}")
+
+
+def ensure_table(conn):
+    """Create the url_rules and host_priming tables if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS url_rules (
+            host        TEXT NOT NULL,
+            shape       TEXT NOT NULL,
+            template    TEXT NOT NULL,
+            hits        INTEGER NOT NULL DEFAULT 0,
+            misses      INTEGER NOT NULL DEFAULT 0,
+            learned_at  TEXT NOT NULL,
+            used_at     TEXT,
+            PRIMARY KEY (host, shape, template)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS host_priming (
+            host         TEXT PRIMARY KEY,
+            direct_ok    INTEGER NOT NULL DEFAULT 0,
+            primed_only  INTEGER NOT NULL DEFAULT 0,
+            updated_at   TEXT
+        )
+    """)
+    conn.commit()
+
+
+def _segments(path):
+    return [seg for seg in path.split("/") if seg]
+
+
+def derive_rule(landing_url, pdf_url):
+    """Derive the rewrite rule landing_url -> pdf_url.
+
+    Returns (host, shape, template), or None if there is no generalisable
+    rewrite (nothing article-specific carries over from the landing path,
+    or the PDF URL contains IDs not found in it) or the landing page is on
+    a DOI resolver.
+    """
+    landing = urlparse(landing_url)
+    target = urlparse(pdf_url)
+    host = landing.netloc.lower()
+    if not host or host in RESOLVER_HOSTS or not target.netloc:
+        return None
+
+    land_segs = _segments(landing.path)
+    fixed = {}
+    used = set()
+    parts = []
+    for seg in _segments(target.path):
+        if seg in land_segs:
+            i = land_segs.index(seg)
+            used.add(i)
+            parts.append("{%d}" % i)
+        elif ARTICLE_ID_RE.search(seg):
+            return None
+        else:
+            parts.append(seg.replace("{", "{{").replace("}", "}}"))
+    if not any(re.search(r"\d", land_segs[i]) for i in used):
+        return None  # nothing article-specific is carried over
+    if ARTICLE_ID_RE.search(target.query):
+        return None
+
+    for i, seg in enumerate(land_segs):
+        if i not in used or not re.search(r"\d", seg):
+            fixed[str(i)] = seg
+    shape = json.dumps({"n": len(land_segs), "fixed": fixed}, sort_keys=True)
+    template = f"{target.scheme}://{target.netloc}/" + "/".join(parts)
+    if target.path.endswith("/"):
+        template += "/"
+    if target.query:
+        template += "?" + target.query.replace("{", "{{").replace("}", "}}")
+    return host, shape, template
+
+
+def _matches(shape, land_segs):
+    shape = json.loads(shape)
+    return (shape["n"] == len(land_segs)
+            and all(land_segs[int(i)] == seg for i, seg in shape["fixed"].items()))
+
+
+def predict(conn, landing_url):
+    """Rewrite a landing URL with the best working rule of its host.
+
+    Returns (pdf_url, rule) where rule identifies the rule for
+    record_outcome, or (None, None) if no rule applies.
+    """
+    parsed = urlparse(landing_url)
+    host = parsed.netloc.lower()
+    land_segs = _segments(parsed.path)
+    rows = conn.execute("""
+        SELECT shape, template FROM url_rules
+        WHERE host = ?
+          AND NOT (hits + misses >= ? AND hits < ? * (hits + misses))
+        ORDER BY CAST(hits AS REAL) / (hits + misses) DESC, hits DESC
+    """, (host, MIN_TRIALS, MIN_HIT_RATE)).fetchall()
+    for shape, template in rows:
+        if _matches(shape, land_segs):
+            return template.format(*land_segs), (host, shape, template)
+    return None, None
+
+
+def learn(conn, landing_url, pdf_url):
+    """Record the rewrite from a landing page to the PDF that was downloaded for it.
+
+    A newly learned rule starts with one hit (the observation it was
+    derived from). Returns True if a new rule was added.
+    """
+    rule = derive_rule(landing_url, pdf_url)
+    if rule is None:
+        return False
+    cur = conn.execute("""
+        INSERT OR IGNORE INTO url_rules (host, shape, template, hits, misses, learned_at)
+        VALUES (?, ?, ?, 1, 0, ?)
+    """, rule + (datetime.now().isoformat(),))
+    conn.commit()
+    if cur.rowcount:
+        log.info("  Learned URL rule for %s: %s", rule[0], rule[2])
+    return cur.rowcount == 1
+
+
+def record_outcome(conn, rule, success):
+    """Count a hit or miss for a rule returned by predict()."""
+    column = "hits" if success else "misses"
+    conn.execute(f"""
+        UPDATE url_rules SET {column} = {column} + 1, used_at = ?
+        WHERE host = ? AND shape = ? AND template = ?
+    """, (datetime.now().isoformat(),) + tuple(rule))
+    conn.commit()
+
+
+# ---------------------------------------------------------------------------
+# Cookie priming
+# ---------------------------------------------------------------------------
+
+def needs_priming(conn, host):
+    """Whether PDF requests to host should be preceded by a landing page visit.
+
+    Returns True if downloads from the host needed priming more often than
+    they worked without, False if direct requests work, or None if the
+    host has not been seen yet.
+    """
+    row = conn.execute("""
+        SELECT direct_ok, primed_only FROM host_priming WHERE host = ?
+    """, (host.lower(),)).fetchone()
+    if row is None or not (row[0] or row[1]):
+        return None
+    return row[1] >= row[0]
+
+
+def record_priming(conn, host, direct):
+    """Count a successful download: direct=True if it worked without priming,
+    False if only the request after a landing page visit succeeded."""
+    column = "direct_ok" if direct else "primed_only"
+    conn.execute(f"""
+        INSERT INTO host_priming (host, {column}, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(host) DO UPDATE SET {column} = {column} + 1,
+                                        updated_at = excluded.updated_at
+    """, (host.lower(), datetime.now().isoformat()))
+    conn.commit()
@@ -4,7 +4,9 @@ Integrate manually downloaded PDFs into the data directory structure.
 
 Scans the manual_dir for PDF files, matches them to articles in linglitter.db
 by decoding the filename to a DOI, moves matched files to the appropriate
-location under pdf_dir, and updates the database.
+location under pdf_dir, and updates the database. Files go through the
+content-addressed PDF store (see pdf_store.py); a file identical to the
+one already in place is removed from manual_dir without asking.
 
 Usage:
     python integrate_manual.py
@@ -16,12 +18,13 @@ import argparse
 import json
 import logging
 import re
-import shutil
 import sqlite3
 import sys
 from datetime import datetime
 from pathlib import Path
 
+import pdf_store
+
 log = logging.getLogger(__name__)
 
 
@@ -103,7 +106,8 @@ def format_size(size_bytes):
 def handle_existing_file(source_path, dest_path):
     """Handle case where destination file already exists.
 
-    Prompts user to choose:
+    If both files have the same content, the new file is removed without
+    asking. Otherwise prompts user to choose:
     1. Leave both in place (skip this file)
     2. Replace existing target with new file
     3. Remove the new file instead of moving it
@@ -112,6 +116,10 @@ def handle_existing_file(source_path, dest_path):
     """
     source_size = source_path.stat().st_size
     dest_size = dest_path.stat().st_size
+    if (source_size == dest_size
+            and pdf_store.file_digest(source_path) == pdf_store.file_digest(dest_path)):
+        log.info("  Identical to existing target file")
+        return "remove"
 
     print()
     print("=" * 60)
@@ -174,6 +182,7 @@ def main():
         return 1
 
     conn = sqlite3.connect(args.db)
+    pdf_store.ensure_columns(conn)
 
     # Build lookup table: encoded_doi -> (doi, publisher, journal, year)
     log.info("Building DOI lookup table from database...")
@@ -240,13 +249,19 @@ def main():
                     dest_abs.unlink()
                     log.info("  Replacing existing target file")
 
-            # Move the file
-            shutil.move(str(pdf_path), str(dest_abs))
+            # Move the file (via the content-addressed store)
+            sha256, size, is_new = pdf_store.ingest(pdf_path, dest_abs)
             log.info("  Moved to: %s", dest_rel)
+            if not is_new:
+                others = pdf_store.dois_with_digest(conn, sha256, exclude=doi)
+                if others:
+                    log.warning("  Same content is already stored for: %s",
+                                ", ".join(others))
 
             # Update database
             source_url = f"https://doi.org/{doi}"
             update_article(conn, doi, source_url, dest_rel)
+            pdf_store.record(conn, doi, sha256, size)
             log.info("  Updated database: source=%s, file=%s", source_url, dest_rel)
 
             matched += 1
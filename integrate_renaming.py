@@ -20,18 +20,11 @@ import shutil
 import sqlite3
 import sys
 from datetime import datetime
-from difflib import SequenceMatcher
 from pathlib import Path
 
-log = logging.getLogger(__name__)
+import title_match
 
-# Try to use rapidfuzz for better fuzzy matching, fall back to difflib
-try:
-    from rapidfuzz import fuzz
-    HAVE_RAPIDFUZZ = True
-except ImportError:
-    HAVE_RAPIDFUZZ = False
-    log.debug("rapidfuzz not available, using difflib for fuzzy matching")
+log = logging.getLogger(__name__)
 
 
 def encode_doi_for_filename(doi):
@@ -49,67 +42,18 @@ def load_config(config_path):
         return json.load(fh)
 
 
-def normalize_text(text):
-    """Normalize text for fuzzy matching.
-
-    Lowercases, removes punctuation, and collapses whitespace.
-    """
-    if not text:
-        return ""
-    # Lowercase
-    text = text.lower()
-    # Replace punctuation with spaces
-    text = re.sub(r'[^\w\s]', ' ', text)
-    # Collapse whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-
-def fuzzy_match_score(query, candidate):
-    """Calculate fuzzy match score between query and candidate.
-
-    Returns a score from 0-100, where 100 is a perfect match.
-    Handles prefix matching (query may be beginning of candidate).
-    """
-    query_norm = normalize_text(query)
-    candidate_norm = normalize_text(candidate)
-
-    if not query_norm or not candidate_norm:
-        return 0
-
-    if HAVE_RAPIDFUZZ:
-        # Use partial_ratio for substring/prefix matching
-        # and ratio for overall similarity
-        partial = fuzz.partial_ratio(query_norm, candidate_norm)
-        full = fuzz.ratio(query_norm, candidate_norm)
-
-        # If query is a prefix of candidate, boost the score
-        if candidate_norm.startswith(query_norm):
-            return max(partial, 95)  # High score for prefix match
-
-        # Return the better of partial and full match
-        return max(partial, full)
-    else:
-        # Fallback to difflib
-        # Check prefix match first
-        if candidate_norm.startswith(query_norm):
-            return 95
-
-        # Use SequenceMatcher for similarity
-        ratio = SequenceMatcher(None, query_norm, candidate_norm).ratio()
-
-        # Also check if query is a substring
-        if query_norm in candidate_norm:
-            # Score based on how much of the candidate is covered
-            coverage = len(query_norm) / len(candidate_norm)
-            return max(int(ratio * 100), int(70 + coverage * 25))
+# Per-journal title indexes, built on first use (see find_matching_articles)
+_journal_articles = {}
 
-        return int(ratio * 100)
 
-
-def find_matching_articles(conn, filename, journal, threshold=60, limit=5):
+def find_matching_articles(conn, filename, journal,
+                           threshold=title_match.SUGGEST_THRESHOLD, limit=5):
     """Find articles that fuzzy-match the filename.
 
+    The titles of a journal's articles are loaded and prepared for
+    matching once per run (see title_match.py), then reused for all files
+    of that journal.
+
     Args:
         conn: Database connection
         filename: The PDF filename (without .pdf suffix)
@@ -121,31 +65,17 @@ def find_matching_articles(conn, filename, journal, threshold=60, limit=5):
         List of (score, doi, title, authors, year, volume, issue, publisher)
         sorted by score descending.
     """
-    # Query articles for this journal
-    query = """
-        SELECT doi, title, authors, year, volume, issue, publisher
-        FROM articles
-        WHERE journal = ?
-    """
-    rows = conn.execute(query, (journal,)).fetchall()
-
-    if not rows:
-        return []
-
-    # Score each article
-    matches = []
-    for row in rows:
-        doi, title, authors, year, volume, issue, publisher = row
-        if not title:
-            continue
-
-        score = fuzzy_match_score(filename, title)
-        if score >= threshold:
-            matches.append((score, doi, title, authors, year, volume, issue, publisher))
+    if journal not in _journal_articles:
+        rows = conn.execute("""
+            SELECT doi, title, authors, year, volume, issue, publisher
+            FROM articles
+            WHERE journal = ? AND title IS NOT NULL AND title != ''
+        """, (journal,)).fetchall()
+        _journal_articles[journal] = (rows, title_match.TitleIndex([row[1] for row in rows]))
+    rows, index = _journal_articles[journal]
 
-    # Sort by score descending and limit
-    matches.sort(key=lambda x: x[0], reverse=True)
-    return matches[:limit]
+    return [(score,) + tuple(rows[i])
+            for score, i in index.extract(filename, title_match.PREFIX, threshold, limit)]
 
 
 def format_citation(authors, year, title, journal, volume, issue):
@@ -217,7 +147,7 @@ def ask_user(pdf_path, filename, match, journal):
     print(f"  Filename: {filename}")
     print(f"  Journal:  {journal}")
     print()
-    print(f"MATCH (score: {score}/100):")
+    print(f"MATCH (score: {score:.0f}/100):")
     print(f"  DOI:      {doi}")
     print(f"  Title:    {title}")
     citation = format_citation(authors, year, title, journal, volume, issue)
@@ -352,7 +282,7 @@ def main():
                         help="Path to config JSON (default: config.json)")
     parser.add_argument("--db", type=str, default="linglitter.db",
                         help="Path to SQLite database (default: linglitter.db)")
-    parser.add_argument("--threshold", type=int, default=60,
+    parser.add_argument("--threshold", type=int, default=title_match.SUGGEST_THRESHOLD,
                         help="Minimum fuzzy match score 0-100 (default: 60)")
     args = parser.parse_args()
 
@@ -381,7 +311,7 @@ def main():
     conn = sqlite3.connect(args.db)
 
     # Report fuzzy matching backend
-    if HAVE_RAPIDFUZZ:
+    if title_match.HAVE_RAPIDFUZZ:
         log.info("Using rapidfuzz for fuzzy matching")
     else:
         log.info("Using difflib for fuzzy matching (install rapidfuzz for better results)")
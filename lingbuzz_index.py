@@ -0,0 +1,251 @@
+"""
+Local index of LingBuzz listings for offline title matching.
+
+search_lingbuzz in scrape_pdfs.py used to run one live title search per
+article, under LingBuzz's 10 s request spacing, for every DOI that no
+other source could serve. Instead, scrape_pdfs.py --sync-lingbuzz copies
+the LingBuzz listings (paper id, title, authors, date) into the
+lingbuzz_papers table, and titles are matched locally; LingBuzz itself is
+only contacted to download the matched PDF.
+
+Syncs are incremental: the listing is read from the newest papers on,
+following its paging links, down to the newest paper of the last sync
+that got that far. Until one sync has read the listing to its end, the
+sync then goes on from the page where the previous one stopped (after a
+failed fetch, an interrupt or MAX_PAGES), so no older pages are skipped;
+lingbuzz_sync records that progress. Entries on the pages read are
+refreshed, so recent revisions of titles are picked up. is_complete()
+tells whether the index covers the whole listing.
+
+Titles are indexed by their words (lingbuzz_tokens). candidates() returns
+the papers sharing most words with a title; the caller scores these few
+with its title similarity measure.
+
+Used by scrape_pdfs.py.
+"""
+
+import logging
+import re
+from datetime import datetime
+from html import unescape as html_unescape
+from urllib.parse import urljoin
+
+log = logging.getLogger(__name__)
+
+# Paper links in LingBuzz listings: <a href="/lingbuzz/NNNNNN">title</a>
+PAPER_LINK_RE = re.compile(r'<a\s+href="(?:[^"]*?)/lingbuzz/(\d{6})/?"[^>]*>\s*(.*?)\s*</a>',
+                           re.IGNORECASE | re.DOTALL)
+# Paging links of the listing (…?start=N)
+NEXT_PAGE_RE = re.compile(r'href="([^"]*[?&;]start=(\d+)[^"]*)"', re.IGNORECASE)
+CELL_RE = re.compile(r'<td[^>]*>(.*?)</td>', re.IGNORECASE | re.DOTALL)
+DATE_RE = re.compile(
+    r'\b(\d{4}-\d{2}(?:-\d{2})?|(?:January|February|March|April|May|June|July|August|'
+    r'September|October|November|December)\s+\d{4})\b')
+TAG_RE = re.compile(r'<[^>]+>')
+
+# Words shorter than this (other than numbers) are not indexed
+MIN_TOKEN_LENGTH = 3
+# Safety limit of listing pages read per sync
+MAX_PAGES = 1000
+
+
+def ensure_table(conn):
+    """Create the lingbuzz_papers and lingbuzz_tokens tables if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lingbuzz_papers (
+            id          INTEGER PRIMARY KEY,
+            title       TEXT NOT NULL,
+            authors     TEXT,
+            date        TEXT,
+            synced_at   TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lingbuzz_tokens (
+            token  TEXT NOT NULL,
+            id     INTEGER NOT NULL,
+            PRIMARY KEY (token, id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lingbuzz_sync (
+            key    TEXT PRIMARY KEY,
+            value  TEXT
+        )
+    """)
+    conn.commit()
+
+
+def tokens(title):
+    """Distinct lower-case words of a title used for indexing and lookup."""
+    words = re.sub(r'[^\w\s]', ' ', title.lower()).split()
+    return sorted({w for w in words if len(w) >= MIN_TOKEN_LENGTH or w.isdigit()})
+
+
+def _text(fragment):
+    text = " ".join(html_unescape(TAG_RE.sub(" ", fragment)).split())
+    return re.sub(r'\s+([,;])', r'\1', text)
+
+
+def parse_listing(html):
+    """Papers on a listing page as dicts with id, title, authors, date.
+
+    Each table row with a paper link is one paper; authors are taken from
+    the row's first cell and the date from anything date-like in the row
+    (both None if not found).
+    """
+    papers = []
+    seen = set()
+    for row in re.split(r'<tr[\s>]', html, flags=re.IGNORECASE)[1:]:
+        link = PAPER_LINK_RE.search(row)
+        if not link:
+            continue
+        paper_id = int(link.group(1))
+        title = _text(link.group(2))
+        if paper_id in seen or len(title) < 10:
+            continue
+        seen.add(paper_id)
+        cells = CELL_RE.findall(row)
+        authors = _text(cells[0]) if cells and link.group(0) not in cells[0] else None
+        date = DATE_RE.search(_text(row))
+        papers.append({
+            "id": paper_id,
+            "title": title,
+            "authors": authors or None,
+            "date": date.group(1) if date else None,
+        })
+    return papers
+
+
+def _next_page(html, page_url, offset):
+    """URL and offset of the following listing page, or (None, None)."""
+    pages = [(int(start), href) for href, start in NEXT_PAGE_RE.findall(html)
+             if int(start) > offset]
+    if not pages:
+        return None, None
+    start, href = min(pages)
+    return urljoin(page_url, html_unescape(href)), start
+
+
+def sync_state(conn):
+    """Progress of the syncs as a dict (all values are strings).
+
+    Keys: newest_id (the listing is indexed from the top down to this
+    paper), resume_url and resume_offset (the page an unfinished sync goes
+    on from), complete (set once a sync read the listing to its end).
+    """
+    return dict(conn.execute("SELECT key, value FROM lingbuzz_sync").fetchall())
+
+
+def _set_state(conn, **values):
+    for key, value in values.items():
+        if value is None:
+            conn.execute("DELETE FROM lingbuzz_sync WHERE key = ?", (key,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO lingbuzz_sync (key, value) VALUES (?, ?)",
+                         (key, str(value)))
+    conn.commit()
+
+
+def is_complete(conn):
+    """True once a sync has read the whole listing into the index."""
+    return "complete" in sync_state(conn)
+
+
+def store(conn, papers):
+    """Insert or refresh listing entries and their title words."""
+    now = datetime.now().isoformat()
+    for paper in papers:
+        conn.execute("""
+            INSERT OR REPLACE INTO lingbuzz_papers (id, title, authors, date, synced_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (paper["id"], paper["title"], paper["authors"], paper["date"], now))
+        conn.execute("DELETE FROM lingbuzz_tokens WHERE id = ?", (paper["id"],))
+        conn.executemany("INSERT INTO lingbuzz_tokens (token, id) VALUES (?, ?)",
+                         [(token, paper["id"]) for token in tokens(paper["title"])])
+    conn.commit()
+
+
+def sync(conn, fetch, start_url):
+    """Bring the index up to date with the LingBuzz listing.
+
+    fetch(url) returns the HTML of a listing page, or None on failure (it
+    is responsible for rate limiting). start_url is the first listing page
+    (newest papers).
+
+    New papers are read down to the newest paper of an earlier sync. If
+    no sync has read the listing to its end yet, reading then goes on from
+    where the last one stopped (or from the top, if none got anywhere),
+    recording after each page where to resume. Listing offsets only grow
+    as papers are added, so a resumed page may repeat papers, but none are
+    skipped.
+
+    Returns the number of papers added to the index.
+    """
+    state = sync_state(conn)
+    known = int(state.get("newest_id", 0))
+    before = conn.execute("SELECT COUNT(*) FROM lingbuzz_papers").fetchone()[0]
+    url, offset = start_url, 0
+    # Past known papers (or without any), every page read extends the
+    # index downwards and becomes the resume point
+    backfill = not known
+    newest = None
+    for page in range(MAX_PAGES):
+        html = fetch(url)
+        if html is None:
+            log.warning("LingBuzz listing page could not be fetched: %s", url)
+            break
+        papers = parse_listing(html)
+        store(conn, papers)
+        log.info("  LingBuzz listing page %d: %d papers", page + 1, len(papers))
+        if not papers:
+            break
+        ids = [p["id"] for p in papers]
+        if newest is None:
+            newest = max(ids)
+            if backfill:
+                _set_state(conn, newest_id=newest)
+        url, offset = _next_page(html, url, offset)
+        if url is None:
+            log.info("  LingBuzz listing read to its end")
+            _set_state(conn, newest_id=newest, complete=1,
+                       resume_url=None, resume_offset=None)
+            break
+        if backfill:
+            _set_state(conn, resume_url=url, resume_offset=offset)
+        elif max(ids) <= known:
+            # Caught up with an earlier sync
+            _set_state(conn, newest_id=newest)
+            if "complete" in state:
+                break
+            backfill = True
+            if "resume_url" in state:
+                url, offset = state["resume_url"], int(state["resume_offset"])
+                log.info("  Resuming the LingBuzz listing at offset %d", offset)
+    after = conn.execute("SELECT COUNT(*) FROM lingbuzz_papers").fetchone()[0]
+    return after - before
+
+
+def candidates(conn, title, limit=20):
+    """Indexed papers sharing most title words with title.
+
+    Shared words are weighted by their rarity in the index (1 / number of
+    titles containing them), so that common words like "syntax" count
+    less than rare ones. Returns a list of (id, title), best first.
+    """
+    words = tokens(title)
+    if not words:
+        return []
+    placeholders = ",".join("?" * len(words))
+    return conn.execute(f"""
+        WITH weights AS (
+            SELECT token, 1.0 / COUNT(*) AS weight FROM lingbuzz_tokens
+            WHERE token IN ({placeholders}) GROUP BY token
+        ), scores AS (
+            SELECT t.id, SUM(w.weight) AS score
+            FROM lingbuzz_tokens AS t JOIN weights AS w ON w.token = t.token
+            GROUP BY t.id ORDER BY score DESC LIMIT ?
+        )
+        SELECT p.id, p.title FROM scores AS s JOIN lingbuzz_papers AS p ON p.id = s.id
+        ORDER BY s.score DESC
+    """, words + [limit]).fetchall()
@@ -0,0 +1,352 @@
+"""
+Live metrics of the PDF scrapers.
+
+Apart from the log, a multi-day run of scrape_pdfs.py, scrape_repo.py or
+scrape_openlibhum.py only reported the stats dict printed at the end. The
+scrapers now count what they do in a process-wide registry here, and an
+Exporter thread writes the current values every few seconds:
+
+- into the metrics table of the database (one row per series and script,
+  replaced on every update), and/or
+- into a Prometheus text file, for node_exporter's textfile collector.
+
+Series (all names prefixed with "linglitter_"):
+
+    articles_total{outcome}              articles processed, by result
+    articles_per_hour{outcome}           the same over the last hour
+    requests_total{source,status}        HTTP responses per API or "web"
+    host_requests_total{host}            HTTP responses per host
+    request_seconds{source}              time to response headers (histogram)
+    downloads_total{result}              PDF transfers, by result
+    download_seconds{result}             duration of PDF transfers (histogram)
+    downloaded_bytes_total{host}         size of the PDFs stored
+    wait_seconds_total{reason}           time spent in politeness waits
+    queue_backlog                        articles still queued
+    uptime_seconds                       time since the run started
+
+Every series carries a script label (the name of the scraper). Counters
+start from zero in every run.
+
+Used by scrape_pdfs.py, scrape_repo.py, scrape_openlibhum.py and
+pdf_download.py.
+"""
+
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+PREFIX = "linglitter_"
+
+# Source label of page and PDF requests (API requests carry the service name)
+WEB = "web"
+
+# Upper bounds of the histogram buckets (seconds)
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Seconds between two updates of the metrics table and text file
+DEFAULT_INTERVAL = 60
+# Window of articles_per_hour (seconds); shorter runs are extrapolated,
+# but over at least RATE_MIN_SPAN seconds
+RATE_WINDOW = 3600
+RATE_MIN_SPAN = 300
+
+HELP = {
+    "articles_total": "Articles processed, by outcome",
+    "articles_per_hour": "Articles processed per hour over the last hour, by outcome",
+    "requests_total": "HTTP responses, by source and status code",
+    "host_requests_total": "HTTP responses, by host",
+    "request_seconds": "Time to response headers in seconds",
+    "downloads_total": "PDF transfers, by result",
+    "download_seconds": "Duration of PDF transfers in seconds",
+    "downloaded_bytes_total": "Bytes of PDFs stored, by host",
+    "wait_seconds_total": "Seconds spent waiting for politeness and rate limits, by reason",
+    "queue_backlog": "Articles still queued",
+    "uptime_seconds": "Seconds since the run started",
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_gauges = {}      # (name, labels) -> value
+_articles = deque()  # (time, outcome) of the articles of the last RATE_WINDOW
+_started = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def reset():
+    """Forget all values (a new run, or a benchmark between configurations)."""
+    global _started
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+        _articles.clear()
+        _started = time.time()
+
+
+def count(name, n=1, **labels):
+    """Add n to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def observe(name, value, **labels):
+    """Add a value (seconds) to a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        hist[bisect.bisect_left(BUCKETS, value)] += 1
+        hist[-1] += value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+# ---------------------------------------------------------------------------
+# What the scrapers report
+# ---------------------------------------------------------------------------
+
+def article(outcome):
+    """Count one processed article (outcome as in the scraper's stats)."""
+    count("articles_total", outcome=outcome)
+    with _lock:
+        _articles.append((time.time(), outcome))
+
+
+def response(source, url, status, seconds):
+    """Count one HTTP response of an API (source) or web request (WEB)."""
+    count("requests_total", source=source, status=status)
+    count("host_requests_total", host=urlparse(url).netloc)
+    observe("request_seconds", seconds, source=source)
+
+
+def waited(reason, seconds):
+    """Add time spent waiting for politeness or a rate limit."""
+    if seconds and seconds > 0:
+        count("wait_seconds_total", seconds, reason=reason)
+
+
+def download(url, result, seconds, size=0):
+    """Count one PDF transfer; result is "ok", a rejection reason, "http" or "error"."""
+    count("downloads_total", result=result)
+    observe("download_seconds", seconds, result=result)
+    if size:
+        count("downloaded_bytes_total", size, host=urlparse(url).netloc)
+
+
+def track_session(session, source=WEB):
+    """Count every response of a requests session (including redirects)."""
+    def hook(resp, *args, **kwargs):
+        response(source, resp.url, resp.status_code, resp.elapsed.total_seconds())
+    session.hooks["response"].append(hook)
+    return session
+
+
+def totals(name, label):
+    """{label value: sum} of a counter over its other labels."""
+    result = {}
+    with _lock:
+        for (counter, labels), value in _counters.items():
+            if counter == name:
+                key = dict(labels).get(label)
+                result[key] = result.get(key, 0) + value
+    return result
+
+
+def articles_per_hour():
+    """{outcome: articles per hour} over the last RATE_WINDOW seconds."""
+    now = time.time()
+    with _lock:
+        while _articles and _articles[0][0] < now - RATE_WINDOW:
+            _articles.popleft()
+        outcomes = [outcome for _, outcome in _articles]
+        span = min(RATE_WINDOW, max(now - _started, RATE_MIN_SPAN))
+    rates = {}
+    for outcome in outcomes:
+        rates[outcome] = rates.get(outcome, 0) + 3600 / span
+    return rates
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def samples(script):
+    """Current values as Prometheus samples.
+
+    Returns a list of (metric, type, name, label_text, value), where name
+    is the sample name (e.g. with _bucket for histograms) without PREFIX.
+    """
+    rates = articles_per_hour()
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(hist) for key, hist in _histograms.items()}
+        gauges = dict(_gauges)
+        uptime = time.time() - _started
+    for outcome, rate in rates.items():
+        gauges[_key("articles_per_hour", {"outcome": outcome})] = rate
+    gauges[_key("uptime_seconds", {})] = uptime
+
+    script_label = (("script", script),)
+    result = []
+    for (name, labels), value in sorted(counters.items()):
+        result.append((name, "counter", name, _label_text(script_label + labels), value))
+    for (name, labels), value in sorted(gauges.items()):
+        result.append((name, "gauge", name, _label_text(script_label + labels), value))
+    for (name, labels), hist in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), hist[:-1]):
+            cumulative += n
+            label_text = _label_text(script_label + labels + (("le", str(bound)),))
+            result.append((name, "histogram", name + "_bucket", label_text, cumulative))
+        label_text = _label_text(script_label + labels)
+        result.append((name, "histogram", name + "_sum", label_text, hist[-1]))
+        result.append((name, "histogram", name + "_count", label_text, cumulative))
+    return result
+
+
+def render_text(script):
+    """Current values in the Prometheus text exposition format."""
+    lines = []
+    seen = set()
+    for metric, kind, name, label_text, value in samples(script):
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# HELP {PREFIX}{metric} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {PREFIX}{metric} {kind}")
+        text = str(value) if isinstance(value, int) else repr(round(value, 6))
+        lines.append(f"{PREFIX}{name}{label_text} {text}")
+    return "\n".join(lines) + "\n"
+
+
+def ensure_table(conn):
+    """Create the metrics table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            script      TEXT NOT NULL,
+            name        TEXT NOT NULL,
+            labels      TEXT NOT NULL,
+            value       REAL NOT NULL,
+            updated_at  TEXT NOT NULL,
+            PRIMARY KEY (script, name, labels)
+        )
+    """)
+    conn.commit()
+
+
+class Exporter:
+    """Background thread writing the metrics every interval seconds.
+
+    Writes to the metrics table of the database at db_path (if table is
+    true) and to textfile (if given; "{script}" in the path is replaced by
+    the script name), each time replacing the previous values of this
+    script. gauges maps gauge names to functions of a connection to the
+    database that are evaluated before every update (e.g. the queue
+    backlog).
+    """
+
+    def __init__(self, script, db_path, table=True, textfile=None,
+                 interval=DEFAULT_INTERVAL, gauges=None):
+        self.script = script
+        self.table = table
+        self.textfile = Path(textfile.replace("{script}", script)) if textfile else None
+        self.interval = interval
+        self.gauges = gauges or {}
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        if table:
+            ensure_table(self.conn)
+            self.conn.execute("DELETE FROM metrics WHERE script = ?", (script,))
+            self.conn.commit()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        log.info("Metrics every %ds:%s%s", self.interval,
+                 " metrics table" if self.table else "",
+                 f" {self.textfile}" if self.textfile else "")
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.update()
+            except (OSError, sqlite3.Error) as e:
+                log.warning("Metrics update failed: %s", e)
+
+    def update(self):
+        """Evaluate the gauges and write the current values."""
+        with self._lock:
+            for name, fn in self.gauges.items():
+                set_gauge(name, fn(self.conn))
+            if self.table:
+                now = datetime.now().isoformat()
+                self.conn.execute("DELETE FROM metrics WHERE script = ?", (self.script,))
+                self.conn.executemany("""
+                    INSERT OR REPLACE INTO metrics (script, name, labels, value, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(self.script, PREFIX + name, label_text, value, now)
+                      for _, _, name, label_text, value in samples(self.script)])
+                self.conn.commit()
+            if self.textfile is not None:
+                # Written under a temporary name and renamed, so that the
+                # collector never reads a half-written file
+                self.textfile.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.textfile.with_name(f".{self.textfile.name}.{os.getpid()}.tmp")
+                tmp.write_text(render_text(self.script))
+                os.replace(tmp, self.textfile)
+
+    def close(self):
+        """Stop the thread after writing the final values."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        try:
+            self.update()
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Metrics update failed: %s", e)
+        self.conn.close()
+
+
+def start_exporter(script, db_path, config, gauges=None):
+    """Start an Exporter as configured in the optional "metrics" config section.
+
+    Returns the running exporter, or None if metrics are switched off
+    ("enabled": false, or neither the table nor a text file is wanted).
+    """
+    cfg = config.get("metrics", {})
+    if not cfg.get("enabled", True):
+        return None
+    use_table = cfg.get("sqlite", True)
+    textfile = cfg.get("textfile")
+    if not use_table and not textfile:
+        return None
+    return Exporter(script, db_path, use_table, textfile,
+                    interval=cfg.get("interval", DEFAULT_INTERVAL), gauges=gauges).start()
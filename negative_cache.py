@@ -0,0 +1,138 @@
+"""
+Negative cache of PDF URLs and hosts that recently failed.
+
+The URLs Semantic Scholar, OpenAlex or CORE report are often the same for
+many articles of a host, and a URL that answered 404 or a bot challenge for
+one article will do so for the next. The bad_urls table remembers such
+failures, with their outcome and an expiry time, so that the download
+cascade can skip them without a network round trip.
+
+Entries are kept under one of two keys:
+
+- url: the exact URL, for answers specific to it (403, 404/410, or a body
+  that is a duplicate of another article's file);
+- pattern: host plus first path segment (e.g. "www.example.org/pdf"), for
+  Cloudflare-type browser challenges, which protect whole sites or
+  sections of them.
+
+Each outcome has its own lifetime (see OUTCOMES). Server errors, rate
+limits (handled by rate_limit.py) and network errors are not cached, and a
+successful download clears the entries for its URL and pattern.
+
+Used by scrape_pdfs.py.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+URL = "url"
+PATTERN = "pattern"
+
+CHALLENGE = "challenge"
+FORBIDDEN = "forbidden"
+GONE = "gone"
+DUPLICATE = "duplicate"
+
+# Outcome -> (key kind, lifetime in seconds)
+OUTCOMES = {
+    CHALLENGE: (PATTERN, 6 * 3600),
+    FORBIDDEN: (URL, 24 * 3600),
+    GONE: (URL, 30 * 86400),
+    DUPLICATE: (URL, 7 * 86400),
+}
+
+# HTTP status codes (as reported by the downloaders) -> outcome
+CODE_OUTCOMES = {
+    401: FORBIDDEN,
+    403: FORBIDDEN,
+    404: GONE,
+    410: GONE,
+    409: DUPLICATE,
+}
+
+
+def url_pattern(url):
+    """Host plus first path segment of a URL, e.g. "www.example.org/pdf".
+
+    A lone path segment is a file name, not a section: the pattern of
+    https://example.org/paper.pdf is "example.org/".
+    """
+    parsed = urlparse(url)
+    segments = [seg for seg in parsed.path.split("/") if seg]
+    first = segments[0] if len(segments) > 1 else ""
+    return f"{parsed.netloc.lower()}/{first}"
+
+
+class NegativeCache:
+    """Persisted record of recently failed URLs and challenged URL patterns.
+
+    The connection is only used under the cache's lock, so a cache built
+    on a connection opened with check_same_thread=False can be shared by
+    threads. clock can be replaced for simulations.
+    """
+
+    def __init__(self, conn, clock=time.time):
+        self.conn = conn
+        self.clock = clock
+        self.skips = 0
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bad_urls (
+                kind        TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                outcome     TEXT NOT NULL,
+                code        INTEGER NOT NULL,
+                expires_at  REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self.conn.execute("DELETE FROM bad_urls WHERE expires_at <= ?", (self.clock(),))
+        self.conn.commit()
+
+    def lookup(self, url):
+        """Unexpired entry for a URL or its pattern.
+
+        Returns (outcome, code, expires_at), or None if the URL may be tried.
+        """
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT outcome, code, expires_at FROM bad_urls
+                WHERE ((kind = ? AND key = ?) OR (kind = ? AND key = ?))
+                  AND expires_at > ?
+                ORDER BY expires_at DESC LIMIT 1
+            """, (URL, url, PATTERN, url_pattern(url), self.clock())).fetchone()
+            if row:
+                self.skips += 1
+        return row
+
+    def add(self, url, outcome, code):
+        """Record a failed download of url with one of the OUTCOMES."""
+        kind, lifetime = OUTCOMES[outcome]
+        key = url if kind == URL else url_pattern(url)
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO bad_urls (kind, key, outcome, code, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (kind, key, outcome, code, self.clock() + lifetime))
+            self.conn.commit()
+        log.debug("  Negative cache: %s %s (%s) for %.0fh", kind, key, outcome,
+                  lifetime / 3600)
+
+    def record_failure(self, url, code):
+        """Record a failed download by its HTTP code; codes not in CODE_OUTCOMES
+        (server errors, rate limits, network errors) are ignored."""
+        outcome = CODE_OUTCOMES.get(code)
+        if outcome:
+            self.add(url, outcome, code)
+
+    def clear(self, url):
+        """Forget the entries for a URL and its pattern (after a success)."""
+        with self._lock:
+            self.conn.execute("""
+                DELETE FROM bad_urls WHERE (kind = ? AND key = ?) OR (kind = ? AND key = ?)
+            """, (URL, url, PATTERN, url_pattern(url)))
+            self.conn.commit()
@@ -0,0 +1,105 @@
+"""
+Prefetched open-access locations per DOI.
+
+The oa_locations table holds candidate PDF and landing page URLs found by
+bulk lookups (scrape_pdfs.py --prefetch), one row per (doi, source, rank).
+Sources use the service names of scrape_pdfs.SERVICE_INTERVALS
+("openalex", "semantic_scholar"). Rank orders the locations of one source,
+best first.
+
+A DOI that was looked up without result gets a single placeholder row
+(rank 0, no URLs), so "prefetched, nothing found" can be told apart from
+"not prefetched"; only the latter falls back to a live API query.
+
+Rows expire after TTL_DAYS (by fetched_at), so that a DOI is looked up
+again once its OA status may have changed; expired rows count as "not
+prefetched". clear() drops the rows of DOIs that are retried.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+# Days after which prefetched or imported rows are no longer used
+TTL_DAYS = 30
+
+
+def _cutoff():
+    return (datetime.now() - timedelta(days=TTL_DAYS)).isoformat()
+
+
+def ensure_table(conn):
+    """Create the oa_locations table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS oa_locations (
+            doi          TEXT NOT NULL,
+            source       TEXT NOT NULL,
+            rank         INTEGER NOT NULL,
+            pdf_url      TEXT,
+            landing_url  TEXT,
+            fetched_at   TEXT NOT NULL,
+            PRIMARY KEY (doi, source, rank)
+        )
+    """)
+    conn.commit()
+
+
+def store_locations(conn, doi, source, locations, commit=True):
+    """Replace the stored locations of a DOI for one source.
+
+    locations is a list of (pdf_url, landing_url), best first; an empty
+    list records that the source knows no location for the DOI.
+    """
+    now = datetime.now().isoformat()
+    rows = [(doi, source, rank, pdf_url, landing_url, now)
+            for rank, (pdf_url, landing_url) in enumerate(locations)]
+    if not rows:
+        rows = [(doi, source, 0, None, None, now)]
+    conn.execute("DELETE FROM oa_locations WHERE doi = ? AND source = ?", (doi, source))
+    conn.executemany("""
+        INSERT INTO oa_locations (doi, source, rank, pdf_url, landing_url, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    if commit:
+        conn.commit()
+
+
+def get_locations(conn, doi, source):
+    """Prefetched locations of a DOI for one source.
+
+    Returns a list of (pdf_url, landing_url), best first (empty if the
+    source had nothing), or None if the DOI was never prefetched or its
+    rows are older than TTL_DAYS.
+    """
+    rows = conn.execute("""
+        SELECT pdf_url, landing_url FROM oa_locations
+        WHERE doi = ? AND source = ? AND fetched_at >= ?
+        ORDER BY rank
+    """, (doi, source, _cutoff())).fetchall()
+    if not rows:
+        return None
+    return [(pdf_url, landing_url) for pdf_url, landing_url in rows
+            if pdf_url or landing_url]
+
+
+def fetched_dois(conn, source):
+    """Set of DOIs that already have unexpired prefetched rows for a source."""
+    rows = conn.execute("""
+        SELECT DISTINCT doi FROM oa_locations WHERE source = ? AND fetched_at >= ?
+    """, (source, _cutoff())).fetchall()
+    return {row[0] for row in rows}
+
+
+def clear(conn, where, params=()):
+    """Delete the rows (of all sources) of the articles matching where.
+
+    where is an SQL condition on the articles table. Returns the number of
+    rows deleted.
+    """
+    cur = conn.execute(f"""
+        DELETE FROM oa_locations
+        WHERE doi IN (SELECT doi FROM articles WHERE {where})
+    """, params)
+    conn.commit()
+    return cur.rowcount
@@ -0,0 +1,444 @@
+"""
+Download engine and validating, atomic PDF writer shared by the download scripts.
+
+The downloaders used to write the whole response body to the final path
+and only then re-open the file to check its size and the %PDF- magic
+bytes, so a large HTML error page was downloaded in full before being
+rejected, and an interrupted run left half-written files in pdf/.
+
+save_pdf_response() instead checks the first bytes as they arrive and
+aborts the transfer right away if they are not a PDF header, computes
+the SHA-256 while streaming, writes to a temporary file next to the
+destination and moves it into place only after the whole file passed
+validation (minimum size, %%EOF trailer near the end). Valid files go
+through the content-addressed store (pdf_store.put), so identical bodies
+are kept once and the destination is a link to the stored object.
+
+download_resumable() is meant for large files (books, theses). It keeps
+the body of an interrupted transfer as a .part file next to the
+destination, with the server's validator (ETag or Last-Modified) in a
+.part.json sidecar, and continues it with a Range request, in the same
+call or in a later run. If the server ignores the range or the file
+changed, the download starts over.
+
+DownloadEngine wraps both for the scrapers: sessions from pooled_session()
+keep connections to each host alive, transfers to one host are limited to
+host_concurrency at a time, failed connections are retried a bounded
+number of times, and every download reports the same kind of result
+(see DownloadEngine.fetch). The transfers, and all responses of pooled
+sessions, are counted in metrics.py.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import pdf_store
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+MIN_PDF_SIZE = 1000
+PDF_MAGIC = b"%PDF-"
+EOF_MARKER = b"%%EOF"
+# The %%EOF marker must appear within this many bytes of the end of the file
+TRAILER_WINDOW = 1024
+
+# Rejection reasons returned by save_pdf_response and download_resumable
+NOT_PDF = "not-pdf"
+TOO_SMALL = "too-small"
+TRUNCATED = "truncated"
+# An HTML page was served instead of a PDF (download_resumable, DownloadEngine)
+HTML = "html"
+
+# Retries of an interrupted download_resumable transfer, and the base
+# wait between them (multiplied by the attempt number)
+RESUME_RETRIES = 3
+RESUME_WAIT = 5
+
+CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-")
+
+
+def save_pdf_response(resp, dest_path, chunk_size=CHUNK_SIZE):
+    """Stream a (stream=True) response body into dest_path as a validated PDF.
+
+    The body goes to a temporary file in the destination directory, which
+    is moved into the PDF store once the download is complete and valid;
+    dest_path then atomically becomes a link to the stored object (see
+    pdf_store.put, which also remembers the digest for take_digest).
+    If the first bytes are not %PDF-, the response is closed without
+    reading the rest. On any failure the temporary file is removed and
+    dest_path is left untouched.
+
+    Returns (ok, reason, sha256): reason is None on success, otherwise
+    NOT_PDF, TOO_SMALL or TRUNCATED; sha256 is the hex digest of the file
+    (None on failure). requests exceptions raised while reading are passed
+    on to the caller.
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=dest_path.parent, prefix=f".{dest_path.name}.",
+                                    suffix=".tmp")
+    ok = False
+    try:
+        digest = hashlib.sha256()
+        head = b""
+        tail = b""
+        size = 0
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                if len(head) < len(PDF_MAGIC):
+                    head += chunk[:len(PDF_MAGIC) - len(head)]
+                    if not PDF_MAGIC.startswith(head):
+                        log.debug("Not a PDF (starts with %r), aborting: %s", head, dest_path)
+                        resp.close()
+                        return False, NOT_PDF, None
+                fh.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                tail = (tail + chunk)[-TRAILER_WINDOW:]
+
+        if head != PDF_MAGIC:
+            return False, NOT_PDF, None
+        if size < MIN_PDF_SIZE:
+            log.debug("File suspiciously small (%d bytes): %s", size, dest_path)
+            return False, TOO_SMALL, None
+        if EOF_MARKER not in tail:
+            log.debug("No %%EOF trailer, file truncated (%d bytes): %s", size, dest_path)
+            return False, TRUNCATED, None
+
+        sha256 = digest.hexdigest()
+        pdf_store.put(tmp_name, dest_path, sha256, size)
+        ok = True
+        return True, None, sha256
+
+    except requests.exceptions.RequestException:
+        resp.close()
+        raise
+
+    finally:
+        if not ok and os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+
+# ---------------------------------------------------------------------------
+# Resumable downloads
+# ---------------------------------------------------------------------------
+
+def part_paths(dest_path):
+    """Paths of the partial body and its sidecar for a destination."""
+    dest_path = Path(dest_path)
+    part = dest_path.with_name(f".{dest_path.name}.part")
+    return part, part.with_name(part.name + ".json")
+
+
+def _validator(headers):
+    """Validator for If-Range: a strong ETag, else Last-Modified (or None)."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _discard_part(part, meta_path):
+    for path in (part, meta_path):
+        if path.exists():
+            path.unlink()
+
+
+def _resume_point(part, meta_path, url):
+    """Return (offset, validator) to continue a partial download of url.
+
+    A partial body without a validator, or from a different URL, cannot be
+    continued safely and is discarded (offset 0).
+    """
+    if not part.exists():
+        return 0, None
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        meta = {}
+    offset = part.stat().st_size
+    if meta.get("url") != url or not meta.get("validator") or offset < len(PDF_MAGIC):
+        _discard_part(part, meta_path)
+        return 0, None
+    return offset, meta["validator"]
+
+
+def _range_start(resp):
+    """First byte position of a 206 response (None if not a usable range)."""
+    if resp.status_code != 206:
+        return None
+    m = CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+    return int(m.group(1)) if m else None
+
+
+def _check_complete(path):
+    """Validate a complete body on disk. Returns (reason, sha256, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as fh:
+        head = fh.read(len(PDF_MAGIC))
+        fh.seek(0)
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        fh.seek(max(size - TRAILER_WINDOW, 0))
+        tail = fh.read()
+    if head != PDF_MAGIC:
+        return NOT_PDF, None, size
+    if size < MIN_PDF_SIZE:
+        return TOO_SMALL, None, size
+    if EOF_MARKER not in tail:
+        return TRUNCATED, None, size
+    return None, digest.hexdigest(), size
+
+
+def download_resumable(session, url, dest_path, retries=RESUME_RETRIES,
+                       chunk_size=CHUNK_SIZE, **kwargs):
+    """Download a (large) PDF to dest_path, continuing interrupted transfers.
+
+    The body is written to a .part file. If the transfer breaks off, the
+    part is kept and the download is continued with a Range/If-Range
+    request, up to retries times, waiting RESUME_WAIT seconds times the
+    attempt number in between. A part left over by an earlier run for the
+    same URL is continued as well. Servers that answer a range request
+    with the full body (200) or whose validator changed start over from
+    byte zero; a 206 for another range (or without Content-Range) is
+    dropped and the file requested again without a range. Bodies that are
+    not PDFs are abandoned after the first bytes.
+    Further keyword arguments are passed on to session.get().
+
+    Returns (ok, http_status_code, reason, sha256): reason is None on
+    success, HTML, NOT_PDF, TOO_SMALL or TRUNCATED for rejected files, or
+    None with ok False for HTTP/network errors (status code 0).
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    part, meta_path = part_paths(dest_path)
+    kwargs.setdefault("timeout", 60)
+    code = 0
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(RESUME_WAIT * attempt)
+        offset, validator = _resume_point(part, meta_path, url)
+        headers = {}
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+            log.info("  Resuming download at %.1f MB: %s", offset / 1024 / 1024, url)
+
+        try:
+            resp = session.get(url, stream=True, headers=headers, **kwargs)
+        except requests.exceptions.RequestException as exc:
+            log.warning("  Download request failed: %s", exc)
+            code = 0
+            continue
+        code = resp.status_code
+
+        if code == 416 and offset:
+            # The part does not fit the current file; start over
+            resp.close()
+            _discard_part(part, meta_path)
+            continue
+        if code not in (200, 206):
+            resp.close()
+            return False, code, None, None
+        if "html" in resp.headers.get("Content-Type", "").lower():
+            resp.close()
+            return False, code, HTML, None
+
+        start = _range_start(resp)
+        if offset and code == 206 and start != offset:
+            # A range that does not continue the part; start over with a
+            # plain request
+            log.info("  Server answered with a different range, downloading in full")
+            resp.close()
+            _discard_part(part, meta_path)
+            continue
+        if offset and start != offset:
+            log.info("  Server ignored the range request, downloading in full")
+            offset = 0
+        meta_path.write_text(json.dumps({"url": url, "validator": _validator(resp.headers)}))
+
+        head = b""
+        try:
+            with open(part, "ab" if offset else "wb") as fh:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    if not chunk:
+                        continue
+                    if not offset and len(head) < len(PDF_MAGIC):
+                        head += chunk[:len(PDF_MAGIC) - len(head)]
+                        if not PDF_MAGIC.startswith(head):
+                            resp.close()
+                            fh.close()
+                            _discard_part(part, meta_path)
+                            return False, code, NOT_PDF, None
+                    fh.write(chunk)
+        except requests.exceptions.RequestException as exc:
+            resp.close()
+            log.warning("  Download interrupted after %.1f MB (%s), keeping partial file",
+                        part.stat().st_size / 1024 / 1024, exc)
+            code = 0
+            continue
+
+        reason, sha256, size = _check_complete(part)
+        if reason:
+            log.debug("Downloaded file rejected (%s, %d bytes): %s", reason, size, dest_path)
+            _discard_part(part, meta_path)
+            return False, code, reason, None
+        pdf_store.put(part, dest_path, sha256, size)
+        meta_path.unlink()
+        return True, code, None, sha256
+
+    return False, code, None, None
+
+
+# ---------------------------------------------------------------------------
+# Download engine
+# ---------------------------------------------------------------------------
+
+# Connections kept alive per host by a pooled session
+POOL_MAXSIZE = 10
+# Simultaneous transfers per host (across all threads using one engine)
+HOST_CONCURRENCY = 2
+# Retries after connection errors, and the base wait between them
+# (multiplied by the attempt number)
+FETCH_RETRIES = 2
+RETRY_WAIT = 2
+
+# Result of DownloadEngine.fetch. code is the HTTP status, except that a
+# response rejected as not being a PDF (HTML page, wrong magic bytes)
+# reports 403 and a network error 0. sha256 is set on success, html holds
+# the page body if the response was HTML and fetch was asked to keep it.
+FetchResult = namedtuple("FetchResult", "ok code reason sha256 html")
+
+
+def pooled_session(headers=None, pool_maxsize=POOL_MAXSIZE):
+    """A requests session keeping up to pool_maxsize connections per host alive.
+
+    Its responses are counted in the metrics (see metrics.track_session).
+    """
+    session = metrics.track_session(requests.Session())
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class DownloadEngine:
+    """Shared PDF download logic for all scrapers.
+
+    The engine holds no sessions itself (the scrapers keep theirs per
+    publisher or repository, for cookies), but limits the transfers per
+    host and applies the same retry, validation and storage rules to
+    every download. One engine can be shared by threads.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, retries=FETCH_RETRIES,
+                 host_concurrency=HOST_CONCURRENCY):
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.host_concurrency = host_concurrency
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build an engine from the optional "download" section of a config."""
+        cfg = config.get("download", {})
+        return cls(chunk_size=int(cfg.get("chunk_kb", CHUNK_SIZE // 1024)) * 1024,
+                   retries=cfg.get("retries", FETCH_RETRIES),
+                   host_concurrency=cfg.get("host_concurrency", HOST_CONCURRENCY))
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(
+                    self.host_concurrency)
+        return slot
+
+    def fetch(self, url, dest_path, session, resume=False, keep_html=False, **kwargs):
+        """Download url to dest_path as a validated PDF.
+
+        With resume=True, large files are fetched with download_resumable
+        (kept as .part files and continued with range requests). Otherwise
+        the body is streamed with save_pdf_response, and the request is
+        repeated up to self.retries times after connection errors. HTTP
+        errors are not retried. Further keyword arguments (timeout, verify,
+        allow_redirects, ...) are passed on to session.get().
+
+        Returns a FetchResult.
+        """
+        kwargs.setdefault("timeout", 60)
+        kwargs.setdefault("allow_redirects", True)
+        with self._host_slot(url):
+            started = time.monotonic()
+            result = self._fetch(url, dest_path, session, resume, keep_html, kwargs)
+        self._count(url, dest_path, result, time.monotonic() - started)
+        return result
+
+    def _fetch(self, url, dest_path, session, resume, keep_html, kwargs):
+        if resume:
+            ok, code, reason, sha256 = download_resumable(
+                session, url, dest_path, retries=self.retries,
+                chunk_size=self.chunk_size, **kwargs)
+            return self._result(ok, code, reason, sha256)
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(RETRY_WAIT * attempt)
+            try:
+                return self._fetch_once(url, dest_path, session, keep_html, kwargs)
+            except requests.exceptions.RequestException as exc:
+                log.debug("  Download attempt %d failed: %s", attempt + 1, exc)
+                error = exc
+        log.debug("  Giving up after %d attempts: %s", self.retries + 1, error)
+        return self._result(False, 0, None, None)
+
+    @staticmethod
+    def _count(url, dest_path, result, seconds):
+        """Report a transfer to the metrics: "ok", the rejection reason,
+        "http" (error status) or "error" (network error)."""
+        if result.ok:
+            metrics.download(url, "ok", seconds, Path(dest_path).stat().st_size)
+        else:
+            metrics.download(url, result.reason or ("http" if result.code else "error"),
+                             seconds)
+
+    def _fetch_once(self, url, dest_path, session, keep_html, kwargs):
+        resp = session.get(url, stream=True, **kwargs)
+        code = resp.status_code
+        if code != 200:
+            resp.close()
+            return self._result(False, code, None, None)
+        if "html" in resp.headers.get("Content-Type", "").lower():
+            html = resp.text if keep_html else None
+            resp.close()
+            return self._result(False, code, HTML, None, html)
+        ok, reason, sha256 = save_pdf_response(resp, dest_path, self.chunk_size)
+        return self._result(ok, code, reason, sha256)
+
+    @staticmethod
+    def _result(ok, code, reason, sha256, html=None):
+        if reason in (HTML, NOT_PDF):
+            code = 403
+        return FetchResult(ok, code, reason, sha256, html)
@@ -0,0 +1,196 @@
+"""
+Content-addressed storage for downloaded PDFs.
+
+Every PDF body is stored once under <pdf_dir>/_store/<aa>/<sha256>.pdf
+(aa = first two hex digits of the digest); the per-DOI file that
+build_pdf_path() names is a hard link to that object. Identical bodies
+served for several DOIs (a publisher's "sample" PDF, an issue-level PDF,
+a manual re-download) therefore take up disk space only once.
+
+The articles table records sha256 and size per article. When a freshly
+downloaded body turns out to be an object that already existed, the
+downloaders look up which other DOIs carry the same digest and reject the
+download as a bogus "success". The digest is computed while streaming
+(see pdf_download.save_pdf_response), so none of this re-reads files.
+
+On file systems without hard links the DOI file is a plain file and
+nothing is kept in the store, so duplicates are found by looking up the
+digest in the database for every download. Files downloaded before the
+store existed have sha256 NULL until they are downloaded again.
+
+Used by pdf_download.py, scrape_pdfs.py, scrape_repo.py,
+scrape_openlibhum.py, bookscrape_langsci.py and integrate_manual.py.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+STORE_DIR = "_store"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Digests of files placed by put() in this process, by DOI path, so that
+# callers can look them up without hashing the file again
+_recent = {}
+_recent_lock = threading.Lock()
+
+
+def object_path(dest_path, sha256):
+    """Store path of the object with the given digest, for a DOI file path."""
+    return Path(dest_path).parent / STORE_DIR / sha256[:2] / f"{sha256}.pdf"
+
+
+def file_digest(path):
+    """Return (sha256, size) of a file on disk."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _link(src, dest_path):
+    """Atomically make dest_path a hard link to src (raises OSError if unsupported)."""
+    if dest_path.exists() and os.path.samefile(src, dest_path):
+        return  # rename() between links to the same file would do nothing
+    tmp_link = dest_path.with_name(f".{dest_path.name}.link")
+    if tmp_link.exists():
+        tmp_link.unlink()
+    os.link(src, tmp_link)
+    os.replace(tmp_link, dest_path)
+
+
+def put(tmp_path, dest_path, sha256, size):
+    """Move a validated temporary file into the store and link dest_path to it.
+
+    If an object with the same digest already exists, tmp_path is simply
+    removed. Returns True if the content was new to the store, False if it
+    was already there (i.e. the same body is stored for some other path),
+    or None if hard links are not supported: then the DOI file is a plain
+    file, the store keeps nothing, and whether the body is new is unknown.
+    """
+    dest_path = Path(dest_path)
+    obj = object_path(dest_path, sha256)
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    is_new = not obj.exists()
+
+    try:
+        if is_new:
+            os.replace(tmp_path, obj)
+            try:
+                _link(obj, dest_path)
+            except OSError:
+                # No hard links here: the DOI file is the only copy, so the
+                # store cannot tell later downloads of the body apart
+                os.replace(obj, dest_path)
+                is_new = None
+        else:
+            try:
+                _link(obj, dest_path)
+                os.unlink(tmp_path)
+            except OSError:
+                os.replace(tmp_path, dest_path)
+                is_new = None
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    with _recent_lock:
+        _recent[str(dest_path)] = (sha256, size, is_new)
+    return is_new
+
+
+def ingest(path, dest_path):
+    """Move an existing file (e.g. a manual download) to dest_path via the store.
+
+    Returns (sha256, size, is_new) as for put().
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    sha256, size = file_digest(path)
+    tmp_path = dest_path.with_name(f".{dest_path.name}.ingest.tmp")
+    shutil.move(str(path), str(tmp_path))
+    is_new = put(tmp_path, dest_path, sha256, size)
+    take_digest(dest_path)
+    return sha256, size, is_new
+
+
+def take_digest(dest_path):
+    """Return (sha256, size, is_new) of a DOI file.
+
+    Uses the digest remembered by put() (and forgets it); for files not
+    placed by this process the file is hashed and is_new is None.
+    """
+    with _recent_lock:
+        known = _recent.pop(str(dest_path), None)
+    if known:
+        return known
+    sha256, size = file_digest(dest_path)
+    return sha256, size, None
+
+
+# ---------------------------------------------------------------------------
+# Database helpers
+# ---------------------------------------------------------------------------
+
+def ensure_columns(conn):
+    """Add the sha256 and size columns to articles if they don't exist."""
+    for col, coltype in [("sha256", "TEXT"), ("size", "INTEGER")]:
+        try:
+            conn.execute(f"ALTER TABLE articles ADD COLUMN {col} {coltype}")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_sha256 ON articles(sha256)")
+    conn.commit()
+
+
+def record(conn, doi, sha256, size, commit=True):
+    """Store the digest and size of an article's file."""
+    conn.execute("UPDATE articles SET sha256 = ?, size = ? WHERE doi = ?",
+                 (sha256, size, doi))
+    if commit:
+        conn.commit()
+
+
+def dois_with_digest(conn, sha256, exclude=None):
+    """DOIs of articles whose file has the given digest (other than exclude).
+
+    Articles whose file has been removed (file reset to NULL, e.g. by
+    data_consistency.py or after quarantining) keep their old sha256 but
+    no longer own the body, so they are left out.
+    """
+    rows = conn.execute("""
+        SELECT doi FROM articles
+        WHERE sha256 = ? AND doi IS NOT ? AND file IS NOT NULL
+    """, (sha256, exclude)).fetchall()
+    return [row[0] for row in rows]
+
+
+def check_download(conn, doi, dest_path):
+    """Record the digest of a freshly placed DOI file, rejecting duplicates.
+
+    If the body was already in the store under another DOI, the DOI file
+    is removed again and that DOI list is returned; the article's digest
+    is not recorded. Otherwise the digest is recorded and [] is returned.
+    Only bodies the store already knew (or could not keep, without hard
+    links) need a database lookup.
+    """
+    sha256, size, is_new = take_digest(dest_path)
+    if not is_new:
+        others = dois_with_digest(conn, sha256, exclude=doi)
+        if others:
+            log.warning("  Same file already stored for %s (sha256 %s…), rejecting",
+                        ", ".join(others[:3]), sha256[:12])
+            os.unlink(dest_path)
+            return others
+    record(conn, doi, sha256, size)
+    return []
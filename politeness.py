@@ -0,0 +1,154 @@
+"""
+Shared politeness state for the PDF scrapers.
+
+Keeps the time of the last contact globally, per publisher and per host in
+the politeness_state table, with an in-memory copy so that politeness
+checks do not have to scan the articles table (the old approach ran
+SELECT MAX(timestamp) over all articles for every candidate).
+
+Used by scrape_pdfs.py, scrape_repo.py and scrape_openlibhum.py. Contacts
+are recorded when an attempt starts; the table is tiny (one row per
+publisher and host), so it is simply re-read every few seconds to pick up
+contacts made by other processes working on the same database.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+GLOBAL = "global"
+PUBLISHER = "publisher"
+HOST = "host"
+
+# Seconds between re-reads of the table (to see other processes' contacts)
+REFRESH_INTERVAL = 5.0
+
+
+class PolitenessStore:
+    """Last-contact times per scope ("global", "publisher", "host") and key.
+
+    The connection is only used under the store's lock, so a store built on
+    a connection opened with check_same_thread=False can be shared by
+    worker threads. clock returns the current datetime and can be replaced
+    for simulations.
+    """
+
+    def __init__(self, conn, clock=datetime.now):
+        self.conn = conn
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._loaded_at = None
+        self._ensure_table()
+        self._refresh()
+
+    def _ensure_table(self):
+        """Create the state table, seeding it from articles on first use."""
+        exists = self.conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'politeness_state'
+        """).fetchone()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS politeness_state (
+                scope         TEXT NOT NULL,
+                key           TEXT NOT NULL,
+                last_contact  TEXT NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+        """)
+        if not exists:
+            # One-off migration: carry over the attempt history
+            self.conn.execute("""
+                INSERT OR REPLACE INTO politeness_state (scope, key, last_contact)
+                SELECT ?, '', MAX(timestamp) FROM articles
+                WHERE timestamp IS NOT NULL
+                HAVING MAX(timestamp) IS NOT NULL
+            """, (GLOBAL,))
+            self.conn.execute("""
+                INSERT OR REPLACE INTO politeness_state (scope, key, last_contact)
+                SELECT ?, publisher, MAX(timestamp) FROM articles
+                WHERE timestamp IS NOT NULL AND publisher IS NOT NULL
+                GROUP BY publisher
+            """, (PUBLISHER,))
+        self.conn.commit()
+
+    def _refresh(self):
+        """Reload the cache from the table. Caller holds the lock (or is __init__)."""
+        rows = self.conn.execute(
+            "SELECT scope, key, last_contact FROM politeness_state").fetchall()
+        for scope, key, ts in rows:
+            when = datetime.fromisoformat(ts)
+            cached = self._cache.get((scope, key))
+            if cached is None or when > cached:
+                self._cache[(scope, key)] = when
+        self._loaded_at = self.clock()
+
+    def _maybe_refresh(self):
+        if (self.clock() - self._loaded_at).total_seconds() >= REFRESH_INTERVAL:
+            self._refresh()
+
+    def last_contact(self, scope, key=""):
+        """Datetime of the last recorded contact, or None."""
+        with self._lock:
+            self._maybe_refresh()
+            return self._cache.get((scope, key or ""))
+
+    def seconds_until_free(self, scope, key, interval):
+        """Seconds until interval has passed since the last contact (0 if free)."""
+        last = self.last_contact(scope, key)
+        if last is None:
+            return 0.0
+        elapsed = (self.clock() - last).total_seconds()
+        return max(0.0, interval - elapsed)
+
+    def check(self, publisher, global_interval, publisher_interval):
+        """Check the global and per-publisher intervals.
+
+        Returns (ok, wait_seconds) like scrape_pdfs.check_politeness.
+        """
+        wait = max(self.seconds_until_free(GLOBAL, "", global_interval),
+                   self.seconds_until_free(PUBLISHER, publisher, publisher_interval))
+        return wait <= 0, wait
+
+    def record(self, publisher=None, host=None, when=None, global_=False):
+        """Record a contact for the publisher and/or host.
+
+        The global clock (the start of the last article attempt) is only
+        advanced for publisher contacts, or with global_=True (articles
+        without publisher); host-only contacts such as single downloads
+        leave it alone.
+        """
+        when = when or self.clock()
+        keys = []
+        if publisher or global_:
+            keys.append((GLOBAL, ""))
+        if publisher:
+            keys.append((PUBLISHER, publisher))
+        if host:
+            keys.append((HOST, host))
+        with self._lock:
+            for key in keys:
+                cached = self._cache.get(key)
+                if cached is None or when > cached:
+                    self._cache[key] = when
+            self.conn.executemany("""
+                INSERT INTO politeness_state (scope, key, last_contact)
+                VALUES (?, ?, ?)
+                ON CONFLICT (scope, key) DO UPDATE
+                SET last_contact = MAX(last_contact, excluded.last_contact)
+            """, [(scope, key, when.isoformat()) for scope, key in keys])
+            self.conn.commit()
+
+    def wait_for_host(self, host, interval):
+        """Sleep until a host may be contacted again, then record the contact.
+
+        Returns the number of seconds slept.
+        """
+        wait = self.seconds_until_free(HOST, host, interval)
+        if wait > 0:
+            log.debug("Politeness wait %.1fs for %s", wait, host)
+            time.sleep(wait)
+        self.record(host=host)
+        return wait
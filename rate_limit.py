@@ -0,0 +1,217 @@
+"""
+Adaptive rate limiting for external services and hosts.
+
+Each (scope, key) pair, e.g. ("service", "openalex") or ("host",
+"www.example.org"), gets a current request interval that adapts AIMD-style
+(additive increase, multiplicative decrease of the request rate):
+
+- a rate-limit answer (HTTP 429 or 503) doubles the interval, and a
+  Retry-After header blocks the key until the given time;
+- X-RateLimit-Remaining: 0 (or RateLimit-Remaining) blocks the key until
+  the advertised reset time;
+- after RECOVER_AFTER successes in a row the request rate is raised by a
+  tenth of the base rate, until the configured base interval is reached
+  again.
+
+The state lives in the rate_limits table, and request slots are reserved
+in a write transaction, so consecutive runs and parallel processes on the
+same database share one picture of each service's capacity. Times are
+stored as Unix timestamps.
+
+Used by scrape_pdfs.py (replacing the in-memory service_backoff).
+"""
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+log = logging.getLogger(__name__)
+
+SERVICE = "service"
+HOST = "host"
+
+# Interval used after the first rate-limit answer for keys without a base interval
+MIN_BACKOFF_INTERVAL = 1.0
+# Upper bound for the backed-off interval (seconds)
+MAX_INTERVAL = 600.0
+# Successes in a row before the rate is raised again
+RECOVER_AFTER = 10
+# Fraction of the base rate added per recovery step
+RECOVER_STEP = 0.1
+
+
+def parse_retry_after(value, now):
+    """Parse a Retry-After header (seconds or HTTP date) into a Unix time."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return now + int(value)
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_reset(headers, now):
+    """Unix time until which a key is exhausted according to rate-limit headers.
+
+    Understands X-RateLimit-Remaining/X-RateLimit-Reset and the draft
+    RateLimit-Remaining/RateLimit-Reset headers. Reset values that look
+    like Unix timestamps are used as such, smaller ones as delta seconds.
+    Returns None if the quota is not exhausted.
+    """
+    for prefix in ("X-RateLimit-", "RateLimit-"):
+        remaining = headers.get(prefix + "Remaining")
+        reset = headers.get(prefix + "Reset")
+        if remaining is None or reset is None:
+            continue
+        try:
+            if int(remaining) > 0:
+                return None
+            reset = float(reset)
+        except ValueError:
+            continue
+        return reset if reset > 1e9 else now + reset
+    return None
+
+
+class RateLimiter:
+    """Adaptive, persisted request spacing per (scope, key).
+
+    Callers pass the configured base interval with every call, so the
+    limiter itself needs no configuration. The connection is only used
+    under the limiter's lock, so a limiter built on a connection opened
+    with check_same_thread=False can be shared by threads. clock and sleep
+    can be replaced for simulations.
+    """
+
+    def __init__(self, conn, clock=time.time, sleep=time.sleep):
+        self.conn = conn
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                scope          TEXT NOT NULL,
+                key            TEXT NOT NULL,
+                interval       REAL NOT NULL,
+                next_at        REAL NOT NULL DEFAULT 0,
+                blocked_until  REAL NOT NULL DEFAULT 0,
+                streak         INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, key)
+            )
+        """)
+        self.conn.commit()
+
+    def _row(self, scope, key):
+        return self.conn.execute("""
+            SELECT interval, next_at, blocked_until, streak FROM rate_limits
+            WHERE scope = ? AND key = ?
+        """, (scope, key)).fetchone()
+
+    def _begin(self):
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def wait(self, scope, key, interval=0):
+        """Reserve the next request slot for a key and sleep until it.
+
+        Returns the number of seconds slept.
+        """
+        with self._lock:
+            self._begin()
+            try:
+                row = self._row(scope, key)
+                if row is None and not interval:
+                    self.conn.commit()
+                    return 0.0
+                current, next_at, blocked_until, streak = row or (interval, 0, 0, 0)
+                current = max(current, interval)
+                now = self.clock()
+                slot = max(now, next_at, blocked_until)
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO rate_limits
+                        (scope, key, interval, next_at, blocked_until, streak)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (scope, key, current, slot + current, blocked_until, streak))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        wait = slot - now
+        if wait > 0:
+            log.debug("  Rate limit: waiting %.1fs for %s %s", wait, scope, key)
+            self.sleep(wait)
+        return max(wait, 0.0)
+
+    def feedback(self, scope, key, interval=0, status=None, headers=None):
+        """Adapt a key's interval to the answer of a request.
+
+        status is the HTTP status code (None for network errors, which are
+        ignored); headers are the response headers, if any.
+        """
+        if status is None:
+            return
+        headers = headers or {}
+        throttled = status in (429, 503)
+        now = self.clock()
+        blocked = parse_rate_limit_reset(headers, now)
+        if throttled:
+            blocked = max(blocked or 0, parse_retry_after(headers.get("Retry-After"), now) or 0)
+
+        with self._lock:
+            self._begin()
+            try:
+                row = self._row(scope, key)
+                if row is None and not throttled and not blocked:
+                    self.conn.commit()
+                    return
+                current, next_at, blocked_until, streak = row or (interval, 0, 0, 0)
+                current = max(current, interval)
+                if not throttled and not blocked and current <= interval:
+                    self.conn.commit()
+                    return
+
+                if throttled:
+                    current = min(max(current * 2, MIN_BACKOFF_INTERVAL), MAX_INTERVAL)
+                    streak = 0
+                    log.warning("  Rate-limited by %s — interval increased to %.1fs",
+                                key, current)
+                elif not blocked:
+                    streak += 1
+                    if streak >= RECOVER_AFTER:
+                        streak = 0
+                        current = self._recover(current, interval)
+                        log.info("  %s recovering — interval lowered to %.1fs", key, current)
+
+                if blocked:
+                    blocked_until = max(blocked_until, blocked)
+                    log.info("  %s asks to wait %.0fs", key, blocked_until - now)
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO rate_limits
+                        (scope, key, interval, next_at, blocked_until, streak)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (scope, key, current, next_at, blocked_until, streak))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    @staticmethod
+    def _recover(current, base):
+        """One additive rate increase, without going faster than base."""
+        base_rate = 1.0 / base if base else 1.0 / MIN_BACKOFF_INTERVAL
+        rate = 1.0 / current + RECOVER_STEP * base_rate
+        recovered = 1.0 / rate
+        if recovered <= base or (not base and recovered <= MIN_BACKOFF_INTERVAL):
+            return float(base)
+        return recovered
+
+    def current_interval(self, scope, key, interval=0):
+        """Current (possibly backed-off) interval for a key."""
+        with self._lock:
+            row = self._row(scope, key)
+        return max(row[0], interval) if row else float(interval)
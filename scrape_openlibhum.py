@@ -20,13 +20,17 @@ import logging
 import re
 import sqlite3
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
 import requests
 
+import metrics
+import pdf_store
+from pdf_download import HTML, DownloadEngine, pooled_session
+from politeness import PolitenessStore
+
 log = logging.getLogger(__name__)
 
 # Minimal headers - OpenLibHum's bot protection blocks browser-like User-Agents
@@ -34,6 +38,9 @@ MINIMAL_HEADERS = {
     "Accept": "*/*",
 }
 
+# Shared download engine (configured from the "download" config section in main)
+_download_engine = DownloadEngine()
+
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -196,54 +203,23 @@ def build_pdf_path(pdf_dir, doi):
 
 
 def download_pdf(pdf_url, dest_path, referer_url, session, timeout=60):
-    """Download a PDF from a URL.
+    """Download a PDF from a URL through the shared download engine.
 
     Returns (success, http_status_code).
     """
-    try:
-        session.headers["Referer"] = referer_url
-        session.headers["Accept"] = "application/pdf,*/*;q=0.9"
-
-        resp = session.get(pdf_url, timeout=timeout, stream=True, allow_redirects=True)
-        code = resp.status_code
-
-        if code != 200:
-            log.warning("Download failed with status %d: %s", code, pdf_url)
-            return False, code
-
-        # Check Content-Type
-        content_type = resp.headers.get("Content-Type", "").lower()
-        if "html" in content_type:
-            log.warning("Got HTML instead of PDF: %s", pdf_url)
-            return False, 403
-
-        # Ensure directory exists
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write content
-        with open(dest_path, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fh.write(chunk)
+    session.headers["Referer"] = referer_url
+    session.headers["Accept"] = "application/pdf,*/*;q=0.9"
 
-        # Verify file size
-        if dest_path.stat().st_size < 1000:
-            log.warning("Downloaded file suspiciously small: %s", dest_path)
-            dest_path.unlink()
-            return False, code
-
-        # Check PDF magic bytes
-        with open(dest_path, "rb") as fh:
-            magic = fh.read(5)
-        if magic != b"%PDF-":
-            log.warning("Downloaded file is not a PDF: %s", dest_path)
-            dest_path.unlink()
-            return False, 403
-
-        return True, code
-
-    except requests.exceptions.RequestException as exc:
-        log.warning("Download request failed: %s", exc)
-        return False, 0
+    result = _download_engine.fetch(pdf_url, dest_path, session, timeout=timeout)
+    if result.reason == HTML:
+        log.warning("Got HTML instead of PDF: %s", pdf_url)
+    elif result.reason:
+        log.warning("Downloaded file rejected (%s): %s", result.reason, pdf_url)
+    elif not result.ok and result.code:
+        log.warning("Download failed with status %d: %s", result.code, pdf_url)
+    elif not result.ok:
+        log.warning("Download request failed: %s", pdf_url)
+    return result.ok, result.code
 
 
 # ---------------------------------------------------------------------------
@@ -262,6 +238,10 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
     politeness = journal_cfg.get("politeness", 15)
     pdf_dir = config.get("pdf_dir", "pdf")
 
+    # Page fetches wait for the shared per-host politeness clock, so the
+    # delay also holds across runs and alongside the other scrapers
+    store = PolitenessStore(conn)
+
     # Get DOIs we need to download
     needed_dois = get_journal_dois(conn, db_journal)
     log.info("Found %d articles needing download for journal '%s'", len(needed_dois), db_journal)
@@ -274,6 +254,8 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
     downloaded_dois = set()
     stats = {"downloaded": 0, "failed": 0, "not_in_db": 0, "pages_visited": 0}
 
+    metrics.set_gauge("queue_backlog", len(needed_dois))
+
     # Stack for depth-first traversal
     stack = [start_url]
 
@@ -301,6 +283,7 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
 
             # Fetch page
             log.debug("Fetching: %s", url)
+            metrics.waited("host", store.wait_for_host(domain, politeness))
             try:
                 resp = session.get(url, timeout=60)
                 if resp.status_code != 200:
@@ -326,12 +309,10 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                 if doi not in needed_dois:
                     log.debug("  DOI not in database or already downloaded, skipping")
                     stats["not_in_db"] += 1
-                    time.sleep(politeness)
                     continue
 
                 if doi in downloaded_dois:
                     log.debug("  Already downloaded this session, skipping")
-                    time.sleep(politeness)
                     continue
 
                 # Get article info from database
@@ -339,7 +320,6 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                 if not article:
                     log.debug("  Article not found in database")
                     stats["not_in_db"] += 1
-                    time.sleep(politeness)
                     continue
 
                 # Extract PDF link
@@ -347,7 +327,7 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                 if not pdf_href:
                     log.warning("  No PDF link found on page")
                     stats["failed"] += 1
-                    time.sleep(politeness)
+                    metrics.article("failed")
                     continue
 
                 # Build full PDF URL
@@ -358,7 +338,6 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                     log.info("  [DRY RUN] Would download PDF")
                     stats["downloaded"] += 1
                     downloaded_dois.add(doi)
-                    time.sleep(politeness)
                     continue
 
                 # Build paths
@@ -368,7 +347,10 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                 now = datetime.now().isoformat()
                 attempts = article["attempts"] + 1
 
+                metrics.waited("host", store.wait_for_host(urlparse(pdf_url).netloc, politeness))
                 success, http_code = download_pdf(pdf_url, abs_path, url, session)
+                if success and pdf_store.check_download(conn, doi, abs_path):
+                    success, http_code = False, 409
 
                 if success:
                     log.info("  Downloaded: %s", rel_path)
@@ -381,6 +363,8 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                                    file_path=rel_path)
                     stats["downloaded"] += 1
                     downloaded_dois.add(doi)
+                    metrics.article("downloaded")
+                    metrics.set_gauge("queue_backlog", len(needed_dois - downloaded_dois))
                 else:
                     log.warning("  Download failed (HTTP %d)", http_code)
                     update_article(conn, doi,
@@ -391,9 +375,7 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                                    timestamp=now,
                                    file_path=None)
                     stats["failed"] += 1
-
-                # Politeness delay after article processing
-                time.sleep(politeness)
+                    metrics.article("failed")
 
             else:
                 # Not an article page, extract and queue internal links
@@ -412,9 +394,6 @@ def crawl_journal(conn, config, journal_cfg, session, dry_run=False, limit=None)
                 for link in new_links:
                     stack.append(link)
 
-                # Politeness delay between page fetches
-                time.sleep(politeness)
-
     except KeyboardInterrupt:
         log.info("Interrupted by user")
 
@@ -466,6 +445,9 @@ def main():
         log.error("Journal section '%s' is missing required fields: %s", args.journal, ", ".join(missing))
         return 1
 
+    global _download_engine
+    _download_engine = DownloadEngine.from_config(config)
+
     # Connect to database
     db_path = Path(args.db)
     if not db_path.exists():
@@ -473,14 +455,14 @@ def main():
         return 1
 
     conn = sqlite3.connect(args.db)
+    pdf_store.ensure_columns(conn)
 
     # Ensure PDF directory exists
     pdf_dir = Path(config.get("pdf_dir", "pdf"))
     pdf_dir.mkdir(parents=True, exist_ok=True)
 
     # Create session
-    session = requests.Session()
-    session.headers.update(MINIMAL_HEADERS)
+    session = pooled_session(MINIMAL_HEADERS)
 
     start_url = journal_cfg["start_url"]
     db_journal = journal_cfg["db_journal"]
@@ -492,8 +474,13 @@ def main():
     log.info("  Politeness: %d seconds", politeness)
 
     # Crawl and download
+    exporter = None
+    if not args.dry_run:
+        exporter = metrics.start_exporter("scrape_openlibhum", args.db, config)
     stats = crawl_journal(conn, config, journal_cfg, session, dry_run=args.dry_run, limit=args.limit)
 
+    if exporter is not None:
+        exporter.close()
     conn.close()
 
     log.info("Done — pages visited: %d, downloaded: %d, failed: %d, not in DB: %d",
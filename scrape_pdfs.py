@@ -12,32 +12,70 @@ Usage:
     python scrape_pdfs.py --limit 100
     python scrape_pdfs.py --continuous
     python scrape_pdfs.py --reset-oa-attempts   # retry previously failed OA articles
+    python scrape_pdfs.py --prefetch            # bulk OA lookups before downloading
+    python scrape_pdfs.py --sync-lingbuzz       # update the local LingBuzz index
+    python scrape_pdfs.py --import-unpaywall-snapshot unpaywall_snapshot.jsonl.gz
     python scrape_pdfs.py --dry-run
+    python scrape_pdfs.py --daemon --workers 4
+    python scrape_pdfs.py --control status
 """
 
 import argparse
+import gzip
 import json
 import logging
 import os
 import re
+import signal
 import sqlite3
 import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from html import unescape as html_unescape
 from pathlib import Path
-from urllib.parse import quote, urlparse
+from urllib.parse import quote, urljoin, urlparse
 
 import requests
 
+import api_cache
+import host_knowledge
+import lingbuzz_index
+import metrics
+import negative_cache
+import oa_locations
+import pdf_store
+import politeness
+import rate_limit
+import source_stats
+import title_match
+import work_queue
+from api_cache import ApiCache
+from control import ControlServer, send_command
+from negative_cache import NegativeCache
+from pdf_download import HTML, DownloadEngine, pooled_session
+from politeness import PolitenessStore
+from rate_limit import RateLimiter
+from session_store import SessionStore
+
 UNPAYWALL_API = "https://api.unpaywall.org/v2"
 SEMANTIC_SCHOLAR_API = "https://api.semanticscholar.org/graph/v1"
 OPENALEX_API = "https://api.openalex.org"
 CORE_API = "https://api.core.ac.uk/v3"
 LINGBUZZ_URL = "https://lingbuzz.net/lingbuzz"
 
+# Headers for LingBuzz searches and listing pages
+LINGBUZZ_HEADERS = {
+    "User-Agent": "Linglitter/1.0 (academic research tool)",
+    "Accept": "text/html",
+}
+
 log = logging.getLogger(__name__)
 
+# Work queue stage drained by this script (availability IS NULL)
+QUEUE_STAGE = "oa"
+
 # Browser-like headers for session requests
 BROWSER_HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
@@ -55,8 +93,24 @@ BROWSER_HEADERS = {
     "Priority": "u=0, i",
 }
 
-# Per-publisher session storage: {publisher: (session, last_used_datetime)}
-_publisher_sessions = {}
+# Process-wide politeness store (see get_politeness_store)
+_politeness_store = None
+_politeness_store_lock = threading.Lock()
+
+# Process-wide API response cache (see init_api_cache); None = no caching
+_api_cache = None
+
+# Process-wide download engine (see init_download_engine)
+_download_engine = DownloadEngine()
+
+# Process-wide per-publisher sessions with persisted cookies (see
+# init_session_store)
+_session_store = None
+_session_store_lock = threading.Lock()
+
+# Process-wide cache of recently failed URLs (see init_negative_cache)
+_negative_cache = None
+_negative_cache_lock = threading.Lock()
 
 # Per-service rate limiting: minimum seconds between requests to each service.
 # Semantic Scholar: 100 req/5min unauthenticated ≈ 1 req/3s
@@ -70,40 +124,146 @@ SERVICE_INTERVALS = {
     "lingbuzz": 10,
 }
 
-# Tracks last request time per service: {service_name: datetime}
-_service_last_request = {}
+# Process-wide adaptive rate limiter (see get_rate_limiter); SERVICE_INTERVALS
+# are the base intervals it never goes below
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+# DOI field of an Unpaywall snapshot line (checked before decoding the JSON)
+SNAPSHOT_DOI_RE = re.compile(r'"doi"\s*:\s*"([^"]+)"')
+
+# Batch sizes of the bulk endpoints used by --prefetch
+OPENALEX_BATCH_SIZE = 50
+SEMANTIC_SCHOLAR_BATCH_SIZE = 500
+
+# Threads for the concurrent fallback lookups (see start_fallback_lookups).
+# Shared by all download workers; each lookup still goes through service_wait.
+_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="oa-lookup")
+
+# Seconds an idle daemon waits before looking for new articles again
+DAEMON_IDLE_INTERVAL = 300
+
+# Commands of --control and the names of their arguments
+CONTROL_COMMANDS = {
+    "status": [],
+    "pause": ["publisher"],
+    "resume": ["publisher"],
+    "workers": ["n"],
+    "stop": [],
+}
+
+
+def init_download_engine(config):
+    """Set up the process-wide download engine from the "download" config section."""
+    global _download_engine
+    _download_engine = DownloadEngine.from_config(config)
+    return _download_engine
+
+
+def init_rate_limiter(db_path):
+    """Set up the process-wide rate limiter with its state in the database.
+
+    The limiter gets its own connection, as it is used from the lookup
+    threads (see rate_limit.py).
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = RateLimiter(sqlite3.connect(db_path, timeout=60,
+                                                    check_same_thread=False))
+    return _rate_limiter
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter.
+
+    Falls back to an in-memory (unpersisted) limiter if init_rate_limiter
+    was not called.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(sqlite3.connect(":memory:", check_same_thread=False))
+        return _rate_limiter
+
+
+def init_negative_cache(db_path):
+    """Set up the process-wide negative cache with its entries in the database.
+
+    The cache gets its own connection, as it is used from all download
+    workers (see negative_cache.py).
+    """
+    global _negative_cache
+    with _negative_cache_lock:
+        _negative_cache = NegativeCache(sqlite3.connect(db_path, timeout=60,
+                                                        check_same_thread=False))
+    return _negative_cache
+
+
+def get_negative_cache():
+    """Return the process-wide negative cache.
+
+    Falls back to an in-memory (unpersisted) cache if init_negative_cache
+    was not called.
+    """
+    global _negative_cache
+    with _negative_cache_lock:
+        if _negative_cache is None:
+            _negative_cache = NegativeCache(sqlite3.connect(":memory:", check_same_thread=False))
+        return _negative_cache
 
 
 def service_wait(service):
     """Sleep if needed to respect the per-service rate limit.
 
-    Call this BEFORE making a request to the given service.
+    Call this BEFORE making a request to the given service. Safe to call
+    from several worker threads and processes: each caller reserves the
+    next free slot for the service and then sleeps until it. The interval
+    starts at SERVICE_INTERVALS and adapts to service_feedback().
     """
-    interval = SERVICE_INTERVALS.get(service)
-    if not interval:
-        return
-    now = datetime.now()
-    last = _service_last_request.get(service)
-    if last:
-        elapsed = (now - last).total_seconds()
-        if elapsed < interval:
-            wait = interval - elapsed
-            log.debug("  Rate limit: waiting %.1fs for %s", wait, service)
-            time.sleep(wait)
-    _service_last_request[service] = datetime.now()
+    waited = get_rate_limiter().wait(rate_limit.SERVICE, service,
+                                     SERVICE_INTERVALS.get(service, 0))
+    metrics.waited("service", waited)
+
+
+def service_feedback(service, resp):
+    """Report a service's response to the rate limiter.
+
+    Rate-limit answers (429/503, Retry-After, X-RateLimit-* headers) slow
+    the service down; sustained success lets it speed up again. The
+    response is also counted in the metrics.
+    """
+    metrics.response(service, resp.url, resp.status_code, resp.elapsed.total_seconds())
+    get_rate_limiter().feedback(rate_limit.SERVICE, service,
+                                SERVICE_INTERVALS.get(service, 0),
+                                resp.status_code, resp.headers)
 
 
-def service_backoff(service, multiplier=3):
-    """Temporarily increase a service's interval after a 429.
+def init_session_store(db_path):
+    """Set up the process-wide session store with its cookie jars in the database.
 
-    Triples the interval (capped at 120s) so subsequent articles
-    back off from the overloaded service.
+    The store gets its own connection, as it is shared by the download
+    workers (see session_store.py).
     """
-    current = SERVICE_INTERVALS.get(service, 3)
-    new_interval = min(current * multiplier, 120)
-    if new_interval != current:
-        SERVICE_INTERVALS[service] = new_interval
-        log.warning("  Rate-limited by %s — interval increased to %ds", service, new_interval)
+    global _session_store
+    with _session_store_lock:
+        _session_store = SessionStore(sqlite3.connect(db_path, timeout=60,
+                                                      check_same_thread=False),
+                                      BROWSER_HEADERS)
+    return _session_store
+
+
+def get_session_store():
+    """Return the process-wide session store.
+
+    Falls back to an in-memory (unpersisted) store if init_session_store
+    was not called.
+    """
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = SessionStore(sqlite3.connect(":memory:", check_same_thread=False),
+                                          BROWSER_HEADERS)
+        return _session_store
 
 
 def get_publisher_session(publisher):
@@ -111,23 +271,20 @@ def get_publisher_session(publisher):
 
     Sessions are reused across downloads from the same publisher,
     preserving cookies and appearing more like normal browser behavior.
+    Their cookies are kept in the database, so they also carry over to
+    later runs (see session_store.py).
 
     Returns (session, is_new, elapsed_str) where:
     - is_new: True if a fresh session was created
     - elapsed_str: For continued sessions, time since last use as "HH:MM"
     """
-    now = datetime.now()
-    if publisher not in _publisher_sessions:
-        session = requests.Session()
-        session.headers.update(BROWSER_HEADERS)
-        _publisher_sessions[publisher] = (session, now)
+    session, is_new, last_used = get_session_store().get(publisher)
+    if is_new or last_used is None:
         return session, True, None
-    session, last_used = _publisher_sessions[publisher]
-    elapsed = now - last_used
+    elapsed = datetime.now() - last_used
     total_minutes = int(elapsed.total_seconds() // 60)
     hours, minutes = divmod(total_minutes, 60)
     elapsed_str = f"{hours:02d}:{minutes:02d}"
-    _publisher_sessions[publisher] = (session, now)
     return session, False, elapsed_str
 
 
@@ -146,7 +303,7 @@ def load_config(config_path):
 # ---------------------------------------------------------------------------
 
 def ensure_schema(conn):
-    """Add PDF-related columns if they don't exist (for older databases)."""
+    """Add PDF-related columns and side tables if they don't exist (for older databases)."""
     for col, coltype in [
         ("availability", "TEXT"),
         ("source", "TEXT"),
@@ -161,51 +318,67 @@ def ensure_schema(conn):
         except sqlite3.OperationalError:
             pass  # Column already exists
     conn.commit()
+    pdf_store.ensure_columns(conn)
+    oa_locations.ensure_table(conn)
+    host_knowledge.ensure_table(conn)
+    source_stats.ensure_table(conn)
+    lingbuzz_index.ensure_table(conn)
 
 
-def get_random_candidate(conn, years, journals):
-    """Select a random article that needs OA checking/downloading.
+def get_next_candidate(conn, years, journals, max_attempts=None, offset=0):
+    """Select the next article that needs OA checking/downloading.
 
     Only selects articles with availability IS NULL (untried).
     Articles that have already been processed by this tool move to
     'oa' (success, with file) or 'no-oa' (failed or genuinely not OA)
     and are not retried.
+
+    Candidates come from the pre-shuffled work queue (see work_queue.py).
+    When the queue runs dry it is re-synchronised once to pick up
+    articles added since the last sync.
     """
-    placeholders = ",".join("?" for _ in journals)
-    query = f"""
-        SELECT doi, publisher, journal, year, title
-        FROM articles
-        WHERE type = 'article'
-          AND year >= ? AND year <= ?
-          AND journal IN ({placeholders})
-          AND file IS NULL
-          AND availability IS NULL
-        ORDER BY RANDOM()
-        LIMIT 1
+    candidate = work_queue.pick_next(conn, QUEUE_STAGE, years, journals,
+                                     max_attempts, offset=offset)
+    if candidate is None and offset == 0:
+        if work_queue.sync_queue(conn, QUEUE_STAGE, years, journals, max_attempts):
+            candidate = work_queue.pick_next(conn, QUEUE_STAGE, years, journals,
+                                             max_attempts)
+    return candidate
+
+
+def get_eligible_candidate(conn, years, journals, max_attempts, scheduler,
+                           resync=True):
+    """Select the next article whose publisher may be contacted right now.
+
+    Instead of picking any article and then finding its publisher still
+    cooling down, the pick is restricted to publishers the scheduler
+    reports as ready (see PublisherScheduler.eligible). If the queue runs
+    dry it is re-synchronised once (unless resync is False).
+
+    Returns (candidate, wait). If candidate is None, wait is the number of
+    seconds until the first cooling publisher becomes free, or None if no
+    publisher has pending articles (or all of them are busy).
     """
-    params = [years[0], years[1]] + journals
-    row = conn.execute(query, params).fetchone()
-    if row:
-        return {"doi": row[0], "publisher": row[1], "journal": row[2],
-                "year": row[3], "title": row[4]}
-    return None
-
-
-def get_last_global_timestamp(conn):
-    """Get the timestamp of the most recent download attempt."""
-    row = conn.execute("""
-        SELECT MAX(timestamp) FROM articles WHERE timestamp IS NOT NULL
-    """).fetchone()
-    return row[0] if row and row[0] else None
+    synced = not resync
+    while True:
+        publishers = work_queue.pending_publishers(conn, QUEUE_STAGE)
+        if not publishers:
+            if synced or not work_queue.sync_queue(conn, QUEUE_STAGE, years, journals,
+                                                   max_attempts):
+                return None, None
+            synced = True
+            continue
 
+        ready, wait = scheduler.eligible(publishers)
+        if not ready:
+            return None, wait
 
-def get_last_publisher_timestamp(conn, publisher):
-    """Get the timestamp of the most recent download attempt for a publisher."""
-    row = conn.execute("""
-        SELECT MAX(timestamp) FROM articles
-        WHERE publisher = ? AND timestamp IS NOT NULL
-    """, (publisher,)).fetchone()
-    return row[0] if row and row[0] else None
+        candidate = work_queue.pick_next(conn, QUEUE_STAGE, years, journals,
+                                         max_attempts, publishers=ready)
+        if candidate:
+            return candidate, 0
+        # The ready publishers only had stale or exhausted rows, which
+        # pick_next has cleared out; look again.
 
 
 def update_article(conn, doi, availability, source, attempts, response, timestamp,
@@ -242,33 +415,181 @@ def parse_timestamp(ts_str):
     return datetime.fromisoformat(ts_str)
 
 
-def check_politeness(conn, publisher, global_interval, publisher_interval):
-    """Check if we can proceed without violating politeness intervals.
+def get_politeness_store(db_path):
+    """Return the process-wide politeness store, creating it on first use.
 
-    Returns (ok, wait_seconds) where ok is True if we can proceed,
-    or False with wait_seconds indicating how long to wait.
+    The store keeps last-contact times per publisher and host (see
+    politeness.py), so checks no longer scan the articles table. It is
+    shared by all download workers, so when it is created it gets its own
+    connection to the database at db_path.
     """
-    now = datetime.now()
+    global _politeness_store
+    with _politeness_store_lock:
+        if _politeness_store is None:
+            _politeness_store = PolitenessStore(sqlite3.connect(db_path, timeout=60,
+                                                                check_same_thread=False))
+        return _politeness_store
 
-    # Check global interval
-    last_global = get_last_global_timestamp(conn)
-    if last_global:
-        last_dt = parse_timestamp(last_global)
-        if last_dt:
-            elapsed = (now - last_dt).total_seconds()
-            if elapsed < global_interval:
-                return False, global_interval - elapsed
 
-    # Check per-publisher interval
-    last_pub = get_last_publisher_timestamp(conn, publisher)
-    if last_pub:
-        last_dt = parse_timestamp(last_pub)
-        if last_dt:
-            elapsed = (now - last_dt).total_seconds()
-            if elapsed < publisher_interval:
-                return False, publisher_interval - elapsed
+def _database_path(conn):
+    """File name of the main database of a connection."""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
 
-    return True, 0
+
+class PublisherScheduler:
+    """Hand out per-publisher download slots to worker threads.
+
+    Each publisher is served by at most one worker at a time and has its
+    own politeness clock (publisher_interval, counted from the start of the
+    previous attempt). Starts across all publishers are additionally spaced
+    by the global politeness_interval. The clocks live in the shared
+    politeness store.
+
+    The serial loop uses the same scheduler with a single "worker".
+    """
+
+    def __init__(self, store, global_interval, publisher_interval):
+        self.store = store
+        self.global_interval = global_interval
+        self.publisher_interval = publisher_interval
+        self._lock = threading.Condition()
+        self._busy = set()
+        self._paused = set()
+
+    def busy_publishers(self):
+        """Publishers currently being served by a worker."""
+        with self._lock:
+            return set(self._busy)
+
+    def paused_publishers(self):
+        """Publishers excluded from scheduling with pause()."""
+        with self._lock:
+            return set(self._paused)
+
+    def pause(self, publisher):
+        """Stop handing out slots for a publisher (a running attempt finishes)."""
+        with self._lock:
+            self._paused.add(publisher)
+
+    def resume(self, publisher):
+        """Undo pause() for a publisher."""
+        with self._lock:
+            self._paused.discard(publisher)
+            self._lock.notify_all()
+
+    def eligible(self, publishers):
+        """Split publishers into those that may be contacted now and the rest.
+
+        Returns (ready, wait): ready lists the publishers that are neither
+        busy, paused nor cooling down. If it is empty, wait is the number of
+        seconds until the first cooling publisher becomes free, or None if
+        all of them are busy or paused (a release() or resume() will wake up
+        wait()).
+        """
+        with self._lock:
+            waits = {
+                p: self.store.seconds_until_free(politeness.PUBLISHER, p,
+                                                 self.publisher_interval)
+                for p in publishers if p not in self._busy and p not in self._paused
+            }
+        ready = [p for p, w in waits.items() if w <= 0]
+        if ready or not waits:
+            return ready, None
+        return [], min(waits.values())
+
+    def wait(self, timeout, stop=None):
+        """Sleep until timeout has passed or a publisher is released.
+
+        timeout=None waits for the next release. If stop (a threading.Event)
+        is already set, returns immediately; see wake().
+        """
+        with self._lock:
+            if stop is not None and stop.is_set():
+                return
+            self._lock.wait(timeout)
+
+    def wake(self):
+        """Wake up all threads sleeping in wait()."""
+        with self._lock:
+            self._lock.notify_all()
+
+    def try_acquire(self, publisher):
+        """Reserve a download slot for a publisher.
+
+        Returns (ok, wait_seconds). If ok is False, the publisher is busy or
+        still cooling down for wait_seconds. If ok is True, the caller owns
+        the publisher until release() and must sleep wait_seconds first to
+        honour the global interval.
+        """
+        with self._lock:
+            if publisher in self._busy:
+                return False, 0
+            wait = self.store.seconds_until_free(politeness.PUBLISHER, publisher,
+                                                 self.publisher_interval)
+            if wait > 0:
+                return False, wait
+            now = self.store.clock()
+            start = now
+            last_global = self.store.last_contact(politeness.GLOBAL)
+            if last_global:
+                earliest = last_global + timedelta(seconds=self.global_interval)
+                if earliest > start:
+                    start = earliest
+            self._busy.add(publisher)
+            self.store.record(publisher=publisher, when=start, global_=True)
+            return True, (start - now).total_seconds()
+
+    def release(self, publisher):
+        """Give up the slot for a publisher after an attempt."""
+        with self._lock:
+            self._busy.discard(publisher)
+            self._lock.notify_all()
+
+
+# ---------------------------------------------------------------------------
+# API response cache
+# ---------------------------------------------------------------------------
+
+def init_api_cache(db_path, config):
+    """Set up the process-wide API response cache (see api_cache.py).
+
+    The cache gets its own connection, as it is used from the lookup
+    threads. Settings come from the optional "api_cache" config section.
+    """
+    global _api_cache
+    cache_cfg = config.get("api_cache", {})
+    _api_cache = ApiCache(
+        sqlite3.connect(db_path, timeout=60, check_same_thread=False),
+        ttl_days=cache_cfg.get("ttl_days"),
+        max_mb=cache_cfg.get("max_mb", api_cache.DEFAULT_MAX_MB),
+    )
+    return _api_cache
+
+
+def cached_json(service, key, request):
+    """Run an API request through the response cache.
+
+    request() performs the live request (including any service_wait) and
+    returns a requests.Response; it is only called on a cache miss, and its
+    response is reported to the rate limiter (service_feedback). Answers
+    with HTTP 200 or 404 are cached, anything else (rate limits, server
+    errors) is not.
+
+    Returns (status_code, data) where data is the decoded JSON body
+    (None unless the status is 200).
+    """
+    cache = _api_cache
+    if cache is not None:
+        hit = cache.get(service, key)
+        if hit is not None:
+            return hit["status"], hit["data"]
+
+    resp = request()
+    service_feedback(service, resp)
+    data = resp.json() if resp.status_code == 200 else None
+    if cache is not None and resp.status_code in (200, 404):
+        cache.put(service, key, {"status": resp.status_code, "data": data})
+    return resp.status_code, data
 
 
 # ---------------------------------------------------------------------------
@@ -291,9 +612,12 @@ def query_unpaywall(doi, mailto):
     url = f"{UNPAYWALL_API}/{quote(doi, safe='')}"
     params = {"email": mailto}
 
+    def request():
+        service_wait("unpaywall")
+        return requests.get(url, params=params, timeout=30)
+
     try:
-        resp = requests.get(url, params=params, timeout=30)
-        code = resp.status_code
+        code, data = cached_json("unpaywall", doi, request)
 
         if code == 404:
             # DOI not found in Unpaywall
@@ -303,33 +627,107 @@ def query_unpaywall(doi, mailto):
             log.warning("Unpaywall returned %d for %s", code, doi)
             return {"is_oa": False, "pdf_url": None, "landing_url": None, "response_code": code}
 
-        data = resp.json()
-        is_oa = data.get("is_oa", False)
-
-        pdf_url = None
-        landing_url = None
-        if is_oa:
-            # Try best_oa_location first
-            best = data.get("best_oa_location")
-            if best:
-                pdf_url = best.get("url_for_pdf")
-                landing_url = best.get("url_for_landing_page") or best.get("url")
-
-            # Fall back to other locations if needed
-            if not pdf_url:
-                for loc in data.get("oa_locations", []):
-                    pdf_url = loc.get("url_for_pdf")
-                    landing_url = loc.get("url_for_landing_page") or loc.get("url")
-                    if pdf_url:
-                        break
-
-        return {"is_oa": is_oa, "pdf_url": pdf_url, "landing_url": landing_url, "response_code": code}
+        return parse_unpaywall_record(data, code)
 
     except requests.exceptions.RequestException as exc:
         log.warning("Unpaywall request failed for %s: %s", doi, exc)
         return {"is_oa": False, "pdf_url": None, "landing_url": None, "response_code": 0}
 
 
+def unpaywall_locations(data):
+    """OA locations of an Unpaywall DOI record, best first.
+
+    Returns a list of (pdf_url, landing_url): best_oa_location, then the
+    other oa_locations. Empty if the record is not OA.
+    """
+    if not data.get("is_oa"):
+        return []
+    locations = []
+    for loc in [data.get("best_oa_location")] + list(data.get("oa_locations") or []):
+        if not loc:
+            continue
+        entry = (loc.get("url_for_pdf"), loc.get("url_for_landing_page") or loc.get("url"))
+        if any(entry) and entry not in locations:
+            locations.append(entry)
+    return locations
+
+
+def unpaywall_result(locations, code=200):
+    """Build the dict returned by query_unpaywall from a location list.
+
+    Picks the first location with a PDF URL, or else the first landing
+    page. An article counts as OA if it has any OA location.
+    """
+    pdf_url = None
+    landing_url = locations[0][1] if locations else None
+    for loc_pdf, loc_landing in locations:
+        if loc_pdf:
+            pdf_url, landing_url = loc_pdf, loc_landing
+            break
+    return {"is_oa": bool(locations), "pdf_url": pdf_url, "landing_url": landing_url,
+            "response_code": code}
+
+
+def parse_unpaywall_record(data, code=200):
+    """Turn an Unpaywall DOI record into the dict returned by query_unpaywall."""
+    return unpaywall_result(unpaywall_locations(data), code)
+
+
+def unpaywall_from_snapshot(conn, doi):
+    """Unpaywall data for a DOI from an imported snapshot (see
+    import_unpaywall_snapshot), in the format of query_unpaywall.
+
+    Returns None if the DOI is not covered by an imported snapshot, or
+    the import is older than oa_locations.TTL_DAYS.
+    """
+    locations = oa_locations.get_locations(conn, doi, "unpaywall")
+    if locations is None:
+        return None
+    return unpaywall_result(locations)
+
+
+def import_unpaywall_snapshot(conn, path):
+    """Load Unpaywall data for the DOIs in articles from a snapshot file.
+
+    path is an Unpaywall snapshot (JSONL, optionally gzipped), which is
+    streamed line by line in constant memory. Lines are prefiltered by a
+    regex match on the DOI field, so only records for DOIs in the articles
+    table are JSON-decoded. Their OA locations are stored in the
+    oa_locations table (source "unpaywall"), where process_candidate finds
+    them instead of querying the Unpaywall API.
+
+    Returns (lines_read, dois_imported).
+    """
+    wanted = {row[0].lower(): row[0] for row in
+              conn.execute("SELECT doi FROM articles WHERE doi IS NOT NULL")}
+    log.info("Importing Unpaywall snapshot %s for %d DOIs", path, len(wanted))
+
+    opener = gzip.open if str(path).endswith(".gz") else open
+    lines = 0
+    imported = 0
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            lines += 1
+            if lines % 1_000_000 == 0:
+                log.info("  %d lines read, %d DOIs imported", lines, imported)
+            m = SNAPSHOT_DOI_RE.search(line)
+            if not m or m.group(1).lower() not in wanted:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                log.debug("  Skipping malformed snapshot line %d", lines)
+                continue
+            doi = wanted[m.group(1).lower()]
+            oa_locations.store_locations(conn, doi, "unpaywall",
+                                         unpaywall_locations(record), commit=False)
+            imported += 1
+            if imported % 1000 == 0:
+                conn.commit()
+    conn.commit()
+    return lines, imported
+
+
 # ---------------------------------------------------------------------------
 # Fallback OA sources
 # ---------------------------------------------------------------------------
@@ -339,84 +737,182 @@ def query_semantic_scholar(doi):
 
     Returns (pdf_url, landing_url) or (None, None).
     """
-    service_wait("semantic_scholar")
     url = f"{SEMANTIC_SCHOLAR_API}/paper/DOI:{quote(doi, safe='')}"
     params = {"fields": "openAccessPdf,url"}
 
-    try:
-        resp = requests.get(url, timeout=30, headers={
+    def request():
+        service_wait("semantic_scholar")
+        return requests.get(url, params=params, timeout=30, headers={
             "User-Agent": "Linglitter/1.0 (academic research tool)",
         })
-        if resp.status_code == 404:
+
+    try:
+        code, data = cached_json("semantic_scholar", doi, request)
+        if code == 404:
             log.debug("  Semantic Scholar: DOI not found")
             return None, None
-        if resp.status_code == 429:
+        if code == 429:
             log.debug("  Semantic Scholar: rate limited")
-            service_backoff("semantic_scholar")
             return None, None
-        if resp.status_code != 200:
-            log.debug("  Semantic Scholar: HTTP %d", resp.status_code)
+        if code != 200:
+            log.debug("  Semantic Scholar: HTTP %d", code)
             return None, None
 
-        data = resp.json()
-        oa_pdf = data.get("openAccessPdf")
-        landing = data.get("url")
-        if oa_pdf and oa_pdf.get("url"):
-            return oa_pdf["url"], landing
-        return None, landing
+        return _semantic_scholar_location(data)
 
     except requests.exceptions.RequestException as exc:
         log.debug("  Semantic Scholar request failed: %s", exc)
         return None, None
 
 
+def _semantic_scholar_location(paper):
+    """Extract (pdf_url, landing_url) from a Semantic Scholar paper record."""
+    oa_pdf = paper.get("openAccessPdf")
+    landing = paper.get("url")
+    if oa_pdf and oa_pdf.get("url"):
+        return oa_pdf["url"], landing
+    return None, landing
+
+
+def query_semantic_scholar_batch(dois):
+    """Look up many DOIs with one Semantic Scholar /paper/batch request.
+
+    Accepts up to SEMANTIC_SCHOLAR_BATCH_SIZE DOIs. Returns a dict
+    {doi: [(pdf_url, landing_url)]} with an empty list for DOIs Semantic
+    Scholar does not know, or None if the request failed.
+    """
+    service_wait("semantic_scholar")
+    url = f"{SEMANTIC_SCHOLAR_API}/paper/batch"
+    params = {"fields": "openAccessPdf,url"}
+
+    try:
+        resp = requests.post(url, params=params, timeout=120,
+                             json={"ids": [f"DOI:{doi}" for doi in dois]},
+                             headers={"User-Agent": "Linglitter/1.0 (academic research tool)"})
+        service_feedback("semantic_scholar", resp)
+        if resp.status_code == 429:
+            log.debug("  Semantic Scholar: rate limited")
+            return None
+        if resp.status_code != 200:
+            log.warning("Semantic Scholar batch: HTTP %d", resp.status_code)
+            return None
+
+        # Results are aligned with the request, with null for unknown IDs
+        results = {}
+        for doi, paper in zip(dois, resp.json()):
+            location = _semantic_scholar_location(paper) if paper else (None, None)
+            results[doi] = [location] if any(location) else []
+        return results
+
+    except (requests.exceptions.RequestException, ValueError) as exc:
+        log.warning("Semantic Scholar batch request failed: %s", exc)
+        return None
+
+
 def query_openalex(doi, mailto=None):
     """Query OpenAlex API for an open-access PDF URL.
 
     Returns (pdf_url, landing_url) or (None, None).
     """
-    service_wait("openalex")
     url = f"{OPENALEX_API}/works/doi:{quote(doi, safe='')}"
     params = {"select": "open_access,best_oa_location"}
     if mailto:
         params["mailto"] = mailto
 
+    def request():
+        service_wait("openalex")
+        return requests.get(url, params=params, timeout=30)
+
     try:
-        resp = requests.get(url, params=params, timeout=30)
-        if resp.status_code == 404:
+        code, data = cached_json("openalex", doi, request)
+        if code == 404:
             log.debug("  OpenAlex: DOI not found")
             return None, None
-        if resp.status_code == 429:
+        if code == 429:
             log.debug("  OpenAlex: rate limited")
-            service_backoff("openalex")
             return None, None
-        if resp.status_code != 200:
-            log.debug("  OpenAlex: HTTP %d", resp.status_code)
+        if code != 200:
+            log.debug("  OpenAlex: HTTP %d", code)
             return None, None
 
-        data = resp.json()
-
-        # Try best_oa_location first
-        best = data.get("best_oa_location")
-        if best:
-            pdf_url = best.get("pdf_url")
-            landing = best.get("landing_page_url")
-            if pdf_url:
-                return pdf_url, landing
-
-        # Fall back to open_access.oa_url
-        oa = data.get("open_access", {})
-        oa_url = oa.get("oa_url")
-        if oa_url:
-            return oa_url, None
-
-        return None, None
+        locations = _openalex_locations(data)
+        return locations[0] if locations else (None, None)
 
     except requests.exceptions.RequestException as exc:
         log.debug("  OpenAlex request failed: %s", exc)
         return None, None
 
 
+def _openalex_locations(work):
+    """Extract OA PDF locations from an OpenAlex work, best first.
+
+    Returns a list of (pdf_url, landing_url): best_oa_location, then any
+    other OA locations with a PDF URL (if the record includes them), then
+    open_access.oa_url as a last resort.
+    """
+    locations = []
+    seen = set()
+
+    def add(pdf_url, landing):
+        if pdf_url and pdf_url not in seen:
+            seen.add(pdf_url)
+            locations.append((pdf_url, landing))
+
+    # Try best_oa_location first
+    best = work.get("best_oa_location")
+    if best:
+        add(best.get("pdf_url"), best.get("landing_page_url"))
+
+    for loc in work.get("locations") or []:
+        if loc.get("is_oa"):
+            add(loc.get("pdf_url"), loc.get("landing_page_url"))
+
+    # Fall back to open_access.oa_url
+    oa = work.get("open_access") or {}
+    add(oa.get("oa_url"), None)
+
+    return locations
+
+
+def query_openalex_batch(dois, mailto=None):
+    """Look up many DOIs with one OpenAlex request (filter=doi:a|b|…).
+
+    Accepts up to OPENALEX_BATCH_SIZE DOIs. Returns a dict
+    {doi: [(pdf_url, landing_url), ...]} with an empty list for DOIs
+    OpenAlex does not know, or None if the request failed.
+    """
+    service_wait("openalex")
+    url = f"{OPENALEX_API}/works"
+    params = {
+        "filter": "doi:" + "|".join(dois),
+        "select": "doi,open_access,best_oa_location,locations",
+        "per-page": OPENALEX_BATCH_SIZE,
+    }
+    if mailto:
+        params["mailto"] = mailto
+
+    try:
+        resp = requests.get(url, params=params, timeout=60)
+        service_feedback("openalex", resp)
+        if resp.status_code == 429:
+            log.debug("  OpenAlex: rate limited")
+            return None
+        if resp.status_code != 200:
+            log.warning("OpenAlex batch: HTTP %d", resp.status_code)
+            return None
+
+        # OpenAlex returns DOIs as lowercase https://doi.org/ URLs
+        by_doi = {}
+        for work in resp.json().get("results", []):
+            work_doi = (work.get("doi") or "").lower().replace("https://doi.org/", "")
+            by_doi[work_doi] = _openalex_locations(work)
+        return {doi: by_doi.get(doi.lower(), []) for doi in dois}
+
+    except (requests.exceptions.RequestException, ValueError) as exc:
+        log.warning("OpenAlex batch request failed: %s", exc)
+        return None
+
+
 def query_core(doi, api_key):
     """Query CORE API for an open-access PDF URL.
 
@@ -426,22 +922,23 @@ def query_core(doi, api_key):
     if not api_key:
         return None, None
 
-    service_wait("core")
     url = f"{CORE_API}/search/works"
     params = {"q": f'doi:"{doi}"', "limit": 1}
     headers = {"Authorization": f"Bearer {api_key}"}
 
+    def request():
+        service_wait("core")
+        return requests.get(url, params=params, headers=headers, timeout=30)
+
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
-        if resp.status_code == 429:
+        code, data = cached_json("core", doi, request)
+        if code == 429:
             log.debug("  CORE: rate limited")
-            service_backoff("core")
             return None, None
-        if resp.status_code != 200:
-            log.debug("  CORE: HTTP %d", resp.status_code)
+        if code != 200:
+            log.debug("  CORE: HTTP %d", code)
             return None, None
 
-        data = resp.json()
         results = data.get("results", [])
         if not results:
             log.debug("  CORE: no results")
@@ -466,28 +963,25 @@ def query_core(doi, api_key):
         return None, None
 
 
-def _normalize_title(title):
-    """Lowercase, strip punctuation for fuzzy comparison."""
-    title = title.lower().strip()
-    title = re.sub(r'[^\w\s]', '', title)
-    title = re.sub(r'\s+', ' ', title)
-    return title
-
-
-def _title_similarity(a, b):
-    """Compute similarity ratio between two titles (0..1)."""
-    from difflib import SequenceMatcher
-    return SequenceMatcher(None, _normalize_title(a), _normalize_title(b)).ratio()
+def search_lingbuzz(title, conn=None):
+    """Find a LingBuzz paper by title and return its PDF URL if a good match is found.
 
-
-def search_lingbuzz(title):
-    """Search LingBuzz by title and return a PDF URL if a good match is found.
+    The title is first matched against the local LingBuzz index
+    (--sync-lingbuzz, see lingbuzz_index.py) without contacting LingBuzz.
+    Unless a sync has read the whole listing into the index, LingBuzz's
+    title search is queried when the index has no match.
 
     Returns (pdf_url, landing_url) or (None, None).
     """
     if not title or len(title) < 10:
         return None, None
 
+    if conn is not None:
+        pdf_url, landing_url = _best_lingbuzz_match(
+            title, lingbuzz_index.candidates(conn, title))
+        if pdf_url or lingbuzz_index.is_complete(conn):
+            return pdf_url, landing_url
+
     service_wait("lingbuzz")
 
     # Use first ~8 significant words for the search query
@@ -499,10 +993,8 @@ def search_lingbuzz(title):
     search_url = f"{LINGBUZZ_URL}?_s={quote(query)}"
 
     try:
-        resp = requests.get(search_url, timeout=30, headers={
-            "User-Agent": "Linglitter/1.0 (academic research tool)",
-            "Accept": "text/html",
-        })
+        resp = requests.get(search_url, timeout=30, headers=LINGBUZZ_HEADERS)
+        service_feedback("lingbuzz", resp)
         if resp.status_code != 200:
             log.debug("  LingBuzz: HTTP %d", resp.status_code)
             return None, None
@@ -522,33 +1014,63 @@ def search_lingbuzz(title):
             log.debug("  LingBuzz: no results for query")
             return None, None
 
-        best_score = 0.0
-        best_id = None
+        results = []
         for path, paper_id, link_text in matches:
             # Clean HTML from link text
             link_text = re.sub(r'<[^>]+>', '', link_text).strip()
             link_text = html_unescape(link_text)
-            if not link_text or len(link_text) < 10:
-                continue
+            results.append((paper_id, link_text))
+        return _best_lingbuzz_match(title, results)
 
-            score = _title_similarity(title, link_text)
-            if score > best_score:
-                best_score = score
-                best_id = paper_id
+    except requests.exceptions.RequestException as exc:
+        log.debug("  LingBuzz search failed: %s", exc)
+        return None, None
 
-        if best_id and best_score >= 0.75:
-            pdf_url = f"{LINGBUZZ_URL}/{best_id}/current.pdf"
-            landing_url = f"{LINGBUZZ_URL}/{best_id}"
-            log.info("  LingBuzz: matched (score=%.2f) → %s", best_score, landing_url)
-            return pdf_url, landing_url
-        elif best_id:
-            log.debug("  LingBuzz: best match score %.2f too low", best_score)
 
-        return None, None
+def _best_lingbuzz_match(title, results):
+    """Pick the LingBuzz paper whose title matches best from (id, title) pairs.
+
+    Returns (pdf_url, landing_url), or (None, None) if no title reaches
+    title_match.MATCH_THRESHOLD.
+    """
+    results = [(paper_id, paper_title) for paper_id, paper_title in results
+               if paper_title and len(paper_title) >= 10]
+    best = title_match.TitleIndex([t for _, t in results]).best(title)
+    if best and best[0] >= title_match.MATCH_THRESHOLD:
+        best_score, i = best
+        paper_id = f"{int(results[i][0]):06d}"
+        pdf_url = f"{LINGBUZZ_URL}/{paper_id}/current.pdf"
+        landing_url = f"{LINGBUZZ_URL}/{paper_id}"
+        log.info("  LingBuzz: matched (score=%.0f) → %s", best_score, landing_url)
+        return pdf_url, landing_url
+    elif best:
+        log.debug("  LingBuzz: best match score %.0f too low", best[0])
+    else:
+        log.debug("  LingBuzz: no match found")
+    return None, None
+
 
+def _fetch_lingbuzz_listing(url):
+    """Fetch one LingBuzz listing page for the index sync (None on failure)."""
+    service_wait("lingbuzz")
+    try:
+        resp = requests.get(url, timeout=30, headers=LINGBUZZ_HEADERS)
     except requests.exceptions.RequestException as exc:
-        log.debug("  LingBuzz search failed: %s", exc)
-        return None, None
+        log.warning("LingBuzz listing request failed: %s", exc)
+        return None
+    service_feedback("lingbuzz", resp)
+    if resp.status_code != 200:
+        log.warning("LingBuzz listing: HTTP %d", resp.status_code)
+        return None
+    return resp.text
+
+
+def sync_lingbuzz_index(conn):
+    """Update the local LingBuzz index from the newest listings (--sync-lingbuzz).
+
+    Returns the number of papers added.
+    """
+    return lingbuzz_index.sync(conn, _fetch_lingbuzz_listing, LINGBUZZ_URL)
 
 
 # ---------------------------------------------------------------------------
@@ -594,6 +1116,73 @@ def _is_cloudflare_challenge(html):
     return any(marker in html_lower for marker in cf_markers)
 
 
+# Markers only found on actual challenge interstitials (Cloudflare's
+# challenge script and its options). The other markers of
+# _is_cloudflare_challenge also occur on ordinary pages that load
+# cdnjs.cloudflare.com or embed a reCAPTCHA form.
+CHALLENGE_PAGE_MARKERS = ("cf_chl_opt", "challenge-platform", "cf-browser-verification")
+
+
+def _is_certain_challenge(html):
+    """True if the HTML is certainly a challenge page, not just challenge-like."""
+    html_lower = html.lower()
+    return any(marker in html_lower for marker in CHALLENGE_PAGE_MARKERS)
+
+
+HTML_TAG_RE = re.compile(r'<(meta|link)\s([^>]*)>', re.IGNORECASE)
+HTML_ATTR_RE = re.compile(r'([\w.:-]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+
+
+def _tag_attrs(attr_text):
+    """Parse the attributes of an HTML tag into a dict (lower-case names)."""
+    attrs = {}
+    for name, value in HTML_ATTR_RE.findall(attr_text):
+        if value[:1] in ("'", '"'):
+            value = value[1:-1]
+        attrs[name.lower()] = html_unescape(value).strip()
+    return attrs
+
+
+def extract_meta_pdf_urls(html, base_url):
+    """Extract the PDF URLs a page declares in its metadata, best first.
+
+    Publishers, OJS and repository software announce the article PDF in
+    Highwire Press tags (<meta name="citation_pdf_url">), in
+    <link rel="alternate" type="application/pdf"> or in Dublin Core
+    (<meta name="dc.identifier">, only if the value is a PDF URL rather
+    than a DOI). These are authoritative, unlike the guesses of
+    extract_pdf_links.
+
+    Returns a deduplicated list of absolute URLs.
+    """
+    highwire, alternate, dublin_core = [], [], []
+    for m in HTML_TAG_RE.finditer(html):
+        attrs = _tag_attrs(m.group(2))
+        if m.group(1).lower() == "meta":
+            name = attrs.get("name", attrs.get("property", "")).lower()
+            value = attrs.get("content")
+            if not value:
+                continue
+            if name in ("citation_pdf_url", "bepress_citation_pdf_url"):
+                highwire.append(value)
+            elif name in ("dc.identifier", "dcterms.identifier"):
+                lower = value.lower()
+                if lower.startswith("http") and (".pdf" in lower or "/pdf" in lower
+                                                 or "/download/" in lower):
+                    dublin_core.append(value)
+        elif (attrs.get("type", "").lower() == "application/pdf"
+              and "alternate" in attrs.get("rel", "").lower().split()
+              and attrs.get("href")):
+            alternate.append(attrs["href"])
+
+    urls = []
+    for url in highwire + alternate + dublin_core:
+        abs_url = urljoin(base_url, url)
+        if abs_url not in urls:
+            urls.append(abs_url)
+    return urls
+
+
 def extract_pdf_links(html, base_url):
     """Extract candidate PDF download links from an HTML page.
 
@@ -657,110 +1246,118 @@ def download_pdf(pdf_url, dest_path, landing_url=None, timeout=60, session=None)
 
     If landing_url is provided, first visits the landing page to collect
     session cookies, then downloads the PDF. This helps with publishers
-    that require cookies for PDF access.
+    that require cookies for PDF access. The landing page is also parsed
+    for the PDF URL it declares (citation_pdf_url etc., see
+    extract_meta_pdf_urls), which is tried before pdf_url.
 
     If session is provided, uses that session (preserving cookies from
     previous requests to the same publisher). Otherwise creates a new session.
+    The transfer itself goes through the shared download engine.
 
-    Returns (success, http_status_code).
+    Returns (success, http_status_code, url) where url is the URL the PDF
+    was finally downloaded from (None on failure).
     """
     # Use provided session or create a new one
     if session is None:
-        session = requests.Session()
-        session.headers.update(BROWSER_HEADERS)
-
-    try:
-        # First visit landing page to collect cookies if provided
-        if landing_url:
-            log.debug("  Visiting landing page for cookies: %s", landing_url)
-            try:
-                landing_resp = session.get(landing_url, timeout=timeout, allow_redirects=True)
-                log.debug("  Landing page status: %d, cookies: %d",
-                         landing_resp.status_code, len(session.cookies))
-                # Small delay to appear more human-like
-                time.sleep(0.5)
-            except requests.exceptions.RequestException as exc:
-                log.debug("  Landing page visit failed: %s", exc)
-                # Continue anyway, might still work
-
-        # Set referer to landing page or PDF domain
-        parsed = urlparse(pdf_url)
-        referer = landing_url if landing_url else f"{parsed.scheme}://{parsed.netloc}/"
-        session.headers["Referer"] = referer
-        # Update Sec-Fetch for same-origin navigation
-        session.headers["Sec-Fetch-Site"] = "same-origin"
+        session = pooled_session(BROWSER_HEADERS)
 
+    # First visit landing page to collect cookies if provided
+    declared = []
+    if landing_url:
+        log.debug("  Visiting landing page for cookies: %s", landing_url)
+        try:
+            landing_resp = session.get(landing_url, timeout=timeout, allow_redirects=True)
+            log.debug("  Landing page status: %d, cookies: %d",
+                     landing_resp.status_code, len(session.cookies))
+            if (landing_resp.status_code == 200
+                    and "html" in landing_resp.headers.get("Content-Type", "").lower()):
+                declared = extract_meta_pdf_urls(landing_resp.text, landing_resp.url)
+            # Small delay to appear more human-like
+            time.sleep(0.5)
+        except requests.exceptions.RequestException as exc:
+            log.debug("  Landing page visit failed: %s", exc)
+            # Continue anyway, might still work
+
+    # Set referer to landing page or PDF domain
+    parsed = urlparse(pdf_url)
+    referer = landing_url if landing_url else f"{parsed.scheme}://{parsed.netloc}/"
+    session.headers["Referer"] = referer
+    # Update Sec-Fetch for same-origin navigation
+    session.headers["Sec-Fetch-Site"] = "same-origin"
+
+    # The URL the landing page declares comes first; pdf_url is the fallback
+    urls = [pdf_url]
+    if declared and declared[0] != pdf_url:
+        log.info("  Landing page declares PDF: %s", declared[0])
+        urls.insert(0, declared[0])
+
+    for url in urls:
         # Now fetch the PDF with PDF-specific Accept header
         session.headers["Accept"] = "application/pdf,*/*;q=0.9"
-        resp = session.get(pdf_url, timeout=timeout, stream=True, allow_redirects=True)
-        code = resp.status_code
+        result = _download_engine.fetch(url, dest_path, session, keep_html=True,
+                                        timeout=timeout)
+        if result.reason == HTML:
+            # An HTML page instead of a PDF: look for the PDF link in it
+            follow_url = _pdf_link_from_html(result.html, url)
+            if follow_url in urls:
+                log.debug("  PDF link already tried: %s", follow_url)
+                success, code = False, 403
+            elif follow_url:
+                log.info("  HTML page contained PDF link, following: %s", follow_url)
+                time.sleep(0.5)
+                session.headers["Referer"] = url
+                success, code = _follow_pdf_link(follow_url, dest_path, session, timeout)
+                if success:
+                    return True, code, follow_url
+            else:
+                success, code = False, 403
+        else:
+            _log_fetch_failure(result, url)
+            success, code = result.ok, result.code
+            if success:
+                return True, code, url
 
-        if code != 200:
-            log.warning("Download failed with status %d: %s", code, pdf_url)
-            return False, code
+    return False, code, None
 
-        # Check Content-Type to ensure we got a PDF, not an HTML error page
-        content_type = resp.headers.get("Content-Type", "").lower()
-        if "html" in content_type:
-            # Read the HTML body to look for PDF links
-            html_body = resp.text
-            resp.close()
 
-            if _is_cloudflare_challenge(html_body):
-                log.warning("Got Cloudflare/bot challenge instead of PDF: %s", pdf_url)
-                return False, 403
+def _pdf_link_from_html(html_body, page_url):
+    """Pick the PDF link to follow from an HTML page served instead of a PDF.
 
-            pdf_links = extract_pdf_links(html_body, pdf_url)
+    The PDF URL declared in the page's metadata wins; otherwise a single
+    candidate link found by extract_pdf_links is used. Returns None (after
+    logging why) if there is no usable link.
+    """
+    # Checked before the challenge markers: a challenge interstitial never
+    # declares citation_pdf_url, but real article pages often mention
+    # "cloudflare" or "recaptcha" somewhere
+    declared = [url for url in extract_meta_pdf_urls(html_body, page_url) if url != page_url]
+    if declared:
+        return declared[0]
+
+    if _is_cloudflare_challenge(html_body):
+        log.warning("Got Cloudflare/bot challenge instead of PDF: %s", page_url)
+        # Only a certain challenge blocks the host and path section; a page
+        # that merely looks like one is recorded for its own URL
+        if _is_certain_challenge(html_body):
+            get_negative_cache().add(page_url, negative_cache.CHALLENGE, 403)
+        else:
+            get_negative_cache().add(page_url, negative_cache.FORBIDDEN, 403)
+        return None
 
-            if len(pdf_links) == 1:
-                # Single PDF link found — follow it automatically
-                follow_url = pdf_links[0]
-                log.info("  HTML page contained PDF link, following: %s", follow_url)
-                time.sleep(0.5)
-                session.headers["Referer"] = pdf_url
-                return _follow_pdf_link(follow_url, dest_path, session, timeout)
-
-            if len(pdf_links) > 1:
-                # --- TEMPORARY: multiple links, log for manual review ---
-                # TODO(link-selection): Replace this block with automatic
-                # link selection once patterns are understood.
-                log.warning("Got HTML instead of PDF with %d candidate PDF links:", len(pdf_links))
-                for i, link in enumerate(pdf_links, 1):
-                    log.warning("  [%d] %s", i, link)
-                log.warning("  Manual review needed for: %s", pdf_url)
-                # --- END TEMPORARY ---
-                return False, 403
-
-            log.warning("Got HTML instead of PDF, no PDF links found: %s", pdf_url)
-            return False, 403
-
-        # Ensure directory exists
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write content
-        with open(dest_path, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fh.write(chunk)
-
-        # Verify we got something reasonable (and it's actually a PDF)
-        if dest_path.stat().st_size < 1000:
-            log.warning("Downloaded file suspiciously small: %s", dest_path)
-            dest_path.unlink()
-            return False, code
-
-        # Check PDF magic bytes
-        with open(dest_path, "rb") as fh:
-            magic = fh.read(5)
-        if magic != b"%PDF-":
-            log.warning("Downloaded file is not a PDF (magic: %s): %s", magic[:20], dest_path)
-            dest_path.unlink()
-            return False, 403
-
-        return True, code
+    pdf_links = extract_pdf_links(html_body, page_url)
+    if len(pdf_links) == 1:
+        return pdf_links[0]
 
-    except requests.exceptions.RequestException as exc:
-        log.warning("Download request failed: %s", exc)
-        return False, 0
+    if len(pdf_links) > 1:
+        # No declared PDF URL and several candidates: log for manual review
+        log.warning("Got HTML instead of PDF with %d candidate PDF links:", len(pdf_links))
+        for i, link in enumerate(pdf_links, 1):
+            log.warning("  [%d] %s", i, link)
+        log.warning("  Manual review needed for: %s", page_url)
+        return None
+
+    log.warning("Got HTML instead of PDF, no PDF links found: %s", page_url)
+    return None
 
 
 def _follow_pdf_link(pdf_url, dest_path, session, timeout=60):
@@ -768,258 +1365,540 @@ def _follow_pdf_link(pdf_url, dest_path, session, timeout=60):
 
     Returns (success, http_status_code).
     """
-    try:
-        session.headers["Accept"] = "application/pdf,*/*;q=0.9"
-        resp = session.get(pdf_url, timeout=timeout, stream=True, allow_redirects=True)
-        code = resp.status_code
+    session.headers["Accept"] = "application/pdf,*/*;q=0.9"
+    result = _download_engine.fetch(pdf_url, dest_path, session, timeout=timeout)
+    if result.reason == HTML:
+        log.warning("  Followed PDF link returned HTML again: %s", pdf_url)
+    else:
+        _log_fetch_failure(result, pdf_url, prefix="  Followed PDF link: ")
+    return result.ok, result.code
 
-        if code != 200:
-            log.warning("  Followed PDF link failed with status %d: %s", code, pdf_url)
-            return False, code
 
-        content_type = resp.headers.get("Content-Type", "").lower()
-        if "html" in content_type:
-            resp.close()
-            log.warning("  Followed PDF link returned HTML again: %s", pdf_url)
-            return False, 403
+def _log_fetch_failure(result, pdf_url, prefix=""):
+    """Log why a download engine fetch failed (nothing on success)."""
+    if result.ok:
+        return
+    if result.reason:
+        log.warning("%sDownloaded file rejected (%s): %s", prefix, result.reason, pdf_url)
+    elif result.code:
+        log.warning("%sDownload failed with status %d: %s", prefix, result.code, pdf_url)
+    else:
+        log.warning("%sDownload request failed: %s", prefix, pdf_url)
+
 
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+# ---------------------------------------------------------------------------
+# Concurrent fallback lookups
+# ---------------------------------------------------------------------------
 
-        with open(dest_path, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fh.write(chunk)
+def _live_lookup(query, *args, **kwargs):
+    """Run a single-location query and wrap its result as a location list."""
+    pdf_url, landing_url = query(*args, **kwargs)
+    return [(pdf_url, landing_url)] if pdf_url or landing_url else []
 
-        if dest_path.stat().st_size < 1000:
-            log.warning("  Followed PDF link: file suspiciously small: %s", dest_path)
-            dest_path.unlink()
-            return False, code
 
-        with open(dest_path, "rb") as fh:
-            magic = fh.read(5)
-        if magic != b"%PDF-":
-            log.warning("  Followed PDF link: not a PDF (magic: %s): %s", magic[:20], dest_path)
-            dest_path.unlink()
-            return False, 403
+class _DeferredLookup:
+    """A lookup that only runs when its result is asked for, like a Future.
 
-        return True, code
+    Used for LingBuzz, whose slow title search should only be paid for
+    when its turn in the cascade actually comes, and for the sources
+    ordered after it.
+    """
 
-    except requests.exceptions.RequestException as exc:
-        log.warning("  Followed PDF link request failed: %s", exc)
-        return False, 0
+    def __init__(self, query, *args, **kwargs):
+        self._call = (query, args, kwargs)
+
+    def result(self):
+        query, args, kwargs = self._call
+        return _live_lookup(query, *args, **kwargs)
+
+    def cancel(self):
+        return True
+
+
+def start_fallback_lookups(conn, doi, mailto=None, core_api_key=None, title=None,
+                           publisher=None, journal=None, sources_cfg=None):
+    """Fire the Semantic Scholar, OpenAlex and CORE lookups for a DOI at once.
+
+    Called once the Unpaywall URL has failed (or there is none): a lookup
+    that has started cannot be called off, and the rate-limited services
+    should not be spent on articles Unpaywall already serves. Sources
+    prefetched with --prefetch are answered from the oa_locations table
+    without an API call. The remaining lookups run in background threads,
+    so their per-service waits overlap instead of adding up. Each service
+    still gets its SERVICE_INTERVALS spacing. The LingBuzz title search
+    (if a title is given) and any source ordered after it are deferred
+    until their turn comes; with a synced LingBuzz index
+    (--sync-lingbuzz), LingBuzz is a local lookup and does not hold back
+    the sources after it.
+
+    The cascade order is Semantic Scholar, OpenAlex, CORE, LingBuzz, unless
+    enough outcomes have been recorded for the publisher or journal: then
+    the sources are ordered by expected yield per request, and with
+    sources.prune_below set, sources that hardly ever deliver are not
+    queried at all (see source_stats.py and the "sources" config section).
+
+    Returns a list of (source_name, service, future) in cascade order; each
+    future resolves to a list of (pdf_url, landing_url), best first. Pass
+    it to cancel_fallback_lookups() once it is no longer needed.
+    """
+    sources_cfg = sources_cfg or {}
+    sources = [
+        ("Semantic Scholar", "semantic_scholar", query_semantic_scholar, (doi,), {}),
+        ("OpenAlex", "openalex", query_openalex, (doi,), {"mailto": mailto}),
+    ]
+    if core_api_key:
+        sources.append(("CORE", "core", query_core, (doi, core_api_key), {}))
+    # With a complete local index, LingBuzz titles are matched without a request
+    lingbuzz_local = lingbuzz_index.is_complete(conn)
+    if title:
+        sources.append(("LingBuzz", "lingbuzz", search_lingbuzz, (title,), {"conn": conn}))
+
+    prefetched = {service: oa_locations.get_locations(conn, doi, service)
+                  for _, service, _, _, _ in sources if service != "lingbuzz"}
+    if sources_cfg.get("adaptive", True):
+        # Cost of consulting a source: its request spacing, plus one unit
+        # for the download; prefetched or locally indexed answers cost no
+        # request
+        costs = {service: 1 + (0 if prefetched.get(service) is not None
+                               or (service == "lingbuzz" and lingbuzz_local)
+                               else SERVICE_INTERVALS.get(service, 0))
+                 for _, service, _, _, _ in sources}
+        order, pruned = source_stats.rank(
+            conn, publisher, journal, costs,
+            prune_below=sources_cfg.get("prune_below", 0.0),
+            prune_min_trials=sources_cfg.get("prune_min_trials", 30))
+        if pruned:
+            log.info("  Skipping low-yield sources for %s: %s", publisher, ", ".join(pruned))
+        sources = sorted((src for src in sources if src[1] in order),
+                         key=lambda src: order.index(src[1]))
+
+    lookups = []
+    deferred = False
+    for name, service, query, args, kwargs in sources:
+        deferred = deferred or (service == "lingbuzz" and not lingbuzz_local)
+        if prefetched.get(service) is not None:
+            future = Future()
+            future.set_result(prefetched[service])
+        elif deferred or service == "lingbuzz":
+            # The local LingBuzz lookup runs on this thread's connection
+            future = _DeferredLookup(query, *args, **kwargs)
+        else:
+            future = _lookup_executor.submit(_live_lookup, query, *args, **kwargs)
+        lookups.append((name, service, future))
+    return lookups
+
+
+def cancel_fallback_lookups(lookups):
+    """Drop lookups that have not started yet (running ones just finish)."""
+    for _, _, future in lookups:
+        future.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Bulk prefetch (--prefetch)
+# ---------------------------------------------------------------------------
+
+def prefetch_oa_locations(conn, config):
+    """Resolve OA locations for the whole queued backlog with batch requests.
+
+    Looks up every pending DOI of the work queue that has not been
+    prefetched yet, OPENALEX_BATCH_SIZE DOIs per OpenAlex request and
+    SEMANTIC_SCHOLAR_BATCH_SIZE per Semantic Scholar request, and stores
+    the results in the oa_locations table. process_candidate then uses
+    these instead of querying the two services per article. DOIs in failed
+    batches are left for the live lookup (or the next prefetch).
+
+    Returns {service: number of DOIs stored}.
+    """
+    mailto = config["unpaywall"].get("mailto")
+    dois = work_queue.pending_dois(conn, QUEUE_STAGE)
+    batched = [
+        ("openalex", OPENALEX_BATCH_SIZE,
+         lambda chunk: query_openalex_batch(chunk, mailto=mailto)),
+        ("semantic_scholar", SEMANTIC_SCHOLAR_BATCH_SIZE, query_semantic_scholar_batch),
+    ]
+
+    stored = {}
+    for service, batch_size, query in batched:
+        done = oa_locations.fetched_dois(conn, service)
+        todo = [doi for doi in dois if doi not in done]
+        if service == "openalex":
+            # '|' and ',' are separators in OpenAlex filters
+            todo = [doi for doi in todo if "|" not in doi and "," not in doi]
+        log.info("Prefetching %s: %d DOIs to look up", service, len(todo))
+
+        stored[service] = 0
+        for start in range(0, len(todo), batch_size):
+            chunk = todo[start:start + batch_size]
+            results = query(chunk)
+            if results is None:
+                continue
+            for doi, locations in results.items():
+                oa_locations.store_locations(conn, doi, service, locations, commit=False)
+            conn.commit()
+            stored[service] += len(results)
+            log.info("  %s: %d/%d DOIs", service, start + len(chunk), len(todo))
+
+    return stored
 
 
 # ---------------------------------------------------------------------------
 # Main processing
 # ---------------------------------------------------------------------------
 
-def _try_download(pdf_url, abs_path, landing_url=None, publisher=None):
+def _try_download(conn, doi, pdf_url, abs_path, landing_url=None, publisher=None):
     """Try downloading a PDF, managing per-publisher sessions.
 
+    If a learned URL rule of the landing page's host applies (see
+    host_knowledge.py), the rewritten URL is fetched first, without
+    visiting the landing page. Otherwise, or if that fails, pdf_url is
+    downloaded as usual, and a success teaches a rule for later articles.
+    A rule that gives pdf_url itself is not tried separately; the usual
+    download counts as its outcome, so a refusing host is not asked twice.
+
+    The landing page is only visited for cookies on hosts that need it
+    (see _download_primed).
+
+    A downloaded file whose content is already stored for another DOI
+    (e.g. a publisher's placeholder PDF) is discarded and reported as
+    HTTP 409, so the cascade moves on to the next source. Otherwise the
+    file's SHA-256 and size are recorded for the article.
+
+    URLs that recently failed for any article, and URLs on hosts that
+    recently answered with a bot challenge, are skipped without a request
+    (see negative_cache.py); the code of the cached failure is returned.
+
     Returns (success, http_code).
     """
-    if publisher:
-        session, is_new_session, elapsed_str = get_publisher_session(publisher)
-        parsed_url = urlparse(pdf_url)
-        server_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        if is_new_session:
-            log.info("  Session started: %s (%s)", publisher, server_url)
+    known_bad = get_negative_cache().lookup(pdf_url)
+    if known_bad:
+        outcome, code, expires_at = known_bad
+        log.info("  Skipping known bad URL (%s, HTTP %d, until %s)", outcome, code,
+                 datetime.fromtimestamp(expires_at).strftime("%Y-%m-%d %H:%M"))
+        return False, code
+
+    # Sources without a publisher (e.g. repository URLs) get a session per
+    # host. Unlike a publisher's, a host's session can be wanted by several
+    # workers at once, and downloads change its headers (Referer, Accept),
+    # so it is held for the whole attempt.
+    session_key = publisher or f"host:{urlparse(pdf_url).netloc}"
+    with get_session_store().use(session_key):
+        if publisher:
+            session, is_new_session, elapsed_str = get_publisher_session(publisher)
+            parsed_url = urlparse(pdf_url)
+            server_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+            if is_new_session:
+                log.info("  Session started: %s (%s)", publisher, server_url)
+            else:
+                log.info("  Session continued: %s (%s) [%s]",
+                         publisher, server_url, elapsed_str)
         else:
-            log.info("  Session continued: %s (%s) [%s]", publisher, server_url, elapsed_str)
+            session = get_session_store().get(session_key)[0]
+
+        success = False
+        rule_url, rule = (host_knowledge.predict(conn, landing_url) if landing_url
+                          else (None, None))
+        if rule_url and rule_url != pdf_url:
+            known_bad = get_negative_cache().lookup(rule_url)
+            if known_bad:
+                log.info("  Skipping known bad URL from learned rule (%s, HTTP %d)",
+                         known_bad[0], known_bad[1])
+            else:
+                log.info("  Learned URL rule gives: %s", rule_url)
+                success, http_code, _ = _download_polite(rule_url, abs_path, None, session)
+                host_knowledge.record_outcome(conn, rule, success)
+                if not success:
+                    get_negative_cache().record_failure(rule_url, http_code)
+
+        if not success:
+            success, http_code, used_url = _download_primed(conn, pdf_url, abs_path,
+                                                            landing_url, session)
+            if rule_url == pdf_url:
+                host_knowledge.record_outcome(conn, rule, success and used_url == pdf_url)
+            if success and landing_url:
+                host_knowledge.learn(conn, landing_url, used_url)
+
+        get_session_store().save(session_key)
+
+    if success and pdf_store.check_download(conn, doi, abs_path):
+        success, http_code = False, 409
+    if success:
+        get_negative_cache().clear(pdf_url)
     else:
-        session = requests.Session()
-        session.headers.update(BROWSER_HEADERS)
+        get_negative_cache().record_failure(pdf_url, http_code)
+    return success, http_code
 
-    return download_pdf(pdf_url, abs_path, landing_url=landing_url, session=session)
 
+def _download_primed(conn, pdf_url, abs_path, landing_url, session):
+    """Download pdf_url, visiting landing_url first only where that is needed.
 
-def process_one(conn, config, dry_run=False):
-    """Process a single article using cascading OA sources.
+    Hosts known to serve PDFs directly, and hosts not seen before, get a
+    direct request first; if that fails for any reason, the landing page
+    is visited and the PDF it declares (or pdf_url) is tried after all, so
+    that a stale pdf_url (404/410, server error) still leads to the
+    declared PDF. Hosts known to need the visit get it right away. Which
+    way worked is recorded per host (host_knowledge.record_priming), but
+    the visit is only counted as needed after a refusal (401/403, or HTML
+    instead of the PDF).
 
-    Tries Unpaywall → Semantic Scholar → OpenAlex → CORE → LingBuzz.
-    Each source is only queried if the previous one did not yield a
-    successful download.
+    Returns (success, http_code, url) as download_pdf.
+    """
+    if not landing_url:
+        return _download_polite(pdf_url, abs_path, None, session)
 
-    Returns:
+    host = urlparse(pdf_url).netloc
+    if host_knowledge.needs_priming(conn, host):
+        success, http_code, url = _download_polite(pdf_url, abs_path, landing_url, session)
+        if success:
+            host_knowledge.record_priming(conn, host, direct=False)
+        return success, http_code, url
+
+    success, http_code, url = _download_polite(pdf_url, abs_path, None, session)
+    if success:
+        host_knowledge.record_priming(conn, host, direct=True)
+        return success, http_code, url
+    refused = http_code in host_knowledge.PRIMING_RETRY_CODES
+    if refused:
+        log.info("  Direct request refused (HTTP %d), retrying after landing page visit",
+                 http_code)
+    else:
+        log.info("  Direct request failed (HTTP %d), trying via landing page", http_code)
+    success, http_code, url = _download_polite(pdf_url, abs_path, landing_url, session)
+    if success and refused:
+        host_knowledge.record_priming(conn, host, direct=False)
+    return success, http_code, url
+
+
+def _download_polite(pdf_url, abs_path, landing_url, session):
+    """download_pdf() under the host's politeness record and rate limit.
+
+    Returns (success, http_code, url) as download_pdf.
+    """
+    host = urlparse(pdf_url).netloc
+    if _politeness_store is not None:
+        _politeness_store.record(host=host)
+    # Hosts are only slowed down once they have answered 429/503
+    metrics.waited("host", get_rate_limiter().wait(rate_limit.HOST, host))
+
+    success, http_code, url = download_pdf(pdf_url, abs_path, landing_url=landing_url,
+                                           session=session)
+    if http_code:
+        get_rate_limiter().feedback(rate_limit.HOST, host, status=http_code)
+    return success, http_code, url
+
+
+def process_one(conn, config, dry_run=False, offset=0):
+    """Select the next queued article and process it.
+
+    Returns (result, doi) where result is one of:
     - "downloaded": successfully downloaded
     - "no-oa": confirmed not open access
     - "failed": download attempted but failed from all sources
-    - "skipped": politeness violation, try again later
-    - "exhausted": max attempts reached
+    - "dry-run": candidate shown but not processed (--dry-run)
     - None: no candidates left
+
+    Only articles of publishers that are not cooling down are picked. If
+    every publisher with pending articles is cooling down, this sleeps
+    until the first one becomes free.
+
+    In dry-run mode, offset skips that many queued candidates so that
+    successive calls preview different articles (politeness is ignored).
     """
     years = config["years"]
     journals = config["journals"]
     unpaywall_cfg = config["unpaywall"]
-    pdf_dir = config.get("pdf_dir", "pdf")
-    core_api_key = config.get("core_api_key")
-    mailto = unpaywall_cfg.get("mailto")
 
-    # Get a random candidate
-    candidate = get_random_candidate(conn, years, journals)
-    if not candidate:
-        return None, None
+    if dry_run:
+        candidate = get_next_candidate(conn, years, journals,
+                                       unpaywall_cfg["max_attempts"], offset=offset)
+        if not candidate:
+            return None, None
+        log.info("Processing: %s", candidate["doi"])
+        log.info("  [DRY RUN] Would query Unpaywall and attempt download")
+        return "dry-run", candidate["doi"]
+
+    scheduler = PublisherScheduler(get_politeness_store(_database_path(conn)),
+                                   unpaywall_cfg["politeness_interval"],
+                                   unpaywall_cfg["publisher_interval"])
+    while True:
+        candidate, wait = get_eligible_candidate(conn, years, journals,
+                                                 unpaywall_cfg["max_attempts"], scheduler)
+        if candidate is None:
+            if wait is None:
+                return None, None
+            log.info("All publishers with pending articles are cooling down — "
+                     "waiting %.1fs", wait)
+            time.sleep(wait)
+            metrics.waited("publisher", wait)
+            continue
+        # Only fails if another process contacted the publisher meanwhile
+        ok, wait = scheduler.try_acquire(candidate["publisher"])
+        if ok:
+            break
 
     doi = candidate["doi"]
     publisher = candidate["publisher"]
-    journal = candidate["journal"]
-    year = candidate["year"]
-    title = candidate["title"]
-
-    # Check attempt count
-    attempts = get_article_attempts(conn, doi)
-    if attempts >= unpaywall_cfg["max_attempts"]:
-        log.debug("Max attempts reached for %s", doi)
-        return "exhausted", doi
-
-    # Check politeness
-    ok, wait = check_politeness(
-        conn, publisher,
-        unpaywall_cfg["politeness_interval"],
-        unpaywall_cfg["publisher_interval"]
-    )
-    if not ok:
-        log.debug("Politeness wait %.1fs for publisher %s", wait, publisher)
-        return "skipped", doi
+    if wait > 0:
+        time.sleep(wait)
+        metrics.waited("publisher", wait)
 
     log.info("Processing: %s", doi)
-
-    if dry_run:
-        log.info("  [DRY RUN] Would query Unpaywall and attempt download")
-        return "skipped", doi
-
-    now = datetime.now().isoformat()
-    attempts += 1
-
-    # Build paths
-    abs_path, rel_path = build_pdf_path(pdf_dir, doi)
+    try:
+        result = process_candidate(conn, config, candidate)
+    finally:
+        scheduler.release(publisher)
+    work_queue.mark_done(conn, QUEUE_STAGE, doi)
+    metrics.article(result)
+    return result, doi
+
+
+def _download_from_sources(conn, doi, publisher, journal, unpaywall, start_lookups,
+                           tried_urls, abs_path, rel_path, attempts, now):
+    """Try the Unpaywall URL, then the fallback lookup results in order.
+
+    start_lookups() starts the fallback lookups (see
+    start_fallback_lookups); it is only called when the Unpaywall URL
+    fails or is missing. Each result is awaited only when its turn in the
+    cascade comes, and a source's locations are
+    tried best first. URLs in tried_urls are skipped, and every URL tried
+    is added to it. Whether each consulted source delivered the PDF is
+    recorded in source_stats.
+
+    Returns (outcome, best_landing): outcome is "downloaded" or None.
+    """
+    pdf_url = unpaywall["pdf_url"]
+    landing_url = unpaywall["landing_url"]
+    # Collect the best landing page URL for jump_url (used by prepare_manual.py)
+    best_landing = landing_url
 
     # ------------------------------------------------------------------
     # Source 1: Unpaywall
     # ------------------------------------------------------------------
-    result = query_unpaywall(doi, mailto)
-
-    if not result["is_oa"]:
-        log.info("  Not OA (Unpaywall response: %d)", result["response_code"])
-        update_article(conn, doi, availability="no-oa", source=None,
-                      attempts=attempts, response=result["response_code"],
-                      timestamp=now, file_path=None)
-        return "no-oa", doi
-
-    # It's OA. Try to download from cascading sources.
-    pdf_url = result["pdf_url"]
-    landing_url = result["landing_url"]
-    tried_urls = set()
-    # Collect the best landing page URL for jump_url (used by prepare_manual.py)
-    best_landing = landing_url
-
     if pdf_url:
         log.info("  [Unpaywall] PDF: %s", pdf_url)
         tried_urls.add(pdf_url)
         success, http_code = _try_download(
-            pdf_url, abs_path, landing_url=landing_url, publisher=publisher)
+            conn, doi, pdf_url, abs_path, landing_url=landing_url, publisher=publisher)
+        source_stats.record(conn, publisher, journal, "unpaywall", success)
         if success:
             log.info("  Downloaded via Unpaywall: %s", rel_path)
             update_article(conn, doi, availability="oa", source=pdf_url,
                           attempts=attempts, response=http_code,
                           timestamp=now, file_path=rel_path)
-            return "downloaded", doi
+            return "downloaded", best_landing
         log.info("  [Unpaywall] download failed (HTTP %d), trying fallbacks…", http_code)
     else:
         log.info("  [Unpaywall] OA but no PDF URL, trying fallbacks…")
 
     # ------------------------------------------------------------------
-    # Source 2: Semantic Scholar
+    # Fallback sources: Semantic Scholar, OpenAlex, CORE (looked up
+    # concurrently) and LingBuzz (title search), in cascade order
     # ------------------------------------------------------------------
-    log.info("  Trying Semantic Scholar…")
-    s2_url, s2_landing = query_semantic_scholar(doi)
-    if s2_landing and not best_landing:
-        best_landing = s2_landing
-    if s2_url and s2_url not in tried_urls:
-        log.info("  [Semantic Scholar] PDF: %s", s2_url)
-        tried_urls.add(s2_url)
-        success, http_code = _try_download(s2_url, abs_path, landing_url=s2_landing)
+    lookups = start_lookups()
+    try:
+        return _download_from_lookups(conn, doi, publisher, journal, lookups, tried_urls,
+                                      best_landing, abs_path, rel_path, attempts, now)
+    finally:
+        cancel_fallback_lookups(lookups)
+
+
+def _download_from_lookups(conn, doi, publisher, journal, lookups, tried_urls,
+                           best_landing, abs_path, rel_path, attempts, now):
+    """The fallback part of _download_from_sources, over started lookups."""
+    for source, service, future in lookups:
+        log.info("  Trying %s…", source)
+        locations = future.result()
+        if not any(src_url for src_url, _ in locations):
+            log.debug("  [%s] no PDF URL", source)
+        success = False
+        for src_url, src_landing in locations:
+            if src_landing and not best_landing:
+                best_landing = src_landing
+            if not src_url:
+                continue
+            if src_url in tried_urls:
+                log.debug("  [%s] same URL already tried, skipping", source)
+                continue
+            log.info("  [%s] PDF: %s", source, src_url)
+            tried_urls.add(src_url)
+            success, http_code = _try_download(conn, doi, src_url, abs_path,
+                                               landing_url=src_landing)
+            if success:
+                break
+            log.info("  [%s] download failed (HTTP %d)", source, http_code)
+        source_stats.record(conn, publisher, journal, service, success)
         if success:
-            log.info("  Downloaded via Semantic Scholar: %s", rel_path)
-            update_article(conn, doi, availability="oa", source=s2_url,
+            log.info("  Downloaded via %s: %s", source, rel_path)
+            update_article(conn, doi, availability="oa", source=src_url,
                           attempts=attempts, response=http_code,
                           timestamp=now, file_path=rel_path)
-            return "downloaded", doi
-        log.info("  [Semantic Scholar] download failed (HTTP %d)", http_code)
-    elif s2_url:
-        log.debug("  [Semantic Scholar] same URL as Unpaywall, skipping")
-    else:
-        log.debug("  [Semantic Scholar] no PDF URL")
+            return "downloaded", best_landing
 
-    # ------------------------------------------------------------------
-    # Source 3: OpenAlex
-    # ------------------------------------------------------------------
-    log.info("  Trying OpenAlex…")
-    oa_url, oa_landing = query_openalex(doi, mailto=mailto)
-    if oa_landing and not best_landing:
-        best_landing = oa_landing
-    if oa_url and oa_url not in tried_urls:
-        log.info("  [OpenAlex] PDF: %s", oa_url)
-        tried_urls.add(oa_url)
-        success, http_code = _try_download(oa_url, abs_path, landing_url=oa_landing)
-        if success:
-            log.info("  Downloaded via OpenAlex: %s", rel_path)
-            update_article(conn, doi, availability="oa", source=oa_url,
-                          attempts=attempts, response=http_code,
-                          timestamp=now, file_path=rel_path)
-            return "downloaded", doi
-        log.info("  [OpenAlex] download failed (HTTP %d)", http_code)
-    elif oa_url:
-        log.debug("  [OpenAlex] same URL already tried, skipping")
-    else:
-        log.debug("  [OpenAlex] no PDF URL")
+    return None, best_landing
 
-    # ------------------------------------------------------------------
-    # Source 4: CORE
-    # ------------------------------------------------------------------
-    if core_api_key:
-        log.info("  Trying CORE…")
-        core_url, core_landing = query_core(doi, core_api_key)
-        if core_landing and not best_landing:
-            best_landing = core_landing
-        if core_url and core_url not in tried_urls:
-            log.info("  [CORE] PDF: %s", core_url)
-            tried_urls.add(core_url)
-            success, http_code = _try_download(core_url, abs_path, landing_url=core_landing)
-            if success:
-                log.info("  Downloaded via CORE: %s", rel_path)
-                update_article(conn, doi, availability="oa", source=core_url,
-                              attempts=attempts, response=http_code,
-                              timestamp=now, file_path=rel_path)
-                return "downloaded", doi
-            log.info("  [CORE] download failed (HTTP %d)", http_code)
-        elif core_url:
-            log.debug("  [CORE] same URL already tried, skipping")
-        else:
-            log.debug("  [CORE] no PDF URL")
+
+def process_candidate(conn, config, candidate):
+    """Process a single article using cascading OA sources.
+
+    Tries Unpaywall, then Semantic Scholar → OpenAlex → CORE → LingBuzz.
+    Unpaywall decides whether the article is OA at all. If it is and its
+    URL fails, the Semantic Scholar, OpenAlex and CORE lookups are fired
+    concurrently; their URLs are then tried in cascade order, skipping
+    duplicates. LingBuzz (a slow title search) is
+    only queried when its turn comes. Once enough outcomes are recorded
+    for the publisher, the fallback sources are reordered by their yield
+    (see start_fallback_lookups).
+
+    Returns:
+    - "downloaded": successfully downloaded
+    - "no-oa": confirmed not open access
+    - "failed": download attempted but failed from all sources
+    """
+    unpaywall_cfg = config["unpaywall"]
+    pdf_dir = config.get("pdf_dir", "pdf")
+    core_api_key = config.get("core_api_key")
+    mailto = unpaywall_cfg.get("mailto")
+
+    doi = candidate["doi"]
+    publisher = candidate["publisher"]
+    journal = candidate.get("journal")
+    title = candidate["title"]
+    attempts = candidate["attempts"]
+
+    now = datetime.now().isoformat()
+    attempts += 1
+
+    # Build paths
+    abs_path, rel_path = build_pdf_path(pdf_dir, doi)
 
     # ------------------------------------------------------------------
-    # Source 5: LingBuzz (title search, last resort)
+    # Source 1: Unpaywall
     # ------------------------------------------------------------------
-    if title:
-        log.info("  Trying LingBuzz…")
-        lb_url, lb_landing = search_lingbuzz(title)
-        if lb_landing and not best_landing:
-            best_landing = lb_landing
-        if lb_url and lb_url not in tried_urls:
-            log.info("  [LingBuzz] PDF: %s", lb_url)
-            tried_urls.add(lb_url)
-            success, http_code = _try_download(lb_url, abs_path, landing_url=lb_landing)
-            if success:
-                log.info("  Downloaded via LingBuzz: %s", rel_path)
-                update_article(conn, doi, availability="oa", source=lb_url,
-                              attempts=attempts, response=http_code,
-                              timestamp=now, file_path=rel_path)
-                return "downloaded", doi
-            log.info("  [LingBuzz] download failed (HTTP %d)", http_code)
-        elif lb_url:
-            log.debug("  [LingBuzz] same URL already tried, skipping")
-        else:
-            log.debug("  [LingBuzz] no match found")
+    result = unpaywall_from_snapshot(conn, doi)
+    if result is not None:
+        log.debug("  [Unpaywall] from imported snapshot")
+    else:
+        result = query_unpaywall(doi, mailto)
+
+    if not result["is_oa"]:
+        log.info("  Not OA (Unpaywall response: %d)", result["response_code"])
+        update_article(conn, doi, availability="no-oa", source=None,
+                      attempts=attempts, response=result["response_code"],
+                      timestamp=now, file_path=None)
+        return "no-oa"
+
+    # It's OA. The fallback lookups are only started if the Unpaywall URL
+    # fails.
+    def start_lookups():
+        return start_fallback_lookups(conn, doi, mailto=mailto, core_api_key=core_api_key,
+                                      title=title, publisher=publisher, journal=journal,
+                                      sources_cfg=config.get("sources"))
+    tried_urls = set()
+    outcome, best_landing = _download_from_sources(
+        conn, doi, publisher, journal, result, start_lookups, tried_urls,
+        abs_path, rel_path, attempts, now)
+    if outcome:
+        return outcome
 
     # ------------------------------------------------------------------
     # All sources exhausted — mark as no-oa so scrape_repo.py picks it up
@@ -1027,11 +1906,255 @@ def process_one(conn, config, dry_run=False):
     log.warning("  All sources exhausted for %s", doi)
     if best_landing:
         log.info("  Saving jump URL: %s", best_landing)
-    source_tried = pdf_url  # original Unpaywall URL, if any
+    source_tried = result["pdf_url"]  # original Unpaywall URL, if any
     update_article(conn, doi, availability="no-oa", source=source_tried,
                   attempts=attempts, response=result.get("response_code", 0),
                   timestamp=now, file_path=None, jump_url=best_landing)
-    return "failed", doi
+    return "failed"
+
+
+def _worker_loop(worker_id, db_path, config, scheduler, state):
+    """Body of one download worker thread (see run_workers)."""
+    years = config["years"]
+    journals = config["journals"]
+    max_attempts = config["unpaywall"]["max_attempts"]
+    limit = state["limit"]
+
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        while not state["stop"].is_set():
+            with state["lock"]:
+                if worker_id > state["workers"]:
+                    break  # the worker count was lowered (see set_worker_count)
+                if limit and state["started"] >= limit:
+                    break
+                # Picking, claiming and reserving the publisher is serialised
+                # between workers so that two threads never take the same
+                # article or publisher. The queue is only re-synchronised
+                # when no other worker is busy.
+                candidate, wait = get_eligible_candidate(
+                    conn, years, journals, max_attempts, scheduler,
+                    resync=not state["active"])
+                idle = candidate is None and wait is None
+                if idle and not state["active"]:
+                    if state["daemon"]:
+                        # Idle: look for new articles again later
+                        log.debug("[w%d] Nothing to do, idling", worker_id)
+                        wait = DAEMON_IDLE_INTERVAL
+                    else:
+                        log.info("No more candidates to process")
+                        state["stop"].set()
+                        scheduler.wake()
+                        break
+                if candidate is not None:
+                    ok, wait = scheduler.try_acquire(candidate["publisher"])
+                    if ok:
+                        work_queue.claim(conn, QUEUE_STAGE, candidate["doi"])
+                        state["started"] += 1
+                        state["active"] += 1
+                    else:
+                        candidate = None
+
+            if candidate is None:
+                # Every publisher with pending articles is busy or cooling
+                # down: sleep until the first one is free or released.
+                started = time.monotonic()
+                scheduler.wait(wait, state["stop"])
+                if not idle:
+                    metrics.waited("publisher", time.monotonic() - started)
+                continue
+
+            doi = candidate["doi"]
+            publisher = candidate["publisher"]
+            try:
+                if wait > 0:
+                    time.sleep(wait)
+                    metrics.waited("publisher", wait)
+                log.info("[w%d] Processing: %s (%s)", worker_id, doi, publisher)
+                result = process_candidate(conn, config, candidate)
+                work_queue.mark_done(conn, QUEUE_STAGE, doi)
+                metrics.article(result)
+                with state["lock"]:
+                    state["stats"][result] += 1
+            except Exception:
+                log.exception("[w%d] Error processing %s", worker_id, doi)
+                work_queue.unclaim(conn, QUEUE_STAGE, doi)
+                metrics.article("error")
+            finally:
+                scheduler.release(publisher)
+                with state["lock"]:
+                    state["active"] -= 1
+    finally:
+        conn.close()
+
+
+def set_worker_count(state, workers):
+    """Start or retire worker threads until workers of them are running.
+
+    Surplus workers (those with the highest numbers) exit after their
+    current article.
+    """
+    if workers < 0:
+        raise ValueError("worker count must not be negative")
+    with state["lock"]:
+        state["workers"] = workers
+        for worker_id in range(1, workers + 1):
+            thread = state["threads"].get(worker_id)
+            if thread is not None and thread.is_alive():
+                continue
+            thread = threading.Thread(
+                target=_worker_loop, name=f"worker-{worker_id}",
+                args=(worker_id, state["db_path"], state["config"],
+                      state["scheduler"], state),
+                daemon=True)
+            state["threads"][worker_id] = thread
+            thread.start()
+    state["scheduler"].wake()
+
+
+def _running_threads(state):
+    with state["lock"]:
+        return [t for t in state["threads"].values() if t.is_alive()]
+
+
+def _control_handlers(state):
+    """Commands of the daemon's control socket (see control.py)."""
+    scheduler = state["scheduler"]
+
+    def status():
+        conn = sqlite3.connect(state["db_path"], timeout=60)
+        try:
+            pending = work_queue.count_pending(conn, QUEUE_STAGE)
+        finally:
+            conn.close()
+        with state["lock"]:
+            reply = {
+                "uptime": int(time.monotonic() - state["started_at"]),
+                "workers": state["workers"],
+                "running": sum(t.is_alive() for t in state["threads"].values()),
+                "active": state["active"],
+                "started": state["started"],
+                "stats": dict(state["stats"]),
+            }
+        reply["pending"] = pending
+        reply["busy"] = sorted(scheduler.busy_publishers(), key=str)
+        reply["paused"] = sorted(scheduler.paused_publishers(), key=str)
+        reply["skipped_bad_urls"] = get_negative_cache().skips
+        reply["articles_per_hour"] = {outcome: round(rate, 1) for outcome, rate
+                                      in metrics.articles_per_hour().items()}
+        if _api_cache is not None:
+            reply["api_cache"] = {"hits": _api_cache.hits, "misses": _api_cache.misses}
+        return reply
+
+    def pause(publisher):
+        scheduler.pause(publisher)
+        log.info("Paused publisher: %s", publisher)
+        return {"paused": sorted(scheduler.paused_publishers(), key=str)}
+
+    def resume(publisher):
+        scheduler.resume(publisher)
+        log.info("Resumed publisher: %s", publisher)
+        return {"paused": sorted(scheduler.paused_publishers(), key=str)}
+
+    def workers(n):
+        set_worker_count(state, int(n))
+        log.info("Worker count set to %d", int(n))
+        return {"workers": int(n)}
+
+    def stop():
+        log.info("Stop requested — waiting for workers to finish current articles")
+        state["stop"].set()
+        scheduler.wake()
+        return {}
+
+    return {"status": status, "pause": pause, "resume": resume,
+            "workers": workers, "stop": stop}
+
+
+def run_workers(db_path, config, workers, limit=None, control_path=None):
+    """Process articles with several worker threads, one publisher per worker.
+
+    Downloads for different publishers run in parallel, so throughput
+    scales with the number of distinct publishers rather than being
+    bounded by publisher_interval. Runs until the queue is drained,
+    --limit is reached, or the user interrupts.
+
+    If control_path is given, runs as a daemon instead: an empty queue is
+    re-checked every DAEMON_IDLE_INTERVAL seconds, and publishers, the
+    worker count and progress can be managed through a control socket at
+    control_path (see control.py) until a "stop" command, SIGTERM or ^C.
+
+    Returns a stats dict like the serial loop in main().
+    """
+    unpaywall_cfg = config["unpaywall"]
+    scheduler = PublisherScheduler(get_politeness_store(db_path),
+                                   unpaywall_cfg["politeness_interval"],
+                                   unpaywall_cfg["publisher_interval"])
+
+    state = {
+        "lock": threading.Lock(),
+        "stop": threading.Event(),
+        "stats": {"downloaded": 0, "no-oa": 0, "failed": 0},
+        "started": 0,
+        "active": 0,
+        "limit": limit,
+        "daemon": control_path is not None,
+        "workers": 0,
+        "threads": {},
+        "db_path": db_path,
+        "config": config,
+        "scheduler": scheduler,
+        "started_at": time.monotonic(),
+    }
+    server = None
+    if control_path is not None:
+        server = ControlServer(control_path, _control_handlers(state))
+        server.start()
+
+    log.info("Starting %d download workers", workers)
+    set_worker_count(state, workers)
+
+    try:
+        while not state["stop"].is_set() and (state["daemon"] or _running_threads(state)):
+            state["stop"].wait(1.0)
+    except KeyboardInterrupt:
+        log.info("Interrupted by user — waiting for workers to finish current articles")
+        state["stop"].set()
+        scheduler.wake()
+    finally:
+        if server is not None:
+            server.close()
+    for t in _running_threads(state):
+        t.join()
+
+    return state["stats"]
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def control_daemon(socket_path, words):
+    """Send a --control command (command word plus arguments) to the daemon."""
+    cmd, values = words[0], words[1:]
+    if cmd not in CONTROL_COMMANDS:
+        log.error("Unknown control command: %s (expected one of: %s)",
+                  cmd, ", ".join(CONTROL_COMMANDS))
+        return 1
+    names = CONTROL_COMMANDS[cmd]
+    if len(values) != len(names):
+        log.error("Usage: --control %s", " ".join([cmd] + [n.upper() for n in names]))
+        return 1
+    try:
+        reply = send_command(socket_path, cmd, **dict(zip(names, values)))
+    except OSError as e:
+        log.error("No daemon reachable at %s: %s", socket_path, e)
+        return 1
+    if not reply.pop("ok"):
+        log.error("%s", reply.get("error"))
+        return 1
+    print(json.dumps(reply, indent=2, ensure_ascii=False))
+    return 0
 
 
 def main():
@@ -1052,6 +2175,30 @@ def main():
     parser.add_argument("--reset-oa-attempts", action="store_true",
                         help="Reset attempt counters for OA articles without files, "
                              "so they are retried with fallback sources")
+    parser.add_argument("--rebuild-queue", action="store_true",
+                        help="Re-synchronise the work queue with the articles table")
+    parser.add_argument("--import-unpaywall-snapshot", type=str, default=None,
+                        metavar="PATH",
+                        help="Load Unpaywall data for all DOIs in the database from a "
+                             "snapshot file (.jsonl or .jsonl.gz), then exit")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Look up OA locations for the whole backlog with batch "
+                             "requests (OpenAlex, Semantic Scholar), then exit")
+    parser.add_argument("--sync-lingbuzz", action="store_true",
+                        help="Update the local LingBuzz index from the newest "
+                             "listings, then exit")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Download for up to N publishers in parallel "
+                             "(implies --continuous; default: 1)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running when the queue is empty and accept commands "
+                             "on a control socket (see --control)")
+    parser.add_argument("--socket", type=str, default=None, metavar="PATH",
+                        help="Control socket of --daemon (default: <db>.sock)")
+    parser.add_argument("--control", type=str, nargs="+", default=None,
+                        metavar="CMD",
+                        help="Send a command to a running daemon and exit: status, "
+                             "pause PUBLISHER, resume PUBLISHER, workers N, stop")
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -1060,6 +2207,13 @@ def main():
         datefmt="%H:%M:%S",
     )
 
+    socket_path = args.socket or f"{args.db}.sock"
+    if args.control:
+        return control_daemon(socket_path, args.control)
+    if args.daemon and args.dry_run:
+        log.error("--daemon cannot be combined with --dry-run")
+        return 1
+
     # Load config
     config_path = Path(args.config)
     if not config_path.exists():
@@ -1072,7 +2226,8 @@ def main():
     if args.mailto:
         config["unpaywall"]["mailto"] = args.mailto
 
-    if not config["unpaywall"].get("mailto"):
+    if (not config["unpaywall"].get("mailto") and not args.import_unpaywall_snapshot
+            and not args.sync_lingbuzz):
         log.error("Please set 'mailto' via --mailto or in config.json for Unpaywall API access")
         return 1
 
@@ -1084,30 +2239,104 @@ def main():
 
     conn = sqlite3.connect(args.db)
     ensure_schema(conn)  # Add missing columns if needed
-
-    # Reset failed OA articles back to NULL so they re-enter the pipeline
+    cache = init_api_cache(args.db, config)
+    init_rate_limiter(args.db)
+    init_download_engine(config)
+    init_session_store(args.db)
+    init_negative_cache(args.db)
+
+    # Reset failed OA articles back to NULL so they re-enter the pipeline,
+    # and drop their prefetched locations so they are looked up afresh
     if args.reset_oa_attempts:
-        cur = conn.execute("""
+        failed = "type = 'article' AND availability = 'no-oa' AND file IS NULL"
+        cleared = oa_locations.clear(conn, failed)
+        cur = conn.execute(f"""
             UPDATE articles SET availability = NULL, attempts = 0
-            WHERE type = 'article' AND availability = 'no-oa' AND file IS NULL
+            WHERE {failed}
         """)
         conn.commit()
-        log.info("Reset %d failed articles back to NULL for retry", cur.rowcount)
+        log.info("Reset %d failed articles back to NULL for retry (%d prefetched "
+                 "locations dropped)", cur.rowcount, cleared)
+
+    # Make sure the work queue reflects the current articles table and config
+    work_queue.ensure_synced(conn, QUEUE_STAGE, config["years"], config["journals"],
+                             config["unpaywall"]["max_attempts"],
+                             force=args.rebuild_queue or args.reset_oa_attempts)
+
+    if args.import_unpaywall_snapshot:
+        snapshot = Path(args.import_unpaywall_snapshot)
+        if not snapshot.exists():
+            log.error("Snapshot file not found: %s", snapshot)
+            conn.close()
+            return 1
+        lines, imported = import_unpaywall_snapshot(conn, snapshot)
+        conn.close()
+        log.info("Done — read %d snapshot lines, imported %d DOIs", lines, imported)
+        return 0
+
+    if args.sync_lingbuzz:
+        added = sync_lingbuzz_index(conn)
+        total = conn.execute("SELECT COUNT(*) FROM lingbuzz_papers").fetchone()[0]
+        conn.close()
+        log.info("Done — LingBuzz index: %d new papers, %d in total", added, total)
+        return 0
+
+    if args.prefetch:
+        stored = prefetch_oa_locations(conn, config)
+        conn.close()
+        log.info("Done — prefetched: %s",
+                 ", ".join(f"{service} {n}" for service, n in stored.items()))
+        return 0
 
     # Ensure PDF directory exists
     pdf_dir = Path(config.get("pdf_dir", "pdf"))
     pdf_dir.mkdir(parents=True, exist_ok=True)
 
     # Stats
-    stats = {"downloaded": 0, "no-oa": 0, "failed": 0, "skipped": 0, "exhausted": 0}
+    stats = {"downloaded": 0, "no-oa": 0, "failed": 0, "dry-run": 0}
     processed = 0
 
     log.info("Starting PDF scraper (years %d–%d, %d journals)",
              config["years"][0], config["years"][1], len(config["journals"]))
+    exporter = None
+    if not args.dry_run:
+        exporter = metrics.start_exporter(
+            "scrape_pdfs", args.db, config,
+            gauges={"queue_backlog": lambda c: work_queue.count_pending(c, QUEUE_STAGE)})
+
+    if args.daemon:
+        conn.close()
+        # Let `kill` shut down as cleanly as ^C
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+        try:
+            stats = run_workers(args.db, config, args.workers, control_path=socket_path)
+        except RuntimeError as e:
+            log.error("%s", e)
+            return 1
+        finally:
+            if exporter is not None:
+                exporter.close()
+        get_session_store().close()
+        log.info("Done — downloaded: %d, no-oa: %d, failed: %d (API cache: %d hits, %d misses)",
+                 stats["downloaded"], stats["no-oa"], stats["failed"],
+                 cache.hits, cache.misses)
+        return 0
+
+    if args.workers > 1 and not args.dry_run:
+        conn.close()
+        stats = run_workers(args.db, config, args.workers, limit=args.limit)
+        if exporter is not None:
+            exporter.close()
+        get_session_store().close()
+        log.info("Done — downloaded: %d, no-oa: %d, failed: %d (API cache: %d hits, %d misses)",
+                 stats["downloaded"], stats["no-oa"], stats["failed"],
+                 cache.hits, cache.misses)
+        return 0
 
     try:
         while True:
-            result, doi = process_one(conn, config, args.dry_run)
+            result, doi = process_one(conn, config, args.dry_run,
+                                      offset=stats["dry-run"])
 
             if result is None:
                 log.info("No more candidates to process")
@@ -1116,32 +2345,30 @@ def main():
             if result in stats:
                 stats[result] += 1
 
-            if result == "skipped":
-                # Wait a bit before next attempt to avoid busy-looping
-                time.sleep(0.5)
-                continue
-
             processed += 1
 
             if args.limit and processed >= args.limit:
                 log.info("Reached limit of %d articles", args.limit)
                 break
 
-            if not args.continuous and result in ("downloaded", "no-oa", "failed"):
+            if not args.continuous and result in ("downloaded", "no-oa", "failed", "dry-run"):
                 # In non-continuous mode, process one article and exit
                 break
 
             # Small delay between articles
             time.sleep(config["unpaywall"]["politeness_interval"])
+            metrics.waited("interval", config["unpaywall"]["politeness_interval"])
 
     except KeyboardInterrupt:
         log.info("Interrupted by user")
 
+    if exporter is not None:
+        exporter.close()
+    get_session_store().close()
     conn.close()
 
-    log.info("Done — downloaded: %d, no-oa: %d, failed: %d, skipped: %d, exhausted: %d",
-             stats["downloaded"], stats["no-oa"], stats["failed"],
-             stats["skipped"], stats["exhausted"])
+    log.info("Done — downloaded: %d, no-oa: %d, failed: %d (API cache: %d hits, %d misses)",
+             stats["downloaded"], stats["no-oa"], stats["failed"], cache.hits, cache.misses)
     return 0
 
 
@@ -26,8 +26,19 @@ from urllib.parse import urlparse
 
 import requests
 
+import metrics
+import pdf_store
+import politeness
+import work_queue
+from pdf_download import DownloadEngine, pooled_session
+from politeness import PolitenessStore
+from session_store import SessionStore
+
 log = logging.getLogger(__name__)
 
+# Work queue stage drained by this script (availability = 'no-oa')
+QUEUE_STAGE = "repo"
+
 # Minimal curl-like headers (curl sends very few headers by default)
 # Some servers reject requests with too many headers
 CURL_HEADERS = {
@@ -52,35 +63,46 @@ BROWSER_HEADERS = {
     "Priority": "u=0, i",
 }
 
-# Per-repo session storage: {repo_url: (session, last_used_datetime)}
-_repo_sessions = {}
+# Shared download engine (configured from the "download" config section in main)
+_download_engine = DownloadEngine()
+
+# Process-wide session store (see get_session_store)
+_session_store = None
 
 # Per-repo failure counter: {repo_url: failure_count}
 _repo_failures = {}
 
+# Process-wide politeness store (see get_politeness_store)
+_politeness_store = None
+
+
+def get_session_store(conn):
+    """Return the process-wide session store, creating it on first use."""
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore(conn, CURL_HEADERS)
+    return _session_store
 
-def get_repo_session(repo_url):
+
+def get_repo_session(conn, repo_url):
     """Get or create a requests session for a repository.
 
     Sessions are reused across downloads from the same repository,
     preserving cookies and appearing more like normal browser behavior.
+    Their cookies are kept in the database, so they also carry over to
+    later runs (see session_store.py).
 
     Returns (session, is_new, elapsed_str) where:
     - is_new: True if a fresh session was created
     - elapsed_str: For continued sessions, time since last use as "HH:MM"
     """
-    now = datetime.now()
-    if repo_url not in _repo_sessions:
-        session = requests.Session()
-        session.headers.update(CURL_HEADERS)
-        _repo_sessions[repo_url] = (session, now)
+    session, is_new, last_used = get_session_store(conn).get(repo_url)
+    if is_new or last_used is None:
         return session, True, None
-    session, last_used = _repo_sessions[repo_url]
-    elapsed = now - last_used
+    elapsed = datetime.now() - last_used
     total_minutes = int(elapsed.total_seconds() // 60)
     hours, minutes = divmod(total_minutes, 60)
     elapsed_str = f"{hours:02d}:{minutes:02d}"
-    _repo_sessions[repo_url] = (session, now)
     return session, False, elapsed_str
 
 
@@ -104,6 +126,18 @@ def get_active_repos(repos, max_failures):
     return [r for r in repos if not is_repo_disabled(r, max_failures)]
 
 
+def get_politeness_store(conn):
+    """Return the process-wide politeness store, creating it on first use.
+
+    The store is shared with scrape_pdfs.py and scrape_openlibhum.py and
+    remembers the last download per repository host across runs.
+    """
+    global _politeness_store
+    if _politeness_store is None:
+        _politeness_store = PolitenessStore(conn)
+    return _politeness_store
+
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -114,32 +148,67 @@ def load_config(config_path):
         return json.load(fh)
 
 
+def politeness_settings(local_cfg):
+    """Waits between articles from the "local" config section.
+
+    cooldown_probability is clamped to [0.01, 0.99].
+    """
+    settings = {
+        "politeness_min": local_cfg.get("politeness_min", 180),
+        "politeness_random": local_cfg.get("politeness_random", 20),
+        "politeness_skip": local_cfg.get("politeness_skip", 1),
+        "cooldown_probability": local_cfg.get("cooldown_probability", 0.1),
+        "cooldown_min": local_cfg.get("cooldown_min", 60),
+        "cooldown_max": local_cfg.get("cooldown_max", 180),
+    }
+    if settings["cooldown_probability"] < 0.01:
+        log.warning("cooldown_probability %.3f is below minimum 0.01, setting to 0.01",
+                    settings["cooldown_probability"])
+        settings["cooldown_probability"] = 0.01
+    elif settings["cooldown_probability"] > 0.99:
+        log.warning("cooldown_probability %.3f exceeds maximum 0.99, setting to 0.99",
+                    settings["cooldown_probability"])
+        settings["cooldown_probability"] = 0.99
+    return settings
+
+
+def next_article_delay(result, settings, rnd=random):
+    """Seconds to wait before the next DOI after an article with this result.
+
+    Returns (wait, cooldown): politeness_skip if no download link was
+    found (no PDF downloaded, so no random component), else politeness_min
+    plus 5 to politeness_random seconds; and a random cooldown of
+    cooldown_min to cooldown_max seconds with probability
+    cooldown_probability (else 0). rnd is the random number generator
+    (simulate_politeness.py passes a seeded one).
+    """
+    if result == "no_download_link":
+        wait = settings["politeness_skip"]
+    else:
+        wait = settings["politeness_min"] + rnd.randint(5, settings["politeness_random"])
+    cooldown = 0
+    if rnd.random() < settings["cooldown_probability"]:
+        cooldown = rnd.randint(settings["cooldown_min"], settings["cooldown_max"])
+    return wait, cooldown
+
+
 # ---------------------------------------------------------------------------
 # Database helpers
 # ---------------------------------------------------------------------------
 
-def get_random_nonoa_candidate(conn, years, journals):
-    """Select a random article that is marked as no-oa and not yet downloaded.
+def get_next_nonoa_candidate(conn, years, journals, offset=0):
+    """Select the next article that is marked as no-oa and not yet downloaded.
 
-    Selects from articles where availability = 'no-oa' and file IS NULL.
+    Selects from articles where availability = 'no-oa' and file IS NULL,
+    in the pre-shuffled order of the work queue (see work_queue.py).
+    When the queue runs dry it is re-synchronised once to pick up
+    articles that scrape_pdfs.py has marked since the last sync.
     """
-    placeholders = ",".join("?" for _ in journals)
-    query = f"""
-        SELECT doi, publisher, journal, year
-        FROM articles
-        WHERE type = 'article'
-          AND year >= ? AND year <= ?
-          AND journal IN ({placeholders})
-          AND file IS NULL
-          AND availability = 'no-oa'
-        ORDER BY RANDOM()
-        LIMIT 1
-    """
-    params = [years[0], years[1]] + journals
-    row = conn.execute(query, params).fetchone()
-    if row:
-        return {"doi": row[0], "publisher": row[1], "journal": row[2], "year": row[3]}
-    return None
+    candidate = work_queue.pick_next(conn, QUEUE_STAGE, years, journals, offset=offset)
+    if candidate is None and offset == 0:
+        if work_queue.sync_queue(conn, QUEUE_STAGE, years, journals):
+            candidate = work_queue.pick_next(conn, QUEUE_STAGE, years, journals)
+    return candidate
 
 
 def update_article(conn, doi, availability, source, attempts, response, timestamp, file_path):
@@ -223,8 +292,7 @@ def fetch_landing_page(page_url, timeout=60, session=None, verify=True):
     Returns (html_content, http_status_code) or (None, code) on failure.
     """
     if session is None:
-        session = requests.Session()
-        session.headers.update(CURL_HEADERS)
+        session = pooled_session(CURL_HEADERS)
 
     try:
         # Keep headers minimal like curl
@@ -248,72 +316,46 @@ def download_pdf_direct(pdf_url, dest_path, referer_url, timeout=60, session=Non
     If session is provided, uses that session (preserving cookies from
     previous requests to the same repository). Otherwise creates a new session.
 
-    Uses minimal curl-like headers to avoid 403 errors.
+    Uses minimal curl-like headers to avoid 403 errors. Theses can be very
+    large, so interrupted transfers are continued with range requests
+    (resumable downloads of the shared download engine).
 
     Returns (success, http_status_code).
     """
     if session is None:
-        session = requests.Session()
-        session.headers.update(CURL_HEADERS)
-
-    try:
-        # Keep headers minimal like curl, just add referer
-        session.headers["Referer"] = referer_url
-
-        resp = session.get(pdf_url, timeout=timeout, stream=True, allow_redirects=True, verify=verify)
-        code = resp.status_code
+        session = pooled_session(CURL_HEADERS)
 
-        if code != 200:
-            log.debug("Download failed with status %d: %s", code, pdf_url)
-            return False, code
-
-        # Check Content-Type to ensure we got a PDF, not an HTML error page
-        content_type = resp.headers.get("Content-Type", "").lower()
-        if "html" in content_type:
-            log.debug("Got HTML instead of PDF (Content-Type: %s): %s", content_type, pdf_url)
-            return False, 403
-
-        # Ensure directory exists
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write content
-        with open(dest_path, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fh.write(chunk)
-
-        # Verify we got something reasonable
-        if dest_path.stat().st_size < 1000:
-            log.debug("Downloaded file suspiciously small: %s", dest_path)
-            dest_path.unlink()
-            return False, code
-
-        # Check PDF magic bytes
-        with open(dest_path, "rb") as fh:
-            magic = fh.read(5)
-        if magic != b"%PDF-":
-            log.debug("Downloaded file is not a PDF (magic: %s): %s", magic[:20], dest_path)
-            dest_path.unlink()
-            return False, 403
-
-        return True, code
+    # Keep headers minimal like curl, just add referer
+    session.headers["Referer"] = referer_url
 
-    except requests.exceptions.RequestException as exc:
-        log.debug("Download request failed: %s", exc)
-        return False, 0
+    result = _download_engine.fetch(pdf_url, dest_path, session, resume=True,
+                                    timeout=timeout, verify=verify)
+    if result.reason:
+        log.debug("Downloaded file rejected (%s): %s", result.reason, pdf_url)
+    elif not result.ok and result.code:
+        log.debug("Download failed with status %d: %s", result.code, pdf_url)
+    elif not result.ok:
+        log.debug("Download request failed: %s", pdf_url)
+    return result.ok, result.code
 
 
 # ---------------------------------------------------------------------------
 # Main processing
 # ---------------------------------------------------------------------------
 
-def process_one(conn, config, dry_run=False):
+def process_one(conn, config, dry_run=False, offset=0):
     """Process a single non-OA article by trying all repositories.
 
     Returns:
     - "downloaded": successfully downloaded from a repository
     - "failed": tried all active repositories, none succeeded
+    - "no_download_link": landing page has no download link (marked manual)
     - "all_disabled": all repositories have been disabled due to failures
+    - "dry-run": candidate shown but not processed (--dry-run)
     - None: no candidates left
+
+    In dry-run mode, offset skips that many queued candidates so that
+    successive calls preview different articles.
     """
     years = config["years"]
     journals = config["journals"]
@@ -337,8 +379,9 @@ def process_one(conn, config, dry_run=False):
         return "all_disabled", None
     random.shuffle(active_repos)
 
-    # Get a random non-OA candidate
-    candidate = get_random_nonoa_candidate(conn, years, journals)
+    # Get the next non-OA candidate
+    candidate = get_next_nonoa_candidate(conn, years, journals,
+                                         offset=offset if dry_run else 0)
     if not candidate:
         return None, None
 
@@ -351,7 +394,7 @@ def process_one(conn, config, dry_run=False):
 
     if dry_run:
         log.info("  [DRY RUN] Would try %d active repositories", len(active_repos))
-        return "skipped", doi
+        return "dry-run", doi
 
     attempts = get_article_attempts(conn, doi)
     now = datetime.now().isoformat()
@@ -365,7 +408,7 @@ def process_one(conn, config, dry_run=False):
         landing_url = repo_url + doi
 
         # Get or create session for this repository
-        session, is_new_session, elapsed_str = get_repo_session(repo_url)
+        session, is_new_session, elapsed_str = get_repo_session(conn, repo_url)
         parsed_url = urlparse(repo_url)
         server_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
 
@@ -381,6 +424,7 @@ def process_one(conn, config, dry_run=False):
 
         # Step 1: Fetch the HTML landing page
         html_content, http_code = fetch_landing_page(landing_url, session=session, verify=verify_cert)
+        get_session_store(conn).save(repo_url)
 
         if html_content is None:
             log.info("  Landing page fetch failed (HTTP %d). No PDF saved.", http_code)
@@ -391,6 +435,7 @@ def process_one(conn, config, dry_run=False):
             if i < len(active_repos) - 1:
                 log.info("  Waiting %d seconds before next repository...", politeness_min)
                 time.sleep(politeness_min)
+                metrics.waited("repository", politeness_min)
             continue
 
         # Step 2: Extract the download link from HTML
@@ -409,6 +454,7 @@ def process_one(conn, config, dry_run=False):
                           response=http_code,
                           timestamp=now,
                           file_path=None)
+            work_queue.mark_done(conn, QUEUE_STAGE, doi)
             return "no_download_link", doi
 
         # Step 3: Construct full PDF URL (server + relative href)
@@ -418,8 +464,19 @@ def process_one(conn, config, dry_run=False):
         # Small delay to appear more human-like
         time.sleep(0.5)
 
+        # Keep politeness_min between downloads from the same repository,
+        # also across separate (e.g. cron-driven) runs
+        waited = get_politeness_store(conn).wait_for_host(parsed_url.netloc, politeness_min)
+        metrics.waited("host", waited)
+        if waited > 0:
+            log.info("  Waited %d seconds for %s (politeness)", waited, server_url)
+
         # Step 4: Download the PDF
         success, http_code = download_pdf_direct(pdf_url, abs_path, referer_url=landing_url, session=session, verify=verify_cert)
+        get_session_store(conn).save(repo_url)
+        if success and pdf_store.check_download(conn, doi, abs_path):
+            # Same content as another DOI's file: a placeholder, not the article
+            success, http_code = False, 409
 
         if success:
             log.info("  Downloaded: %s", rel_path)
@@ -431,6 +488,7 @@ def process_one(conn, config, dry_run=False):
                           response=http_code,
                           timestamp=now,
                           file_path=rel_path)
+            work_queue.mark_done(conn, QUEUE_STAGE, doi)
             return "downloaded", doi
 
         # Record the failure
@@ -447,6 +505,7 @@ def process_one(conn, config, dry_run=False):
         if i < len(active_repos) - 1:
             log.info("  Waiting %d seconds before next repository...", politeness_min)
             time.sleep(politeness_min)
+            metrics.waited("repository", politeness_min)
 
     # All active repositories failed for this DOI — mark for manual download
     log.info("  All %d active repositories failed for %s. Marked for manual download.", len(active_repos), doi)
@@ -458,6 +517,7 @@ def process_one(conn, config, dry_run=False):
                   response=0,
                   timestamp=now,
                   file_path=None)
+    work_queue.mark_done(conn, QUEUE_STAGE, doi)
     return "failed", doi
 
 
@@ -474,6 +534,8 @@ def main():
                         help="Show what would be done without downloading")
     parser.add_argument("--continuous", action="store_true",
                         help="Run continuously until no candidates remain")
+    parser.add_argument("--rebuild-queue", action="store_true",
+                        help="Re-synchronise the work queue with the articles table")
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -495,6 +557,9 @@ def main():
         log.error("No repositories configured. Add 'local.repos' list to config.json")
         return 1
 
+    global _download_engine
+    _download_engine = DownloadEngine.from_config(config)
+
     # Connect to database
     db_path = Path(args.db)
     if not db_path.exists():
@@ -502,32 +567,21 @@ def main():
         return 1
 
     conn = sqlite3.connect(args.db)
+    pdf_store.ensure_columns(conn)
+
+    # Make sure the work queue reflects the current articles table and config
+    work_queue.ensure_synced(conn, QUEUE_STAGE, config["years"], config["journals"],
+                             force=args.rebuild_queue)
 
     # Ensure PDF directory exists
     pdf_dir = Path(config.get("pdf_dir", "pdf"))
     pdf_dir.mkdir(parents=True, exist_ok=True)
 
-    # Get politeness settings
-    politeness_min = local_cfg.get("politeness_min", 180)
-    politeness_random = local_cfg.get("politeness_random", 20)
-    politeness_skip = local_cfg.get("politeness_skip", 1)
-
-    # Get cooldown settings with validation
-    cooldown_probability = local_cfg.get("cooldown_probability", 0.1)
-    cooldown_min = local_cfg.get("cooldown_min", 60)
-    cooldown_max = local_cfg.get("cooldown_max", 180)
-
-    if cooldown_probability < 0.01:
-        log.warning("cooldown_probability %.3f is below minimum 0.01, setting to 0.01",
-                    cooldown_probability)
-        cooldown_probability = 0.01
-    elif cooldown_probability > 0.99:
-        log.warning("cooldown_probability %.3f exceeds maximum 0.99, setting to 0.99",
-                    cooldown_probability)
-        cooldown_probability = 0.99
+    # Get politeness and cooldown settings
+    settings = politeness_settings(local_cfg)
 
     # Stats
-    stats = {"downloaded": 0, "failed": 0, "skipped": 0, "no_download_link": 0}
+    stats = {"downloaded": 0, "failed": 0, "skipped": 0, "no_download_link": 0, "dry-run": 0}
     processed = 0
     max_repo_failures = local_cfg.get("max_repo_failures", 10)
 
@@ -540,10 +594,16 @@ def main():
     log.info("Starting repository scraper (years %d–%d, %d journals, %d repos, max %d failures/repo)",
              config["years"][0], config["years"][1], len(config["journals"]),
              len(local_cfg.get("repos", [])), max_repo_failures)
+    exporter = None
+    if not args.dry_run:
+        exporter = metrics.start_exporter(
+            "scrape_repo", args.db, config,
+            gauges={"queue_backlog": lambda c: work_queue.count_pending(c, QUEUE_STAGE)})
 
     try:
         while True:
-            result, doi = process_one(conn, config, args.dry_run)
+            result, doi = process_one(conn, config, args.dry_run,
+                                      offset=stats["dry-run"])
 
             if result is None:
                 log.info("No more candidates to process")
@@ -557,6 +617,8 @@ def main():
 
             if result in stats:
                 stats[result] += 1
+            if result != "dry-run":
+                metrics.article(result)
 
             if result == "skipped":
                 continue
@@ -567,33 +629,37 @@ def main():
                 log.info("Reached limit of %d articles", args.limit)
                 break
 
-            if not args.continuous and result in ("downloaded", "failed", "no_download_link"):
+            if not args.continuous and result in ("downloaded", "failed", "no_download_link",
+                                                  "dry-run"):
                 break
 
+            if result == "dry-run":
+                continue
+
             # Wait before next DOI
+            wait, cooldown = next_article_delay(result, settings)
             if result == "no_download_link":
-                # No PDF downloaded, use minimal wait (no random component)
                 log.info("Waiting %d seconds before next DOI (skip delay, no PDF downloaded)...",
-                         politeness_skip)
-                time.sleep(politeness_skip)
+                         wait)
             else:
-                # PDF was downloaded or attempted, use full politeness wait
-                random_wait = random.randint(5, politeness_random)
-                total_wait = politeness_min + random_wait
                 log.info("Waiting %d seconds before next DOI (base %d + random %d)...",
-                         total_wait, politeness_min, random_wait)
-                time.sleep(total_wait)
+                         wait, settings["politeness_min"], wait - settings["politeness_min"])
+            time.sleep(wait)
+            metrics.waited("interval", wait)
 
             # Random cooldown to appear more human-like
-            if random.random() < cooldown_probability:
-                cooldown_duration = random.randint(cooldown_min, cooldown_max)
+            if cooldown:
                 log.info("Cooldown triggered (p=%.2f): waiting %d seconds...",
-                         cooldown_probability, cooldown_duration)
-                time.sleep(cooldown_duration)
+                         settings["cooldown_probability"], cooldown)
+                time.sleep(cooldown)
+                metrics.waited("cooldown", cooldown)
 
     except KeyboardInterrupt:
         log.info("Interrupted by user")
 
+    if exporter is not None:
+        exporter.close()
+    get_session_store(conn).close()
     conn.close()
 
     log.info("Done — downloaded: %d, failed: %d, no_download_link: %d, skipped: %d",
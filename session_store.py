@@ -0,0 +1,182 @@
+"""
+Persistent HTTP sessions for the scrapers.
+
+The scrapers keep one requests session per publisher (scrape_pdfs.py) or
+repository (scrape_repo.py) so that cookies collected on landing pages
+are reused. These sessions used to live only in process memory: every
+one-article run started without cookies, and in continuous mode the
+session dict grew without bound and sessions were never closed.
+
+SessionStore keeps at most max_live sessions open, closing the least
+recently used one (and its connection pools) when a new one is needed.
+Cookies are saved per key in the session_jars table after each use and
+restored when a session is opened again, in the same or a later run.
+Cookies past their expiry date are dropped; cookies without one (browser
+session cookies) are only restored if the jar was used within
+SESSION_COOKIE_TTL.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from requests.cookies import create_cookie
+
+from pdf_download import pooled_session
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_LIVE = 32
+# Cookies without an expiry date are kept this long after the last use
+SESSION_COOKIE_TTL = timedelta(hours=12)
+
+
+def _cookie_to_dict(cookie):
+    return {
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "expires": cookie.expires,
+        "secure": cookie.secure,
+        "rest": cookie._rest,
+    }
+
+
+class SessionStore:
+    """LRU-capped, persisted requests sessions, keyed by publisher or host.
+
+    headers are the default headers of new sessions. The connection is
+    only used under the store's lock, so a store built on a connection
+    opened with check_same_thread=False can be shared by threads. Each
+    session must still be used by one thread at a time: threads that may
+    share a key (e.g. per-host sessions of download workers) hold it with
+    use(), which also keeps the session from being closed by LRU eviction
+    while it is in use.
+    """
+
+    def __init__(self, conn, headers, max_live=DEFAULT_MAX_LIVE):
+        self.conn = conn
+        self.headers = headers
+        self.max_live = max_live
+        self._live = OrderedDict()  # key -> session, least recently used first
+        self._last_used = {}  # key -> datetime, for live sessions
+        # key -> [Lock, threads holding or waiting for it] (see use); only
+        # keys in use have an entry
+        self._key_locks = {}
+        self._in_use = set()
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_jars (
+                key        TEXT PRIMARY KEY,
+                cookies    TEXT NOT NULL,
+                last_used  TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, key):
+        """Get the session for a key, opening (and restoring) it if needed.
+
+        Returns (session, is_new, last_used): is_new is True if the session
+        starts without saved cookies; last_used is the datetime of the
+        previous use (also from an earlier run), or None.
+        """
+        now = datetime.now()
+        with self._lock:
+            if key in self._live:
+                self._live.move_to_end(key)
+                last_used = self._last_used[key]
+                self._last_used[key] = now
+                return self._live[key], False, last_used
+
+            row = self.conn.execute("SELECT cookies, last_used FROM session_jars WHERE key = ?",
+                                    (key,)).fetchone()
+            last_used = datetime.fromisoformat(row[1]) if row else None
+            session = pooled_session(self.headers)
+            restored = self._restore(session, row, now) if row else 0
+            self._live[key] = session
+            self._last_used[key] = now
+            while len(self._live) > self.max_live:
+                # Sessions in use are skipped; if all are, the cap is
+                # exceeded until they are released
+                old_key = next((k for k in self._live if k not in self._in_use), None)
+                if old_key is None:
+                    break
+                old_session = self._live.pop(old_key)
+                del self._last_used[old_key]
+                self._save(old_key, old_session, now)
+                old_session.close()
+                log.debug("Closed least recently used session: %s", old_key)
+        if restored:
+            log.debug("Restored %d cookies for %s", restored, key)
+        return session, not restored, last_used
+
+    @contextmanager
+    def use(self, key):
+        """Hold the session for a key for the duration of a with block.
+
+        Waits while another thread holds the same key. While held, the
+        session is not evicted, so get() and save() for the key can be
+        called safely inside the block.
+        """
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                with self._lock:
+                    self._in_use.add(key)
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        self._in_use.discard(key)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def _restore(self, session, row, now):
+        """Load the unexpired cookies of a saved jar. Caller holds the lock."""
+        cookies, last_used = row
+        session_cookies_valid = now - datetime.fromisoformat(last_used) <= SESSION_COOKIE_TTL
+        count = 0
+        for c in json.loads(cookies):
+            if c["expires"] is None and not session_cookies_valid:
+                continue
+            if c["expires"] is not None and c["expires"] <= now.timestamp():
+                continue
+            session.cookies.set_cookie(create_cookie(**c))
+            count += 1
+        return count
+
+    def _save(self, key, session, now):
+        """Write a session's cookies to the database. Caller holds the lock."""
+        cookies = [_cookie_to_dict(c) for c in session.cookies]
+        self.conn.execute("""
+            INSERT OR REPLACE INTO session_jars (key, cookies, last_used)
+            VALUES (?, ?, ?)
+        """, (key, json.dumps(cookies), now.isoformat()))
+        self.conn.commit()
+
+    def save(self, key):
+        """Persist the cookies of a live session (call after using it)."""
+        with self._lock:
+            session = self._live.get(key)
+            if session is not None:
+                self._save(key, session, datetime.now())
+
+    def close(self):
+        """Save and close all live sessions."""
+        now = datetime.now()
+        with self._lock:
+            while self._live:
+                key, session = self._live.popitem(last=False)
+                self._save(key, session, now)
+                session.close()
+            self._last_used.clear()
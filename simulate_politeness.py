@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Politeness schedule simulator for scrape_pdfs.py and scrape_repo.py.
+
+Shows, before a long run, how long the current backlog will take with the
+politeness settings of config.json (or with overrides given by --set) and
+where the time goes, without contacting anyone. The backlog is read from
+the articles table with the work queue's selection filter, grouped by
+publisher; nothing is written to the database.
+
+The scheduling rules are replayed in virtual time with the scrapers' own
+code:
+
+- scrape_pdfs.py: a PublisherScheduler (global politeness_interval,
+  publisher_interval per publisher, one worker per publisher) on a
+  PolitenessStore whose clock is the simulation clock, with --workers
+  workers. Each free worker takes a pending article of a ready publisher,
+  picked at random as by the work queue. With a single worker,
+  politeness_interval is also slept after each article, as in the serial
+  loop.
+- scrape_repo.py: the active repositories are tried in random order for
+  each article, with politeness_min after a failed repository and between
+  downloads from the same host, scrape_repo.next_article_delay (wait and
+  random cooldown) after each article, and repositories disabled after
+  max_repo_failures failures.
+
+What the requests themselves take cannot be derived from the
+configuration: an article attempt of scrape_pdfs.py is assumed to take
+--attempt-seconds and a repository request (landing page or PDF)
+--request-seconds, and repository answers are drawn with --hit-rate and
+--no-link-rate.
+
+Reports the projected completion time and, per publisher, the articles,
+attempts per hour and idle time (time with pending articles during which
+the publisher was not being contacted); for scrape_pdfs.py also the idle
+time of the workers, for scrape_repo.py the time spent in each kind of
+wait and the requests per repository.
+
+Usage:
+    python simulate_politeness.py
+    python simulate_politeness.py --scraper pdfs --workers 4
+    python simulate_politeness.py --set unpaywall.publisher_interval=10
+    python simulate_politeness.py --scraper repo --set local.politeness_min=120
+    python simulate_politeness.py --json
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import math
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+
+import politeness
+import scrape_pdfs
+import scrape_repo
+import work_queue
+from politeness import PolitenessStore
+
+log = logging.getLogger(__name__)
+
+SCRAPERS = ["pdfs", "repo"]
+
+# Pause of scrape_repo.process_one between finding a download link and
+# downloading the PDF
+LINK_PAUSE = 0.5
+
+
+# ---------------------------------------------------------------------------
+# Virtual time
+# ---------------------------------------------------------------------------
+
+def _delta(seconds):
+    """timedelta of seconds, rounded up to whole microseconds (never early)."""
+    return timedelta(microseconds=math.ceil(round(seconds * 1e6, 3)))
+
+
+class VirtualClock:
+    """Simulation time; usable as the clock of a PolitenessStore."""
+
+    def __init__(self, start):
+        self.start = start
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def elapsed(self, when=None):
+        """Seconds from the start of the simulation to when (default: now)."""
+        return ((when or self.now) - self.start).total_seconds()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += _delta(seconds)
+
+
+def memory_store(clock):
+    """An empty PolitenessStore in memory, running on clock."""
+    conn = sqlite3.connect(":memory:")
+    # A new politeness_state table is seeded from the articles table
+    conn.execute("CREATE TABLE articles (timestamp TEXT, publisher TEXT)")
+    return PolitenessStore(conn, clock=clock)
+
+
+def _pick(remaining, publishers, rnd):
+    """Publisher of the next article among publishers.
+
+    The work queue hands out the pending article with the lowest random
+    ordinal, so each publisher is picked with a probability proportional
+    to its number of pending articles.
+    """
+    return rnd.choices(publishers, weights=[remaining[p] for p in publishers])[0]
+
+
+def _publisher_stats(backlog):
+    return {p: {"articles": 0, "busy": 0.0, "finished": 0.0} for p in backlog}
+
+
+def _publisher_report(publishers, remaining):
+    """Per-publisher results: attempts per hour and idle time up to the last one."""
+    report = {}
+    for publisher, s in publishers.items():
+        report[publisher or ""] = {
+            "articles": s["articles"],
+            "left": remaining[publisher],
+            "finished_seconds": round(s["finished"], 1),
+            "per_hour": round(s["articles"] * 3600 / s["finished"], 2) if s["finished"] else None,
+            "idle_seconds": round(max(0.0, s["finished"] - s["busy"]), 1),
+        }
+    return report
+
+
+# ---------------------------------------------------------------------------
+# scrape_pdfs.py
+# ---------------------------------------------------------------------------
+
+def simulate_pdfs(backlog, config, workers, attempt_seconds, rnd, start):
+    """Replay scrape_pdfs.py (--workers N) over backlog ({publisher: articles})."""
+    unpaywall_cfg = config["unpaywall"]
+    global_interval = unpaywall_cfg["politeness_interval"]
+    clock = VirtualClock(start)
+    scheduler = scrape_pdfs.PublisherScheduler(memory_store(clock), global_interval,
+                                               unpaywall_cfg["publisher_interval"])
+    serial = workers == 1
+    remaining = dict(backlog)
+    publishers = _publisher_stats(backlog)
+    free = {w: start for w in range(1, workers + 1)}  # worker -> idle since
+    events = []  # (time, seq, kind, worker, publisher or idle-since)
+    seq = itertools.count()
+    worker_idle = 0.0
+    global_waits = 0.0
+
+    while True:
+        # Free workers take articles in turn, as they would under the
+        # worker lock, until no publisher is ready
+        wake = None
+        for worker in sorted(free):
+            ready, wait = scheduler.eligible([p for p, n in remaining.items() if n])
+            if not ready:
+                wake = wait
+                break
+            publisher = _pick(remaining, ready, rnd)
+            _, wait = scheduler.try_acquire(publisher)
+            remaining[publisher] -= 1
+            publishers[publisher]["articles"] += 1
+            begin = clock.now + _delta(wait)
+            worker_idle += (begin - free.pop(worker)).total_seconds()
+            global_waits += wait
+            end = begin + _delta(attempt_seconds)
+            publishers[publisher]["busy"] += attempt_seconds
+            heapq.heappush(events, (end, next(seq), "release", worker, publisher))
+
+        if not events and wake is None:
+            break
+        times = [events[0][0]] if events else []
+        if wake is not None:
+            times.append(clock.now + _delta(wake))
+        clock.now = min(times)
+
+        while events and events[0][0] <= clock.now:
+            when, _, kind, worker, value = heapq.heappop(events)
+            if kind == "release":
+                scheduler.release(value)
+                publishers[value]["finished"] = clock.elapsed(when)
+                if serial:
+                    # The serial loop sleeps politeness_interval between articles
+                    heapq.heappush(events, (when + _delta(global_interval), next(seq),
+                                            "free", worker, when))
+                else:
+                    free[worker] = when
+            else:
+                free[worker] = value
+
+    total = max((s["finished"] for s in publishers.values()), default=0.0)
+    end = start + _delta(total)
+    worker_idle += sum(max(0.0, (end - since).total_seconds()) for since in free.values())
+    return {
+        "scraper": "scrape_pdfs.py",
+        "articles": sum(backlog.values()),
+        "workers": workers,
+        "settings": {
+            "politeness_interval": global_interval,
+            "publisher_interval": unpaywall_cfg["publisher_interval"],
+            "attempt_seconds": attempt_seconds,
+        },
+        "total_seconds": round(total, 1),
+        "completion": end.isoformat(timespec="minutes"),
+        "stopped": None,
+        "worker_idle_seconds": round(worker_idle, 1),
+        "worker_idle_share": round(worker_idle / (total * workers), 3) if total else None,
+        "global_wait_seconds": round(global_waits, 1),
+        "publishers": _publisher_report(publishers, remaining),
+    }
+
+
+# ---------------------------------------------------------------------------
+# scrape_repo.py
+# ---------------------------------------------------------------------------
+
+def simulate_repo(backlog, config, request_seconds, hit_rate, no_link_rate, rnd, start):
+    """Replay scrape_repo.py --continuous over backlog ({publisher: articles})."""
+    local_cfg = config.get("local", {})
+    repos = local_cfg.get("repos", [])
+    max_failures = local_cfg.get("max_repo_failures", 10)
+    settings = scrape_repo.politeness_settings(local_cfg)
+    politeness_min = settings["politeness_min"]
+    clock = VirtualClock(start)
+    store = memory_store(clock)
+    remaining = dict(backlog)
+    publishers = _publisher_stats(backlog)
+    failures = dict.fromkeys(repos, 0)
+    requests = dict.fromkeys(repos, 0)
+    waits = dict.fromkeys(["repository", "host", "interval", "cooldown"], 0.0)
+    outcomes = {}
+    processed = 0
+    stopped = None
+
+    def request(repo):
+        clock.sleep(request_seconds)
+        requests[repo] += 1
+
+    while any(remaining.values()):
+        active = [r for r in repos if failures[r] < max_failures]
+        if not active:
+            stopped = f"all repositories disabled after {max_failures} failures each"
+            break
+        rnd.shuffle(active)
+        publisher = _pick(remaining, [p for p, n in remaining.items() if n], rnd)
+        remaining[publisher] -= 1
+        publishers[publisher]["articles"] += 1
+        began = clock.now
+
+        result = "failed"
+        for i, repo in enumerate(active):
+            request(repo)  # landing page
+            draw = rnd.random()
+            if draw < no_link_rate:
+                result = "no_download_link"
+                break
+            if draw < no_link_rate + hit_rate:
+                clock.sleep(LINK_PAUSE)
+                host = urlparse(repo).netloc
+                wait = store.seconds_until_free(politeness.HOST, host, politeness_min)
+                clock.sleep(wait)
+                waits["host"] += wait
+                store.record(host=host)
+                request(repo)  # PDF
+                result = "downloaded"
+                break
+            failures[repo] += 1
+            if i < len(active) - 1:
+                clock.sleep(politeness_min)
+                waits["repository"] += politeness_min
+
+        processed += 1
+        outcomes[result] = outcomes.get(result, 0) + 1
+        publishers[publisher]["busy"] += (clock.now - began).total_seconds()
+        publishers[publisher]["finished"] = clock.elapsed()
+        if any(remaining.values()):
+            wait, cooldown = scrape_repo.next_article_delay(result, settings, rnd)
+            clock.sleep(wait + cooldown)
+            waits["interval"] += wait
+            waits["cooldown"] += cooldown
+
+    total = clock.elapsed()
+    hours = total / 3600
+    return {
+        "scraper": "scrape_repo.py",
+        "articles": sum(backlog.values()),
+        "processed": processed,
+        "settings": dict(settings, max_repo_failures=max_failures,
+                         request_seconds=request_seconds, hit_rate=hit_rate,
+                         no_link_rate=no_link_rate),
+        "total_seconds": round(total, 1),
+        "completion": clock.now.isoformat(timespec="minutes"),
+        "stopped": stopped,
+        "outcomes": outcomes,
+        "wait_seconds": {reason: round(s, 1) for reason, s in waits.items()},
+        "repositories": {
+            repo: {
+                "requests": n,
+                "per_hour": round(n / hours, 2) if hours else None,
+                "failures": failures[repo],
+                "disabled": failures[repo] >= max_failures,
+            }
+            for repo, n in requests.items()
+        },
+        "publishers": _publisher_report(publishers, remaining),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def format_duration(seconds):
+    """Seconds as [Nd ]HH:MM:SS."""
+    days, rest = divmod(int(round(seconds)), 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    text = f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{days}d {text}" if days else text
+
+
+def print_report(result, top):
+    settings = ", ".join(f"{k} {v}" for k, v in result["settings"].items())
+    if result["scraper"] == "scrape_pdfs.py":
+        print(f"{result['scraper']}: {result['articles']} articles, "
+              f"{len(result['publishers'])} publishers, {result['workers']} worker(s)")
+    else:
+        print(f"{result['scraper']}: {result['articles']} articles, "
+              f"{len(result['publishers'])} publishers, {len(result['repositories'])} repositories")
+    print(f"  Settings:             {settings}")
+    print(f"  Projected completion: {format_duration(result['total_seconds'])} "
+          f"({result['completion'].replace('T', ' ')})")
+    if result["stopped"]:
+        print(f"  Stopped after {result['processed']} articles: {result['stopped']} "
+              f"({result['articles'] - result['processed']} left)")
+
+    if "worker_idle_seconds" in result:
+        share = result["worker_idle_share"]
+        print(f"  Workers idle:         {format_duration(result['worker_idle_seconds'])}"
+              + (f" ({share:.0%} of worker time)" if share is not None else ""))
+        print(f"  Global interval waits: {format_duration(result['global_wait_seconds'])}")
+    else:
+        print("  Outcomes:             " + ", ".join(
+            f"{k} {v}" for k, v in sorted(result["outcomes"].items())))
+        print("  Waits:                " + ", ".join(
+            f"{k} {format_duration(v)}" for k, v in result["wait_seconds"].items()))
+        print("  Repositories:")
+        for repo, r in result["repositories"].items():
+            print(f"    {repo:<48} {r['requests']:7d} requests  {r['per_hour'] or 0:8.2f}/h"
+                  + ("  disabled" if r["disabled"] else ""))
+
+    rows = sorted(result["publishers"].items(), key=lambda item: -item[1]["finished_seconds"])
+    print(f"  {'Publisher':<36} {'Articles':>8} {'Per hour':>9} {'Idle':>14} {'Done after':>14}")
+    for publisher, p in rows[:top] if top else rows:
+        per_hour = f"{p['per_hour']:.2f}" if p["per_hour"] is not None else "-"
+        print(f"  {(publisher or '(none)')[:36]:<36} {p['articles']:8d} {per_hour:>9} "
+              f"{format_duration(p['idle_seconds']):>14} "
+              f"{format_duration(p['finished_seconds']):>14}")
+    if top and len(rows) > top:
+        print(f"  ... {len(rows) - top} more (see --top)")
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def apply_overrides(config, overrides):
+    """Set config values from "section.key=value" strings (values as JSON if possible)."""
+    for override in overrides:
+        path, sep, value = override.partition("=")
+        if not sep or not path:
+            raise ValueError(f"expected section.key=value: {override}")
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass  # plain string
+        *sections, key = path.split(".")
+        target = config
+        for section in sections:
+            target = target.setdefault(section, {})
+        target[key] = value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Project the duration of the scrapers' backlog under the configured "
+                    "politeness settings, in virtual time.")
+    parser.add_argument("--config", default="config.json",
+                        help="Path to configuration file (default: config.json)")
+    parser.add_argument("--db", default="linglitter.db",
+                        help="Path to SQLite database (default: linglitter.db)")
+    parser.add_argument("--scraper", choices=SCRAPERS + ["both"], default="both",
+                        help="Scraper to simulate (default: both)")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="Override a config value, e.g. unpaywall.publisher_interval=10 "
+                             "(repeatable)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Download workers of scrape_pdfs.py (default: 1)")
+    parser.add_argument("--attempt-seconds", type=float, default=10,
+                        help="Assumed duration of an article attempt of scrape_pdfs.py "
+                             "(default: 10)")
+    parser.add_argument("--request-seconds", type=float, default=2,
+                        help="Assumed duration of a repository request (default: 2)")
+    parser.add_argument("--hit-rate", type=float, default=0.5,
+                        help="Share of repository landing pages leading to the PDF "
+                             "(default: 0.5)")
+    parser.add_argument("--no-link-rate", type=float, default=0.1,
+                        help="Share of repository landing pages without download link "
+                             "(default: 0.1)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="Seed of the random choices (default: 1)")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Publishers to list, slowest first (0 = all; default: 20)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s  %(levelname)-8s  %(message)s",
+        datefmt="%H:%M:%S",
+    )
+
+    config_path = Path(args.config)
+    if not config_path.exists():
+        log.error("Config file not found: %s", config_path)
+        return 1
+    with open(config_path) as fh:
+        config = json.load(fh)
+    try:
+        apply_overrides(config, args.set)
+    except ValueError as e:
+        log.error("%s", e)
+        return 1
+    if args.workers < 1:
+        log.error("--workers must be at least 1")
+        return 1
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        log.error("Database not found: %s (run scrape_dois.py first)", db_path)
+        return 1
+    # Read-only: the simulation never changes the database
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    scrapers = SCRAPERS if args.scraper == "both" else [args.scraper]
+    start = datetime.now()
+    results = []
+    try:
+        if "pdfs" in scrapers:
+            backlog = work_queue.backlog_by_publisher(
+                conn, scrape_pdfs.QUEUE_STAGE, config["years"], config["journals"],
+                config["unpaywall"]["max_attempts"])
+            results.append(simulate_pdfs(backlog, config, args.workers, args.attempt_seconds,
+                                         random.Random(args.seed), start))
+        if "repo" in scrapers:
+            if not config.get("local", {}).get("repos"):
+                log.warning("No repositories configured in 'local.repos'; "
+                            "skipping scrape_repo.py")
+            else:
+                backlog = work_queue.backlog_by_publisher(
+                    conn, scrape_repo.QUEUE_STAGE, config["years"], config["journals"])
+                results.append(simulate_repo(backlog, config, args.request_seconds,
+                                             args.hit_rate, args.no_link_rate,
+                                             random.Random(args.seed), start))
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for i, result in enumerate(results):
+            if i:
+                print()
+            print_report(result, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Per-publisher and per-journal yield of the OA sources.
+
+scrape_pdfs.py walks its fallback sources (Semantic Scholar, OpenAlex,
+CORE, LingBuzz) in a fixed order, but their usefulness differs a lot
+between publishers: for some, one source nearly always has the working
+PDF and the others never do. The source_stats table counts, per
+(publisher, journal, source), how often a source was consulted for an
+article and how often it delivered the PDF that was finally downloaded.
+
+rank() turns these counts into a cascade order: sources are sorted by
+expected yield per unit of cost (cost being the request spacing of the
+source's service, see scrape_pdfs.SERVICE_INTERVALS), and optionally
+sources whose yield stays below a threshold are dropped. A source's
+counts for the article's journal are used once it has been consulted
+MIN_TRIALS times for it, else its counts for the publisher. Sources
+without MIN_TRIALS consultations at either level (e.g. those after a
+source that always delivers, which the cascade never reaches) are ranked
+with the prior yield, so they are tried before sources known to fail.
+Until some source has MIN_TRIALS consultations the fixed order is kept,
+which is how the counts are collected in the first place.
+
+Used by scrape_pdfs.py.
+"""
+
+import logging
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+# Consultations per source before its counts are used for ordering
+MIN_TRIALS = 5
+
+# Additive smoothing of the yield estimate: PRIOR_WEIGHT pseudo-attempts
+# with PRIOR_YIELD successes each
+PRIOR_YIELD = 0.5
+PRIOR_WEIGHT = 2
+
+
+def ensure_table(conn):
+    """Create the source_stats table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS source_stats (
+            publisher   TEXT NOT NULL,
+            journal     TEXT NOT NULL,
+            source      TEXT NOT NULL,
+            attempts    INTEGER NOT NULL DEFAULT 0,
+            successes   INTEGER NOT NULL DEFAULT 0,
+            updated_at  TEXT,
+            PRIMARY KEY (publisher, journal, source)
+        )
+    """)
+    conn.commit()
+
+
+def record(conn, publisher, journal, source, success):
+    """Count one consultation of a source for an article of publisher/journal."""
+    conn.execute("""
+        INSERT INTO source_stats (publisher, journal, source, attempts, successes, updated_at)
+        VALUES (?, ?, ?, 1, ?, ?)
+        ON CONFLICT(publisher, journal, source) DO UPDATE SET
+            attempts = attempts + 1,
+            successes = successes + excluded.successes,
+            updated_at = excluded.updated_at
+    """, (publisher or "", journal or "", source, int(bool(success)),
+          datetime.now().isoformat()))
+    conn.commit()
+
+
+def counts(conn, publisher, journal=None):
+    """{source: (attempts, successes)} for a publisher, or one of its journals."""
+    if journal is None:
+        rows = conn.execute("""
+            SELECT source, SUM(attempts), SUM(successes) FROM source_stats
+            WHERE publisher = ? GROUP BY source
+        """, (publisher or "",)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT source, attempts, successes FROM source_stats
+            WHERE publisher = ? AND journal = ?
+        """, (publisher or "", journal or "")).fetchall()
+    return {source: (attempts, successes) for source, attempts, successes in rows}
+
+
+def expected_yield(attempts, successes):
+    """Smoothed success rate of a source."""
+    return (successes + PRIOR_YIELD * PRIOR_WEIGHT) / (attempts + PRIOR_WEIGHT)
+
+
+def rank(conn, publisher, journal, costs, prune_below=0.0, prune_min_trials=30):
+    """Order sources by expected yield per cost for an article.
+
+    costs maps the candidate sources, in the fixed cascade order, to their
+    relative cost per request. Sources consulted at least prune_min_trials
+    times (at the level used for ordering) with an expected yield below
+    prune_below are dropped.
+
+    Returns (ordered, pruned): lists of source names.
+    """
+    sources = list(costs)
+    journal_stats = counts(conn, publisher, journal)
+    publisher_stats = counts(conn, publisher)
+    stats = {}
+    for s in sources:
+        for level in (journal_stats, publisher_stats):
+            if level.get(s, (0, 0))[0] >= MIN_TRIALS:
+                stats[s] = level[s]
+                break
+    if not stats:
+        return sources, []
+
+    # Under-observed sources get the prior yield instead of their few counts
+    yields = {s: expected_yield(*stats[s]) if s in stats else PRIOR_YIELD for s in sources}
+    pruned = [s for s in sources
+              if prune_below and s in stats and stats[s][0] >= prune_min_trials
+              and yields[s] < prune_below]
+    ordered = sorted((s for s in sources if s not in pruned),
+                     key=lambda s: -yields[s] / costs[s])
+    return ordered, pruned
@@ -0,0 +1,201 @@
+"""
+Shared fuzzy title matching.
+
+Titles are matched in several places: LingBuzz papers against article
+titles (scrape_pdfs.py), PDF file names against the articles of a journal
+(integrate_renaming.py), and search results against book titles
+(enrich_lingbooks.py). All of them use the normalisation and scorers here,
+so that a score means the same everywhere.
+
+TitleIndex normalises a set of candidate titles (and splits them into
+words) once, and scores a query against all of them in one call. With
+rapidfuzz installed, the prefix scorer runs as a batch operation in
+rapidfuzz's C code; otherwise, and always for the ratio scorer, difflib
+is used, with the query prepared once and candidates that cannot reach
+the threshold skipped by difflib's cheap upper bounds.
+
+Each scorer keeps the normalisation and score of the matcher it replaced,
+so the thresholds mean what they did before. Scores range from 0 to 100.
+Scorers:
+
+- RATIO: overall similarity of the two titles (difflib's ratio, after
+  squash(): punctuation deleted, as the LingBuzz matcher always did;
+  rapidfuzz's ratio is a different measure and is not used);
+- PREFIX: like RATIO, but a query that is the beginning of (or contained
+  in) the candidate scores high, for truncated titles such as file names;
+- OVERLAP: 100 for equal or nested titles, else the share of the shorter
+  title's words found in the other.
+"""
+
+import logging
+import re
+from difflib import SequenceMatcher
+
+log = logging.getLogger(__name__)
+
+# Try to use rapidfuzz for faster and better fuzzy matching, fall back to difflib
+try:
+    from rapidfuzz import fuzz, process
+    HAVE_RAPIDFUZZ = True
+except ImportError:
+    HAVE_RAPIDFUZZ = False
+    log.debug("rapidfuzz not available, using difflib for fuzzy matching")
+
+RATIO = "ratio"
+PREFIX = "prefix"
+OVERLAP = "overlap"
+
+# Thresholds shared by the matchers
+MATCH_THRESHOLD = 75    # RATIO: taken as the same work without confirmation
+SUGGEST_THRESHOLD = 60  # PREFIX: offered to the user for confirmation
+OVERLAP_THRESHOLD = 70  # OVERLAP: search result accepted as the same book
+
+# Score of a query that is a prefix of the candidate (PREFIX)
+PREFIX_SCORE = 95
+
+
+def normalize(text):
+    """Lowercase, replace punctuation with spaces, collapse whitespace."""
+    if not text:
+        return ""
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def squash(text):
+    """Lowercase, delete punctuation ("Wh-movement" -> "whmovement"),
+    collapse whitespace; the normalisation of RATIO."""
+    if not text:
+        return ""
+    text = re.sub(r'[^\w\s]', '', text.lower().strip())
+    return re.sub(r'\s+', ' ', text)
+
+
+class TitleIndex:
+    """Candidate titles prepared for repeated fuzzy matching."""
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+        self.norms = [normalize(t) for t in self.titles]
+        self._words = None
+        self._squashed = None
+
+    def __len__(self):
+        return len(self.norms)
+
+    @property
+    def words(self):
+        """Word sets of the candidates (computed on first use)."""
+        if self._words is None:
+            self._words = [set(n.split()) for n in self.norms]
+        return self._words
+
+    @property
+    def squashed(self):
+        """Candidates normalised with squash() (computed on first use)."""
+        if self._squashed is None:
+            self._squashed = [squash(t) for t in self.titles]
+        return self._squashed
+
+    def extract(self, query, scorer=RATIO, threshold=0, limit=None):
+        """Score query against all candidates.
+
+        Returns [(score, index)] for the candidates scoring at least
+        threshold, best first, at most limit of them.
+        """
+        if scorer not in (RATIO, PREFIX, OVERLAP):
+            raise ValueError(f"unknown scorer: {scorer}")
+        query = squash(query) if scorer == RATIO else normalize(query)
+        if not query.strip():
+            return []
+        if scorer == RATIO:
+            scores = self._difflib(query, threshold, best_only=limit == 1,
+                                   norms=self.squashed)
+        elif scorer == PREFIX:
+            scores = self._prefix(query, threshold)
+        else:
+            scores = self._overlap(query)
+        matches = sorted(((s, i) for i, s in scores.items() if s >= threshold),
+                         key=lambda m: (-m[0], m[1]))
+        return matches[:limit] if limit else matches
+
+    def best(self, query, scorer=RATIO, threshold=0):
+        """(score, index) of the best candidate reaching threshold, or None."""
+        matches = self.extract(query, scorer, threshold, limit=1)
+        return matches[0] if matches else None
+
+    # -- scorers: {index: score} for (at least) the candidates that can
+    # -- reach threshold
+
+    def _rapidfuzz(self, query, scorer, threshold):
+        results = process.extract(query, self.norms, scorer=scorer, processor=None,
+                                  limit=None, score_cutoff=threshold or None)
+        return {i: score for _, score, i in results}
+
+    def _difflib(self, query, threshold, indexes=None, best_only=False, norms=None):
+        # With best_only, the cutoff rises to the best score so far, so
+        # that most candidates are ruled out by the cheap upper bounds
+        norms = self.norms if norms is None else norms
+        matcher = SequenceMatcher(None)
+        matcher.set_seq1(query)
+        cutoff = threshold / 100
+        scores = {}
+        for i in (range(len(norms)) if indexes is None else indexes):
+            if not norms[i].strip():
+                continue
+            matcher.set_seq2(norms[i])
+            if cutoff and (matcher.real_quick_ratio() < cutoff
+                           or matcher.quick_ratio() < cutoff):
+                continue
+            ratio = matcher.ratio()
+            scores[i] = ratio * 100
+            if best_only:
+                cutoff = max(cutoff, ratio)
+        return scores
+
+    def _prefix(self, query, threshold):
+        if HAVE_RAPIDFUZZ:
+            # The better of partial and full match
+            scores = self._rapidfuzz(query, fuzz.partial_ratio, threshold)
+            for i, score in self._rapidfuzz(query, fuzz.ratio, threshold).items():
+                scores[i] = max(scores.get(i, 0), score)
+            for i, norm in enumerate(self.norms):
+                if norm.startswith(query):
+                    scores[i] = max(scores.get(i, 0), PREFIX_SCORE)
+            return scores
+
+        scores = {}
+        nested = []
+        for i, norm in enumerate(self.norms):
+            if norm.startswith(query):
+                scores[i] = PREFIX_SCORE
+            elif query in norm:
+                nested.append(i)
+        # Queries contained in a candidate score by how much of it they cover
+        for i, ratio in self._difflib(query, 0, nested).items():
+            coverage = len(query) / len(self.norms[i])
+            scores[i] = max(ratio, 70 + coverage * 25)
+        others = [i for i in range(len(self.norms)) if i not in scores]
+        scores.update(self._difflib(query, threshold, others))
+        return scores
+
+    def _overlap(self, query):
+        query_words = set(query.split())
+        scores = {}
+        for i, norm in enumerate(self.norms):
+            if not norm:
+                continue
+            if query == norm or query in norm or norm in query:
+                scores[i] = 100.0
+                continue
+            words = self.words[i]
+            shorter = min(len(query_words), len(words))
+            if shorter:
+                scores[i] = len(query_words & words) / shorter * 100
+        return scores
+
+
+def score(query, candidate, scorer=RATIO):
+    """Score a single pair of titles (0 to 100)."""
+    match = TitleIndex([candidate]).best(query, scorer)
+    return match[0] if match else 0.0
@@ -0,0 +1,378 @@
+"""
+Persistent work queue for the PDF scrapers.
+
+Candidate selection used to run ORDER BY RANDOM() LIMIT 1 over the filtered
+articles table for every article, which is a full scan plus sort per
+iteration. The work_queue table instead holds one row per (stage, DOI) with
+a pre-shuffled random ordinal, so picking the next candidate is a single
+index lookup on (stage, status, ordinal).
+
+Stages correspond to the availability workflow:
+- "oa":   articles with availability IS NULL (scrape_pdfs.py)
+- "repo": articles with availability = 'no-oa' (scrape_repo.py)
+
+Row status is one of 'pending', 'claimed' (taken by a worker thread and in
+progress), 'done' or 'exhausted' (max_attempts reached). Claimed rows record
+their owner (host:pid), so that a run only returns the claims of processes
+that are gone, not those of another scraper working on the same database.
+The queue is (re)synchronised with the articles table when it is first used,
+when the selection filter (years, journals, max_attempts) changes, when it
+runs dry, or on explicit request (--rebuild-queue).
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+# Stage name -> availability value of articles in that stage (None = IS NULL)
+STAGES = {
+    "oa": None,
+    "repo": "no-oa",
+}
+
+
+def ensure_queue(conn):
+    """Create the work queue tables and indexes if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS work_queue (
+            stage      TEXT NOT NULL,
+            doi        TEXT NOT NULL,
+            publisher  TEXT,
+            ordinal    INTEGER NOT NULL,
+            status     TEXT NOT NULL DEFAULT 'pending',
+            claimed_by TEXT,
+            PRIMARY KEY (stage, doi)
+        )
+    """)
+    try:
+        conn.execute("ALTER TABLE work_queue ADD COLUMN claimed_by TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_work_queue_pick
+        ON work_queue(stage, status, ordinal)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_work_queue_publisher
+        ON work_queue(stage, status, publisher, ordinal)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS work_queue_meta (
+            stage      TEXT PRIMARY KEY,
+            signature  TEXT,
+            synced_at  TEXT
+        )
+    """)
+    conn.commit()
+
+
+def _eligible_filter(stage, years, journals):
+    """Build the WHERE clause (and params) selecting articles for a stage."""
+    placeholders = ",".join("?" for _ in journals)
+    availability = STAGES[stage]
+    clause = f"""
+        type = 'article'
+        AND year >= ? AND year <= ?
+        AND journal IN ({placeholders})
+        AND file IS NULL
+        AND {"availability IS NULL" if availability is None else "availability = ?"}
+    """
+    params = [years[0], years[1]] + list(journals)
+    if availability is not None:
+        params.append(availability)
+    return clause, params
+
+
+def _signature(years, journals, max_attempts):
+    """Fingerprint of the selection filter, to detect config changes."""
+    return json.dumps({"years": list(years), "journals": sorted(journals),
+                       "max_attempts": max_attempts}, sort_keys=True)
+
+
+def sync_queue(conn, stage, years, journals, max_attempts=None):
+    """Bring the queue for a stage in line with the articles table.
+
+    Removes rows whose articles no longer qualify, adds newly eligible
+    articles with a random ordinal (existing rows keep theirs), and sets
+    each row to 'pending' or 'exhausted' depending on its attempt count.
+    This is a full scan, but it only runs occasionally, not per article.
+
+    Returns the number of pending rows.
+    """
+    clause, params = _eligible_filter(stage, years, journals)
+
+    conn.execute(f"""
+        DELETE FROM work_queue
+        WHERE stage = ?
+          AND doi NOT IN (SELECT doi FROM articles WHERE {clause})
+    """, [stage] + params)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO work_queue (stage, doi, publisher, ordinal, status)
+        SELECT ?, doi, publisher, abs(random()), 'pending'
+        FROM articles WHERE {clause}
+    """, [stage] + params)
+
+    # Every remaining row is eligible, so anything marked done was reset
+    # (e.g. by --reset-oa-attempts) and needs to be picked up again.
+    # Claimed rows belong to running workers and are left alone.
+    limit = max_attempts if max_attempts else -1
+    conn.execute("""
+        UPDATE work_queue
+        SET publisher = (SELECT a.publisher FROM articles a WHERE a.doi = work_queue.doi),
+            status = CASE
+                WHEN ? >= 0 AND (SELECT COALESCE(a.attempts, 0) FROM articles a
+                                 WHERE a.doi = work_queue.doi) >= ?
+                THEN 'exhausted' ELSE 'pending' END
+        WHERE stage = ? AND status != 'claimed'
+    """, (limit, limit, stage))
+
+    conn.execute("""
+        INSERT OR REPLACE INTO work_queue_meta (stage, signature, synced_at)
+        VALUES (?, ?, ?)
+    """, (stage, _signature(years, journals, max_attempts), datetime.now().isoformat()))
+    conn.commit()
+
+    pending = count_pending(conn, stage)
+    log.info("Work queue '%s' synchronised: %d pending", stage, pending)
+    return pending
+
+
+def ensure_synced(conn, stage, years, journals, max_attempts=None, force=False):
+    """Sync the queue if it was never synced or the selection filter changed.
+
+    Returns True if a sync was performed.
+    """
+    ensure_queue(conn)
+    release_claims(conn, stage, other_hosts=force)
+    row = conn.execute("SELECT signature FROM work_queue_meta WHERE stage = ?",
+                       (stage,)).fetchone()
+    if force or not row or row[0] != _signature(years, journals, max_attempts):
+        sync_queue(conn, stage, years, journals, max_attempts)
+        return True
+    return False
+
+
+def count_pending(conn, stage):
+    """Number of rows waiting to be processed for a stage."""
+    row = conn.execute("""
+        SELECT COUNT(*) FROM work_queue WHERE stage = ? AND status = 'pending'
+    """, (stage,)).fetchone()
+    return row[0]
+
+
+def pending_dois(conn, stage):
+    """DOIs of all pending rows for a stage, in queue order."""
+    rows = conn.execute("""
+        SELECT doi FROM work_queue
+        WHERE stage = ? AND status = 'pending'
+        ORDER BY ordinal
+    """, (stage,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def backlog_by_publisher(conn, stage, years, journals, max_attempts=None):
+    """Articles eligible for a stage, counted per publisher.
+
+    Read directly from the articles table with the queue's selection
+    filter (articles with max_attempts or more attempts left out), without
+    creating or touching the queue. Returns {publisher: count}; NULL
+    publishers are reported as None.
+    """
+    clause, params = _eligible_filter(stage, years, journals)
+    if max_attempts:
+        clause += " AND COALESCE(attempts, 0) < ?"
+        params.append(max_attempts)
+    rows = conn.execute(f"""
+        SELECT publisher, COUNT(*) FROM articles WHERE {clause}
+        GROUP BY publisher
+    """, params).fetchall()
+    return {publisher: n for publisher, n in rows}
+
+
+def _is_eligible(stage, article, years, journals):
+    """Re-check an article against the stage filter (it may have changed)."""
+    return (article["type"] == "article"
+            and article["year"] is not None
+            and years[0] <= article["year"] <= years[1]
+            and article["journal"] in journals
+            and article["file"] is None
+            and article["availability"] == STAGES[stage])
+
+
+def pending_publishers(conn, stage):
+    """Distinct publishers with pending rows for a stage.
+
+    Walks the (stage, status, publisher) index one publisher at a time
+    (a skip scan), so the cost grows with the number of publishers, not
+    the number of queued articles. NULL publishers are reported as None.
+    """
+    rows = conn.execute("""
+        WITH RECURSIVE pubs(publisher) AS (
+            SELECT MIN(publisher) FROM work_queue
+            WHERE stage = ?1 AND status = 'pending'
+            UNION ALL
+            SELECT (SELECT MIN(publisher) FROM work_queue
+                    WHERE stage = ?1 AND status = 'pending' AND publisher > pubs.publisher)
+            FROM pubs WHERE pubs.publisher IS NOT NULL
+        )
+        SELECT publisher FROM pubs WHERE publisher IS NOT NULL
+    """, (stage,)).fetchall()
+    publishers = [row[0] for row in rows]
+    if conn.execute("""
+        SELECT 1 FROM work_queue
+        WHERE stage = ? AND status = 'pending' AND publisher IS NULL LIMIT 1
+    """, (stage,)).fetchone():
+        publishers.append(None)
+    return publishers
+
+
+def _next_row(conn, stage, offset, publishers):
+    """DOI of the first pending row (in ordinal order), or None."""
+    if publishers is None:
+        row = conn.execute("""
+            SELECT doi FROM work_queue
+            WHERE stage = ? AND status = 'pending'
+            ORDER BY ordinal
+            LIMIT 1 OFFSET ?
+        """, (stage, offset)).fetchone()
+        return row[0] if row else None
+
+    # One index lookup per publisher; the lowest ordinal wins, which keeps
+    # the shuffled order (and so each publisher's share) intact.
+    best = None
+    for publisher in publishers:
+        row = conn.execute("""
+            SELECT doi, ordinal FROM work_queue
+            WHERE stage = ? AND status = 'pending' AND publisher IS ?
+            ORDER BY ordinal
+            LIMIT 1
+        """, (stage, publisher)).fetchone()
+        if row and (best is None or row[1] < best[1]):
+            best = row
+    return best[0] if best else None
+
+
+def pick_next(conn, stage, years, journals, max_attempts=None, offset=0,
+              publishers=None):
+    """Return the next pending article for a stage, or None if drained.
+
+    The pick walks the (stage, status, ordinal) index. Rows whose articles
+    no longer qualify are dropped, and rows that already reached
+    max_attempts are marked 'exhausted', so neither is ever returned.
+
+    offset skips that many pending rows (used by dry runs, which preview
+    successive candidates without processing them). If publishers is
+    given, only rows of those publishers are considered (one lookup per
+    publisher on the (stage, status, publisher, ordinal) index); this is
+    how the scrapers pick only publishers that may be contacted right now.
+
+    Returns dict with keys doi, publisher, journal, year, title, attempts.
+    """
+    while True:
+        doi = _next_row(conn, stage, offset, publishers)
+        if doi is None:
+            return None
+
+        art = conn.execute("""
+            SELECT doi, publisher, journal, year, title, type, file,
+                   availability, attempts
+            FROM articles WHERE doi = ?
+        """, (doi,)).fetchone()
+        article = None
+        if art:
+            article = dict(zip(("doi", "publisher", "journal", "year", "title", "type",
+                                "file", "availability", "attempts"), art))
+            article["attempts"] = article["attempts"] or 0
+
+        if not article or not _is_eligible(stage, article, years, journals):
+            log.debug("Dropping stale queue entry %s", doi)
+            conn.execute("DELETE FROM work_queue WHERE stage = ? AND doi = ?",
+                         (stage, doi))
+            conn.commit()
+            continue
+
+        if max_attempts and article["attempts"] >= max_attempts:
+            log.debug("Max attempts reached for %s", doi)
+            mark_done(conn, stage, doi, status="exhausted")
+            continue
+
+        return {k: article[k] for k in ("doi", "publisher", "journal", "year",
+                                        "title", "attempts")}
+
+
+def mark_done(conn, stage, doi, status="done"):
+    """Record that an article has been processed for a stage."""
+    conn.execute("UPDATE work_queue SET status = ? WHERE stage = ? AND doi = ?",
+                 (status, stage, doi))
+    conn.commit()
+
+
+def _owner():
+    """Claim owner of this process: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_gone(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Running, under another user
+    return False
+
+
+def claim(conn, stage, doi):
+    """Mark a pending row as taken by a worker of this process.
+
+    Returns True if this call won the row (False if someone else did).
+    """
+    cur = conn.execute("""
+        UPDATE work_queue SET status = 'claimed', claimed_by = ?
+        WHERE stage = ? AND doi = ? AND status = 'pending'
+    """, (_owner(), stage, doi))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def unclaim(conn, stage, doi):
+    """Return a claimed row to the queue unprocessed."""
+    conn.execute("""
+        UPDATE work_queue SET status = 'pending', claimed_by = NULL
+        WHERE stage = ? AND doi = ? AND status = 'claimed'
+    """, (stage, doi))
+    conn.commit()
+
+
+def release_claims(conn, stage, other_hosts=False):
+    """Return rows claimed by an earlier (crashed or interrupted) run to the queue.
+
+    Released are claims without owner, claims of this host whose process
+    is no longer running, and claims of this very process (its pid may be
+    a crashed run's, e.g. in a restarted container; call this before
+    claiming). Claims of other hosts cannot be checked and are only
+    released with other_hosts (--rebuild-queue).
+    """
+    host, pid = _owner().rsplit(":", 1)
+    stale = []
+    for doi, owner in conn.execute("""
+        SELECT doi, claimed_by FROM work_queue WHERE stage = ? AND status = 'claimed'
+    """, (stage,)).fetchall():
+        owner_host, _, owner_pid = (owner or "").rpartition(":")
+        if (not owner or not owner_pid.isdigit()
+                or (owner_host == host
+                    and (owner_pid == pid or _process_gone(int(owner_pid))))
+                or (owner_host != host and other_hosts)):
+            stale.append((stage, doi))
+    conn.executemany("""
+        UPDATE work_queue SET status = 'pending', claimed_by = NULL
+        WHERE stage = ? AND doi = ? AND status = 'claimed'
+    """, stale)
+    conn.commit()
+    if stale:
+        log.info("Released %d stale claims in work queue '%s'", len(stale), stage)